@@ -0,0 +1,56 @@
+"""
+Construction time and memory per element.
+
+    $ python benchmarks/elements.py [count]
+
+Builds `count` vertices (1,000,000 by default), each with one property, and
+then links them into a chain of edges. Time is measured in a plain run, and
+memory in a second run under `tracemalloc`, so that tracing doesn't skew
+the timings.
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from pylgrim.element import Vertex
+
+
+def build(count):
+    vertices = [Vertex(name=i) for i in range(count)]
+    edges = [vertices[i].edgeto(vertices[i + 1]) for i in range(count - 1)]
+    return vertices, edges
+
+
+def vertices(count):
+    return [Vertex(name=i) for i in range(count)]
+
+
+def measure(fn, count):
+    start = time.perf_counter()
+    result = fn(count)
+    elapsed = time.perf_counter() - start
+    del result
+
+    tracemalloc.start()
+    result = fn(count)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return elapsed, size
+
+
+def main(count=1000000):
+    elapsed, size = measure(vertices, count)
+    print("vertices: {0:.2f} us/vertex, {1:.0f} bytes/vertex".format(
+        elapsed / count * 1e6, size / count))
+
+    elapsed, size = measure(build, count)
+    print("vertices + edges: {0:.2f} us/vertex, {1:.0f} bytes/vertex".format(
+        elapsed / count * 1e6, size / count))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
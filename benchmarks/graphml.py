@@ -0,0 +1,99 @@
+"""
+GraphML import/export throughput and peak memory.
+
+    $ python benchmarks/graphml.py [edges] [path]
+
+Writes a random GraphML file with `edges` edges (1,000,000 by default) and
+a tenth as many vertices, then loads it into a `Graph` and a `CompactGraph`
+and saves it back out. Each load runs in a fresh interpreter, so the peak
+RSS reported is that of the load alone.
+"""
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from pylgrim import CompactGraph, Graph
+
+
+def generate(path, edges, seed=0):
+    rng = random.Random(seed)
+    vertices = max(edges // 10, 2)
+    with open(path, 'w') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        f.write('<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n')
+        f.write('<key id="d0" for="node" attr.name="name" '
+                'attr.type="string"/>\n')
+        f.write('<key id="d1" for="edge" attr.name="weight" '
+                'attr.type="double"/>\n')
+        f.write('<graph id="G" edgedefault="directed">\n')
+        for i in range(vertices):
+            f.write('<node id="n{0}"><data key="d0">v{0}</data></node>\n'
+                    .format(i))
+        for i in range(edges):
+            f.write('<edge source="n{0}" target="n{1}">'
+                    '<data key="d1">{2}</data></edge>\n'.format(
+                        rng.randrange(vertices), rng.randrange(vertices),
+                        rng.random()))
+        f.write('</graph>\n</graphml>\n')
+
+
+def peakrss():
+    # kilobytes on linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+def load(kind, path):
+    klass = {'Graph': Graph, 'CompactGraph': CompactGraph}[kind]
+    before = peakrss()
+    start = time.perf_counter()
+    g = klass.loadgraphml(path)
+    loaded = time.perf_counter() - start
+    rss = peakrss()
+
+    with tempfile.NamedTemporaryFile('w', suffix='.xml') as out:
+        start = time.perf_counter()
+        g.savegraphml(out)
+        saved = time.perf_counter() - start
+
+    edges = len(g.E())
+    return {
+        'graph': kind,
+        'edges': edges,
+        'load_seconds': loaded,
+        'load_edges_per_second': edges / loaded,
+        'save_seconds': saved,
+        'save_edges_per_second': edges / saved,
+        'peak_rss_bytes': rss,
+        'baseline_rss_bytes': before,
+    }
+
+
+def main(edges=1000000, path=None):
+    if path is None:
+        path = os.path.join(tempfile.gettempdir(), 'pylgrim-bench.graphml')
+    generate(path, int(edges))
+    print("{0}: {1:.1f} MB".format(path, os.path.getsize(path) / 1e6))
+
+    for kind in ('Graph', 'CompactGraph'):
+        output = subprocess.check_output(
+            [sys.executable, __file__, '--load', kind, path])
+        result = json.loads(output.decode())
+        print("{graph}: load {load_edges_per_second:,.0f} edges/s, "
+              "save {save_edges_per_second:,.0f} edges/s, "
+              "peak RSS {mb:.0f} MB".format(
+                  mb=result['peak_rss_bytes'] / 1e6, **result))
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ['--load']:
+        print(json.dumps(load(sys.argv[2], sys.argv[3])))
+    else:
+        main(*sys.argv[1:])
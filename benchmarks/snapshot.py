@@ -0,0 +1,89 @@
+"""
+Snapshot save and open times, against rebuilding the same graph.
+
+    $ python benchmarks/snapshot.py [edges] [path]
+
+Builds a random `CompactGraph` with `edges` edges (2,000,000 by default), a
+tenth as many vertices and a `name` on each vertex, and saves it as a
+snapshot. Then, each in a fresh interpreter, times opening it with `mmap`,
+reading it into a `CompactGraph` and into a `Graph`, and one shortest path
+query on what was opened.
+"""
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from pylgrim import CompactGraph, Graph
+
+
+def build(edges, seed=0):
+    rng = random.Random(seed)
+    vertices = max(edges // 10, 2)
+    g = CompactGraph()
+    g.addvertices({'name': 'v{0}'.format(i)} for i in range(vertices))
+    g.addedges((rng.randrange(vertices), rng.randrange(vertices),
+                rng.random()) for _ in range(edges))
+    return g
+
+
+def peakrss():
+    # kilobytes on linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+KINDS = {
+    'mmap': (CompactGraph, True),
+    'CompactGraph': (CompactGraph, False),
+    'Graph': (Graph, False),
+}
+
+
+def open_(kind, path):
+    klass, mmap = KINDS[kind]
+    start = time.perf_counter()
+    g = klass.open(path, mmap=mmap)
+    opened = time.perf_counter() - start
+    start = time.perf_counter()
+    g.shortestpath(0, 1)
+    queried = time.perf_counter() - start
+    return {
+        'kind': kind,
+        'open_seconds': opened,
+        'query_seconds': queried,
+        'peak_rss_bytes': peakrss(),
+    }
+
+
+def main(edges=2000000, path=None):
+    if path is None:
+        path = os.path.join(tempfile.gettempdir(), 'pylgrim-bench.snap')
+    start = time.perf_counter()
+    g = build(int(edges))
+    print("build: {0:.2f}s".format(time.perf_counter() - start))
+    start = time.perf_counter()
+    g.save(path)
+    print("save: {0:.2f}s, {1:.1f} MB".format(
+        time.perf_counter() - start, os.path.getsize(path) / 1e6))
+
+    for kind in ('mmap', 'CompactGraph', 'Graph'):
+        output = subprocess.check_output(
+            [sys.executable, __file__, '--open', kind, path])
+        result = json.loads(output.decode())
+        print("open ({kind}): {open_seconds:.3f}s, first query "
+              "{query_seconds:.3f}s, peak RSS {mb:.0f} MB".format(
+                  mb=result['peak_rss_bytes'] / 1e6, **result))
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ['--open']:
+        print(json.dumps(open_(sys.argv[2], sys.argv[3])))
+    else:
+        main(*sys.argv[1:])
@@ -0,0 +1,272 @@
+"""
+The benchmark suite: construction, traversal, filtering and GraphML, on
+synthetic graphs of a chosen size, written out as JSON.
+
+    $ python benchmarks/suite.py [--vertices N] [--degree D] [--output FILE]
+    $ python benchmarks/suite.py --compare old.json new.json
+
+Three kinds of graph are generated, each with `vertices` vertices (10,000
+by default) and about `degree` edges out of each one (4 by default):
+
+    random      Erdős–Rényi: every edge joins two vertices picked uniformly
+    powerlaw    Barabási–Albert: each new vertex links to `degree` earlier
+                ones, picked in proportion to how many edges they already
+                have, so a few end up with very high degree
+    social      friends mostly within communities of 100, plus a handful of
+                supernodes that a fifth of everyone follows
+
+Every vertex has a `country` (skewed, so some values are rare) and an
+`age`; every edge has a `label`. For each graph the suite times
+
+    build       addvertex and addedge, one at a time
+    out/both    1 to 5 hop traversals from a sample of starting vertices,
+                each stopped after `--limit` results
+    filter      g.V() filters on equality and range, before and after
+                creating indexes, and one after a hop
+    graphml     savegraphml and loadgraphml of the whole graph
+
+Each timing is the best of `--repeat` runs. The JSON has the parameters,
+the Python version and platform, and one entry per benchmark; `--compare`
+prints how much each benchmark in two such files has changed, and exits
+with status 1 if any got slower by more than `--threshold`.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+from itertools import islice
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from pylgrim import Graph
+from pylgrim.predicates import gt, within
+
+COUNTRIES = ["US"] * 40 + ["UK"] * 15 + ["DE"] * 10 + ["NZ", "IS"]
+LABELS = ["knows", "likes", "follows"]
+
+
+def erdosrenyi(n, degree, rng):
+    """`n * degree` edges between uniformly random pairs of vertices"""
+    edges = []
+    for _ in range(n * degree):
+        s, t = rng.randrange(n), rng.randrange(n - 1)
+        edges.append((s, t + (t >= s), rng.choice(LABELS)))
+    return edges
+
+
+def barabasialbert(n, degree, rng):
+    """Preferential attachment, with `degree` edges from each new vertex"""
+    edges = []
+    # every vertex appears here once per edge it has, so a uniform pick
+    # from it is a pick in proportion to degree
+    ends = list(range(degree + 1))
+    for s in range(degree + 1, n):
+        targets = set()
+        while len(targets) < degree:
+            targets.add(rng.choice(ends))
+        for t in targets:
+            edges.append((s, t, rng.choice(LABELS)))
+            ends.append(t)
+        ends.extend([s] * degree)
+    return edges
+
+
+def social(n, degree, rng, community=100, supernodes=10, followers=0.2):
+    """
+    Friendships, nine in ten inside the vertex's own community, and
+    `supernodes` vertices followed by a fraction `followers` of everyone.
+    """
+    edges = []
+    for s in range(n):
+        base = s - s % community
+        for _ in range(degree):
+            if rng.random() < 0.9:
+                t = base + rng.randrange(min(community, n - base))
+            else:
+                t = rng.randrange(n)
+            if t != s:
+                edges.append((s, t, "knows"))
+    celebrities = rng.sample(range(n), min(supernodes, n))
+    for s in range(n):
+        if rng.random() < followers:
+            edges.append((s, rng.choice(celebrities), "follows"))
+    return edges
+
+
+GENERATORS = {
+    'random': erdosrenyi,
+    'powerlaw': barabasialbert,
+    'social': social,
+}
+
+
+def timed(fn, repeat):
+    """The best time of `repeat` calls of `fn`, and what it returned"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, result
+
+
+def build(n, edges, rng):
+    g = Graph()
+    vertices = [g.addvertex(country=rng.choice(COUNTRIES),
+                            age=rng.randrange(18, 90)) for _ in range(n)]
+    for s, t, label in edges:
+        g.addedge(vertices[s], vertices[t], label=label)
+    return g
+
+
+def hops(g, starts, direction, k, limit):
+    count = 0
+    for v in starts:
+        t = v.traverse()
+        for _ in range(k):
+            t = getattr(t, direction)()
+        count += sum(1 for _ in islice(t, limit))
+    return count
+
+
+def run(kind, n, degree, args):
+    rng = random.Random(args.seed)
+    edges = GENERATORS[kind](n, degree, rng)
+    results = []
+
+    def record(name, seconds, count=None, **params):
+        result = dict(graph=kind, benchmark=name, seconds=seconds,
+                      count=count, **params)
+        results.append(result)
+        print("{0:<10} {1:<40} {2:>10.4f}s".format(
+            kind, name + "".join(" {0}={1}".format(k, v)
+                                 for k, v in sorted(params.items())),
+            seconds), file=sys.stderr)
+
+    seconds, g = timed(lambda: build(n, edges, random.Random(args.seed)),
+                       args.repeat)
+    record('build', seconds, len(g.E()), vertices=n, edges=len(edges))
+
+    V = g.V()
+    starts = [V[i] for i in rng.sample(range(n), min(args.starts, n))]
+    for direction in ('out', 'both'):
+        for k in range(1, 6):
+            seconds, count = timed(
+                lambda: hops(g, starts, direction, k, args.limit),
+                args.repeat)
+            record(direction, seconds, count, hops=k)
+
+    filters = [
+        ('equal', {'country': "NZ"}),
+        ('range', {'age': gt(80)}),
+        ('within', {'country': within("NZ", "IS")}),
+        ('two', {'country': "UK", 'age': gt(60)}),
+    ]
+    for indexed in (False, True):
+        if indexed:
+            g.createindex("country")
+            g.createindex("age")
+            g.createlabelindex()
+        for name, kwds in filters:
+            seconds, result = timed(lambda: g.V(**kwds), args.repeat)
+            record('filter', seconds, len(result), indexed=indexed,
+                   filter=name)
+        seconds, count = timed(
+            lambda: g.traverse().out(label="knows").filter(
+                country="NZ").count(), args.repeat)
+        record('filter', seconds, count, indexed=indexed, filter='hop')
+
+    buffer = io.StringIO()
+    seconds, _ = timed(lambda: g.savegraphml(io.StringIO()), args.repeat)
+    g.savegraphml(buffer)
+    record('graphml', seconds, direction='save', bytes=len(buffer.getvalue()))
+    seconds, h = timed(lambda: Graph.loadgraphml(
+        io.StringIO(buffer.getvalue())), args.repeat)
+    record('graphml', seconds, len(h.E()), direction='load')
+    return results
+
+
+def key(result):
+    params = sorted((k, v) for k, v in result.items()
+                    if k not in ('seconds', 'count', 'bytes'))
+    return json.dumps(params)
+
+
+def compare(old, new, threshold):
+    with open(old) as f:
+        before = dict((key(r), r) for r in json.load(f)['results'])
+    with open(new) as f:
+        after = json.load(f)['results']
+    slower = 0
+    for result in after:
+        previous = before.get(key(result))
+        if previous is None:
+            continue
+        ratio = result['seconds'] / max(previous['seconds'], 1e-9)
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  SLOWER"
+            slower += 1
+        params = ", ".join("{0}={1}".format(k, v)
+                           for k, v in sorted(result.items())
+                           if k not in ('graph', 'benchmark', 'seconds',
+                                        'count', 'bytes'))
+        print("{0:<10} {1:<8} {2:<34} {3:>9.4f}s {4:>9.4f}s {5:>6.2f}x{6}"
+              .format(result['graph'], result['benchmark'], params,
+                      previous['seconds'], result['seconds'], ratio, flag))
+    return 1 if slower else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Time pylgrim on synthetic graphs")
+    parser.add_argument('--vertices', type=int, default=10000)
+    parser.add_argument('--degree', type=int, default=4)
+    parser.add_argument('--graphs', default=",".join(sorted(GENERATORS)),
+                        help="which graphs, of " + ", ".join(
+                            sorted(GENERATORS)))
+    parser.add_argument('--starts', type=int, default=20,
+                        help="starting vertices for the traversals")
+    parser.add_argument('--limit', type=int, default=100000,
+                        help="results to stop each traversal after")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="where to write the JSON, "
+                        "instead of standard output")
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'))
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="how much slower counts as a regression")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        return compare(args.compare[0], args.compare[1], args.threshold)
+
+    results = []
+    for kind in args.graphs.split(","):
+        results.extend(run(kind, args.vertices, args.degree, args))
+    report = {
+        'parameters': dict((k, v) for k, v in vars(args).items()
+                           if k not in ('output', 'compare', 'threshold')),
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'results': results,
+    }
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
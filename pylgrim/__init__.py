@@ -1,2 +1,2 @@
 from pylgrim.pylgrim import Graph
-
+from pylgrim.compact import CompactGraph
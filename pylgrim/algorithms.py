@@ -0,0 +1,228 @@
+"""
+Shortest paths.
+
+Everything here works on plain integers: vertex and edge `idx` numbers,
+walked through the CSR arrays a graph hands out from `_adjacency()`, and
+edge weights read out of a list indexed by edge. No `Vertex`, `Edge` or
+`ElementList` is touched until the finished paths are turned back into
+elements, so a query only costs as much as the part of the graph it has
+to explore.
+
+An edge with no weight costs 1, and negative weights raise ValueError.
+`Graph.shortestpath` and `Graph.kshortestpaths` are the way in:
+
+    >>> g.shortestpath(a, b)
+    <Path 3.5: 0 -> 2 -> 1>
+"""
+from heapq import heappop, heappush
+
+from pylgrim.element import ElementList
+
+INFINITY = float('inf')
+
+
+class Path(object):
+    """A path through a graph, as its vertices, its edges, and its cost"""
+    __slots__ = ('cost', 'vertices', 'edges')
+
+    def __init__(self, cost, vertices, edges):
+        self.cost = cost
+        self.vertices = vertices
+        self.edges = edges
+
+    def __len__(self):
+        return len(self.edges)
+
+    def __bool__(self):
+        # a path from a vertex to itself has no edges, but is still a path
+        return True
+
+    __nonzero__ = __bool__
+
+    def __iter__(self):
+        return iter(self.vertices)
+
+    def __eq__(self, other):
+        return (isinstance(other, Path) and self.cost == other.cost and
+                self.edges == other.edges)
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return "<Path {0}: {1}>".format(self.cost, " -> ".join(
+            str(v.idx) for v in self.vertices))
+
+
+def _cost(weights, e):
+    if weights is None:
+        return 1
+    w = weights[e]
+    if w is None:
+        return 1
+    if w < 0:
+        raise ValueError("Edge {0} has negative weight {1!r}".format(e, w))
+    return w
+
+
+def _walk(parents, sources, src, dst):
+    # follow the parent edges back from `dst`
+    vertices, edges = [dst], []
+    v = dst
+    while v != src:
+        e = parents[v]
+        edges.append(e)
+        v = sources[e]
+        vertices.append(v)
+    vertices.reverse()
+    edges.reverse()
+    return vertices, edges
+
+
+def dijkstra(adjacency, weights, src, dst, heuristic=None,
+             blockedvertices=(), blockededges=()):
+    """
+    The cheapest path from vertex `src` to vertex `dst`, as a tuple of
+    `(cost, [vertex idx, ...], [edge idx, ...])`, or None if there isn't one.
+
+    With a `heuristic`, a function of a vertex idx giving a lower bound on
+    its cost to `dst`, this is A*. `blockedvertices` and `blockededges` are
+    left out of the search, which is what Yen's algorithm needs.
+    """
+    if src in blockedvertices:
+        return None
+    offsets = adjacency.out.offsets
+    neighbours = adjacency.out.neighbours
+    edges = adjacency.out.edges
+
+    dist = {src: 0}
+    parents = {}
+    done = set()
+    heap = [(heuristic(src) if heuristic else 0, src)]
+    while heap:
+        _, v = heappop(heap)
+        if v == dst:
+            break
+        if v in done:
+            continue
+        done.add(v)
+        d = dist[v]
+        for i in range(offsets[v], offsets[v + 1]):
+            w = neighbours[i]
+            if w in done or w in blockedvertices:
+                continue
+            e = edges[i]
+            if e in blockededges:
+                continue
+            c = 1 if weights is None else weights[e]
+            if c is None:
+                c = 1
+            elif c < 0:
+                raise ValueError(
+                        "Edge {0} has negative weight {1!r}".format(e, c))
+            nd = d + c
+            if nd < dist.get(w, INFINITY):
+                dist[w] = nd
+                parents[w] = e
+                heappush(heap, (nd + heuristic(w) if heuristic else nd, w))
+    else:
+        return None
+
+    vertices, path = _walk(parents, adjacency.sources, src, dst)
+    return dist[dst], vertices, path
+
+
+def bidirectional(adjacency, weights, src, dst):
+    """
+    `dijkstra`, searching forwards from `src` and backwards from `dst` at
+    the same time, which usually settles far fewer vertices.
+    """
+    if src == dst:
+        return 0, [src], []
+    # index 0 searches forwards along out-edges, 1 backwards along in-edges
+    csrs = (adjacency.out, adjacency.in_)
+    dist = ({src: 0}, {dst: 0})
+    parents = ({}, {})
+    done = (set(), set())
+    heaps = ([(0, src)], [(0, dst)])
+    best, meeting = INFINITY, None
+
+    while heaps[0] and heaps[1]:
+        if heaps[0][0][0] + heaps[1][0][0] >= best:
+            break
+        side = 0 if heaps[0][0][0] <= heaps[1][0][0] else 1
+        d, v = heappop(heaps[side])
+        if v in done[side]:
+            continue
+        done[side].add(v)
+        csr = csrs[side]
+        ours, theirs = dist[side], dist[1 - side]
+        for i in range(csr.offsets[v], csr.offsets[v + 1]):
+            w = csr.neighbours[i]
+            e = csr.edges[i]
+            nd = d + _cost(weights, e)
+            if nd < ours.get(w, INFINITY):
+                ours[w] = nd
+                parents[side][w] = e
+                heappush(heaps[side], (nd, w))
+            if w in theirs and ours[w] + theirs[w] < best:
+                best, meeting = ours[w] + theirs[w], w
+
+    if meeting is None:
+        return None
+    forwards, fedges = _walk(parents[0], adjacency.sources, src, meeting)
+    backwards, bedges = _walk(parents[1], adjacency.targets, dst, meeting)
+    backwards.reverse()
+    bedges.reverse()
+    return best, forwards + backwards[1:], fedges + bedges
+
+
+def yen(adjacency, weights, src, dst, k):
+    """
+    The `k` cheapest loopless paths from `src` to `dst`, cheapest first, as
+    `dijkstra` tuples. There may be fewer than `k` of them.
+    """
+    first = dijkstra(adjacency, weights, src, dst)
+    if first is None:
+        return []
+    found = [first]
+    seen = set([tuple(first[2])])
+    candidates = []
+
+    while len(found) < k:
+        _, vertices, edges = found[-1]
+        for i in range(len(edges)):
+            spur = vertices[i]
+            root = vertices[:i + 1]
+            # don't leave the spur vertex the way any path found so far
+            # with this same root does, or go back through the root
+            blockededges = set(p[2][i] for p in found
+                               if len(p[2]) > i and p[2][:i] == edges[:i])
+            rest = dijkstra(adjacency, weights, spur, dst,
+                            blockedvertices=set(root[:-1]),
+                            blockededges=blockededges)
+            if rest is None:
+                continue
+            path = edges[:i] + rest[2]
+            if tuple(path) in seen:
+                continue
+            seen.add(tuple(path))
+            cost = sum(_cost(weights, e) for e in edges[:i]) + rest[0]
+            heappush(candidates, (cost, len(path), path,
+                                  root[:-1] + rest[1]))
+        if not candidates:
+            break
+        cost, _, path, pathvertices = heappop(candidates)
+        found.append((cost, pathvertices, path))
+    return found
+
+
+def topath(graph, result):
+    """Turn a `dijkstra` tuple into a `Path` of `graph`'s elements"""
+    if result is None:
+        return None
+    cost, vertices, edges = result
+    return Path(cost, ElementList(graph.v(v) for v in vertices),
+                ElementList(graph.e(e) for e in edges))
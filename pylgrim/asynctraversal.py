@@ -0,0 +1,136 @@
+"""
+Traversals of a storage adapter, run one step at a time from an event loop.
+
+    >>> t = store.traverse(0).out(label="knows").out().filter(country="NZ")
+    >>> vertices = await t.toList()
+
+A `Traversal` of an in-memory graph pulls one element at a time through all
+of its steps. Against a store where every read is a round trip, that would
+be a round trip for every vertex, so an `AsyncTraversal` works breadth
+first instead: each step takes the whole frontier (the ids the step before
+it reached) and makes one batched call to the adapter for all of them,
+awaiting it so that other traversals can run in the meantime:
+
+    out(), in_(), both()    one `adjacent` call per step, for every
+                            distinct vertex in the frontier
+    filter()                one `vertices` call, for the vertices of the
+                            frontier that haven't been read yet
+    values()                the same
+
+Vertices read by one step are kept until the traversal finishes, so no
+vertex is read twice. See `pylgrim.storage`.
+"""
+from pylgrim.element import ALL, ElementList
+from pylgrim.planner import describe
+from pylgrim.predicates import compilefilters
+
+_ADJACENT = frozenset(['out', 'in_', 'both'])
+
+
+def _distinct(ids):
+    return list(dict.fromkeys(ids))
+
+
+class _Run(object):
+    # the state of one run of an AsyncTraversal
+    def __init__(self, storage, ids):
+        self.storage = storage
+        self.ids = list(ids)
+        self.read = {}
+
+    async def vertices(self, ids):
+        # the vertices with `ids`, reading the ones that haven't been yet
+        missing = [id_ for id_ in _distinct(ids) if id_ not in self.read]
+        if missing:
+            for id_, v in zip(missing, await self.storage.vertices(missing)):
+                self.read[id_] = v
+        return [self.read[id_] for id_ in ids]
+
+    async def adjacent(self, step, kwds):
+        kwds = dict(kwds)
+        label = kwds.pop('label', ALL)
+        frontier = _distinct(self.ids)
+        reached = dict(zip(frontier, await self.storage.adjacent(
+            frontier, step, label)))
+        self.ids = [other for id_ in self.ids for other in reached[id_]]
+        if kwds:
+            await self.filter((), kwds)
+
+    async def filter(self, closures, filters):
+        test = compilefilters(filters, closures)
+        vertices = await self.vertices(self.ids)
+        self.ids = [v.id for v in vertices if test(v)]
+
+
+class AsyncTraversal(object):
+    """
+    The steps of a traversal of a storage adapter, from the vertices with
+    ids `starts`. Like a `Traversal`, every step returns a new one; the
+    results are read with the coroutines `toList`, `ids` and `count`.
+    """
+    def __init__(self, storage, starts, steps=()):
+        self._storage = storage
+        self._starts = tuple(starts)
+        self._steps = tuple(steps)
+
+    def _add(self, name, args=(), kwds=None):
+        if self._steps and self._steps[-1][0] == 'values':
+            raise ValueError("values() has to be the last step")
+        step = (name, tuple(args), dict(kwds or {}))
+        return AsyncTraversal(self._storage, self._starts,
+                              self._steps + (step,))
+
+    def out(self, **kwds):
+        return self._add('out', kwds=kwds)
+
+    def in_(self, **kwds):
+        return self._add('in_', kwds=kwds)
+
+    def both(self, **kwds):
+        return self._add('both', kwds=kwds)
+
+    def filter(self, *closures, **filters):
+        return self._add('filter', closures, filters)
+
+    def values(self, name):
+        return self._add('values', (name,))
+
+    async def _run(self):
+        run = _Run(self._storage, self._starts)
+        for name, args, kwds in self._steps:
+            if name in _ADJACENT:
+                await run.adjacent(name, kwds)
+            elif name == 'filter':
+                await run.filter(args, kwds)
+        return run
+
+    async def ids(self):
+        """
+        The ids of the vertices the traversal reaches, without reading them
+        """
+        if self._steps and self._steps[-1][0] == 'values':
+            raise ValueError("{0} doesn't end on vertices".format(self))
+        return (await self._run()).ids
+
+    async def count(self):
+        """The number of results"""
+        if self._steps and self._steps[-1][0] == 'values':
+            return len(await self.toList())
+        return len((await self._run()).ids)
+
+    async def toList(self):
+        """
+        The vertices the traversal reaches, read from the store, or their
+        values if the last step is `values(name)`
+        """
+        run = await self._run()
+        vertices = await run.vertices(run.ids)
+        if self._steps and self._steps[-1][0] == 'values':
+            name = self._steps[-1][1][0]
+            return ElementList(getattr(v, name) for v in vertices
+                               if hasattr(v, name))
+        return ElementList(vertices)
+
+    def __repr__(self):
+        steps = [describe(*step) for step in self._steps]
+        return "<AsyncTraversal: {0}>".format(".".join(steps) or "_")
@@ -0,0 +1,175 @@
+"""
+A cache of traversal results, for graphs that answer the same traversals
+over and over.
+
+    >>> g = Graph(cache=ResultCache(maxsize=10000, ttl=60))
+    >>> g.traverse(v).out(label="knows").out().toList()    # runs it
+    >>> g.traverse(v).out(label="knows").out().toList()    # doesn't
+
+Results are keyed by the traversal's steps, as the planner merges and folds
+them (so `outE().inV()` and `out()` share an entry), and the ids of the
+elements it starts from.
+
+Each entry remembers the vertices the traversal went through, and the
+version of each. The graph gives a vertex a new version whenever an edge to
+or from it is added or removed, or a property of it or of one of its edges
+is set, so an entry is used for exactly as long as none of the vertices it
+depends on have changed. A traversal of the whole graph, or one the planner
+starts from an index lookup, can depend on any vertex, and its entry is only
+used until the graph changes at all.
+
+Only traversals that are run to the end are stored, and only those whose
+steps are given plain values and `pylgrim.predicates`: a function in a
+filter could depend on anything, and `aggregate` is run for what it does, so
+those are always run. Traversals that are explained, profiled or heard about
+by a hook (see `pylgrim.hooks`) are always run too.
+"""
+import threading
+
+from collections import OrderedDict
+from time import monotonic
+
+from pylgrim.element import Edge
+from pylgrim.planner import describe
+from pylgrim.predicates import Predicate
+
+# the values a step can be given and still be cached; they're told apart by
+# their repr
+_LITERALS = (type(None), bool, int, float, complex, str, bytes)
+
+# the arguments of a loop step that aren't filters on the vertices it reaches
+_LOOPING = frozenset(['step', 'depth', 'emit', 'order', 'label'])
+
+
+def _literal(value):
+    if isinstance(value, Predicate):
+        return _literal(getattr(value, 'value', Predicate))
+    if isinstance(value, (tuple, frozenset)):
+        return all(_literal(v) for v in value)
+    return isinstance(value, _LITERALS)
+
+
+class ResultCache(object):
+    """
+    The results of up to `maxsize` traversals, the least recently used of
+    which are evicted to make room for more. With a `ttl`, results are
+    only used for that many seconds after they were stored.
+    """
+    def __init__(self, maxsize=1024, ttl=None):
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1, not {0!r}".format(
+                maxsize))
+        self.maxsize = maxsize
+        self.ttl = ttl
+        # key -> (graph, results, footprint, version, time stored)
+        self._entries = OrderedDict()
+        # a concurrent graph runs traversals, and so fills the cache, from
+        # several threads at once
+        self._mutex = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.expirations = 0
+
+    def key(self, starts, steps):
+        """
+        The key for `steps` (already normalized by the planner) from
+        `starts`, or None if the traversal can't be cached.
+        """
+        for name, args, kwds in steps:
+            if name == 'aggregate' or not all(
+                    _literal(v) for v in args + tuple(kwds.values())):
+                return None
+            if name == 'loop' and set(kwds) - _LOOPING:
+                # it tests vertices it never emits, so the results depend
+                # on more than the vertices they went through
+                return None
+        key = tuple(describe(*step) for step in steps)
+        if starts is None:
+            return key, None
+        if not hasattr(starts, '__len__'):
+            # reading the ids would use up an iterator
+            return None
+        ids = []
+        for start in starts:
+            id_ = getattr(start, 'id', None)
+            if id_ is None:
+                return None
+            ids.append((isinstance(start, Edge), id_))
+        return key, tuple(ids)
+
+    def get(self, key, graph):
+        """The results stored for `key`, or None if they're missing or stale"""
+        with self._mutex:
+            return self._get(key, graph)
+
+    def _get(self, key, graph):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        owner, results, footprint, version, stored = entry
+        if self.ttl is not None and monotonic() - stored > self.ttl:
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        if owner is not graph or not _current(graph, footprint, version):
+            del self._entries[key]
+            self.invalidations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return results
+
+    def put(self, key, graph, results, footprint, version):
+        """
+        Store `results` for `key`. `footprint` is a tuple of the (vertex,
+        version) pairs they depend on, or None if they depend on the whole
+        graph, at `version`.
+        """
+        with self._mutex:
+            entries = self._entries
+            entries[key] = (graph, results, footprint, version, monotonic())
+            entries.move_to_end(key)
+            while len(entries) > self.maxsize:
+                entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._mutex:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """
+        A dict of the number of `hits` and `misses`, of entries evicted to
+        make room (`evictions`), found to be stale (`invalidations`) or
+        past their ttl (`expirations`), and the current `size`.
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+            'expirations': self.expirations,
+            'size': len(self._entries),
+        }
+
+
+def _current(graph, footprint, version):
+    if graph._version == version:
+        return True
+    if footprint is None:
+        return False
+    versions = graph._versions
+    for vertex, seen in footprint:
+        # a removed vertex leaves its graph, and its version with it
+        if versions.get(vertex, 0) != seen or \
+                getattr(vertex, '_graph', graph) is not graph:
+            return False
+    return True
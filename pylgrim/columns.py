@@ -0,0 +1,298 @@
+"""
+Columnar property storage.
+
+A `Graph(columnar=True)` keeps the properties of its vertices and edges
+out of their `__dict__`s, in one `Column` per property key instead. A
+column is a typed array indexed by `idx`, plus a bitmap of which elements
+have the property at all:
+
+    bool                    array('b')
+    int                     array('q'), while every value fits in 64 bits
+    float                   array('d')
+    str                     array('i') of codes into a table of distinct
+                            strings, so each string is stored once
+    anything else           a list
+
+A column starts out typed by the first value written to it, and becomes a
+list if a value of another type ever turns up.
+
+Filters and projections on `g.V()` and `g.E()` run down whole columns
+rather than element by element. Comparisons are mapped over the array by
+the `operator` functions, so the loop stays in C, and a filter on a string
+column is only tested once per distinct string:
+
+    >>> g = Graph(columnar=True)
+    >>> g.V(age=gt(30), town="Flint")
+    >>> g.E().weight
+"""
+from array import array
+from itertools import compress, repeat
+from operator import and_, eq, ge, gt as gt_, le, lt as lt_, or_, truth
+
+from pylgrim.element import ElementList
+from pylgrim.index import MISSING
+from pylgrim.predicates import gt, gte, lt, lte, within, without
+
+_KINDS = {bool: 'bool', int: 'int', float: 'float', str: 'str'}
+_TYPECODES = {'bool': 'b', 'int': 'q', 'float': 'd', 'str': 'i'}
+_INT64 = (-2 ** 63, 2 ** 63)
+
+_OPERATORS = {gt: gt_, gte: ge, lt: lt_, lte: le}
+
+# byte -> its 8 bits as 8 bytes of 0 or 1, lowest bit first
+_EXPAND = [bytes((b >> k) & 1 for k in range(8)) for b in range(256)]
+_FLIP = bytes.maketrans(b'\x00\x01', b'\x01\x00')
+
+
+def _kind(value):
+    kind = _KINDS.get(type(value), 'object')
+    if kind == 'int' and not _INT64[0] <= value < _INT64[1]:
+        return 'object'
+    return kind
+
+
+class Column(object):
+    """The values of one property for every element of a graph, by idx"""
+    def __init__(self):
+        self.kind = None
+        self.values = None
+        self.bits = bytearray()
+        self.size = 0
+        # for 'str' columns: code -> string, and string -> code
+        self.table = []
+        self.codes = {}
+
+    def _grow(self, n):
+        if n <= self.size:
+            return
+        extra = n - self.size
+        if self.kind == 'object':
+            self.values.extend(repeat(None, extra))
+        else:
+            self.values.frombytes(bytes(extra * self.values.itemsize))
+        self.bits.extend(bytes((n + 7) // 8 - len(self.bits)))
+        self.size = n
+
+    def _widen(self):
+        # a value that doesn't fit the array: fall back to a list
+        self.values = [self.get(i) for i in range(self.size)]
+        self.values = [None if v is MISSING else v for v in self.values]
+        self.kind = 'object'
+        self.table = []
+        self.codes = {}
+
+    def get(self, i):
+        if i >= self.size or not self.bits[i >> 3] >> (i & 7) & 1:
+            return MISSING
+        value = self.values[i]
+        if self.kind == 'str':
+            return self.table[value]
+        if self.kind == 'bool':
+            return value != 0
+        return value
+
+    def set(self, i, value):
+        if self.kind is None:
+            self.kind = _kind(value)
+            typecode = _TYPECODES.get(self.kind)
+            self.values = [] if typecode is None else array(typecode)
+        elif self.kind != 'object' and _kind(value) != self.kind:
+            self._widen()
+        self._grow(i + 1)
+        if self.kind == 'str':
+            code = self.codes.get(value)
+            if code is None:
+                code = self.codes[value] = len(self.table)
+                self.table.append(value)
+            value = code
+        self.values[i] = value
+        self.bits[i >> 3] |= 1 << (i & 7)
+
+    def unset(self, i):
+        if i < self.size:
+            self.bits[i >> 3] &= ~(1 << (i & 7)) & 0xff
+            if self.kind == 'object':
+                self.values[i] = None
+
+    def move(self, src, dst):
+        value = self.get(src)
+        if value is MISSING:
+            self.unset(dst)
+        else:
+            self.set(dst, value)
+
+    def truncate(self, n):
+        if n >= self.size:
+            return
+        del self.values[n:]
+        del self.bits[(n + 7) // 8:]
+        if n & 7:
+            self.bits[-1] &= (1 << (n & 7)) - 1
+        self.size = n
+
+    def present(self, n):
+        """A byte per row for the first `n` rows, 1 where there's a value"""
+        present = b''.join(map(_EXPAND.__getitem__, self.bits))[:n]
+        return present + bytes(n - len(present))
+
+    def decoded(self):
+        """Every row's value, with nonsense in the rows that have none"""
+        if self.kind == 'str':
+            return map(self.table.__getitem__, self.values)
+        if self.kind == 'bool':
+            return map(truth, self.values)
+        return self.values
+
+    def _tests(self, filter_):
+        # an iterable of whether each row passes `filter_`, computed a whole
+        # column at a time
+        values = self.values
+        if self.kind == 'str':
+            # only test each distinct string once
+            if callable(filter_):
+                codes = frozenset(code for code, s in enumerate(self.table)
+                                  if filter_(s))
+                return map(codes.__contains__, values)
+            code = self.codes.get(filter_)
+            if code is None:
+                return repeat(False, self.size)
+            return map(eq, values, repeat(code))
+        if not callable(filter_):
+            return map(eq, self.decoded(), repeat(filter_))
+        if self.kind != 'object':
+            op = _OPERATORS.get(type(filter_))
+            if op is not None:
+                return map(op, values, repeat(filter_.value))
+            if type(filter_) in (within, without):
+                found = map(frozenset(filter_.value).__contains__, values)
+                if type(filter_) is without:
+                    return map(eq, found, repeat(False))
+                return found
+        return map(truth, map(filter_, self.decoded()))
+
+    def mask(self, filter_, n):
+        """A byte per row for the first `n` rows, 1 where `filter_` passes"""
+        self._grow(n)
+        present = self.present(n)
+        try:
+            mask = bytes(self._tests(filter_))
+        except TypeError:
+            # values that don't compare with the filter's: test them one
+            # by one, the way a scan would
+            mask = bytes(map(truth, map(_test(filter_), self.decoded())))
+        if 0 in present:
+            # a missing property is tested as None, like everywhere else
+            if (filter_(None) if callable(filter_) else filter_ is None):
+                mask = bytes(map(or_, mask, present.translate(_FLIP)))
+            else:
+                mask = bytes(map(and_, mask, present))
+        return mask
+
+
+def _test(filter_):
+    if callable(filter_):
+        return filter_
+    return lambda value: value == filter_
+
+
+class ColumnStore(object):
+    """
+    The property columns of a graph's vertices, or of its edges.
+
+    `fields` are element attributes that are kept in columns too, like an
+    edge's `weight`, but aren't properties: they're left out of `row()`,
+    and read as None rather than missing.
+    """
+    def __init__(self, fields=()):
+        self._columns = {}
+        self.fields = frozenset(fields)
+
+    def __contains__(self, key):
+        return key in self._columns
+
+    def get(self, key, idx):
+        column = self._columns.get(key)
+        return MISSING if column is None else column.get(idx)
+
+    def set(self, key, idx, value):
+        column = self._columns.get(key)
+        if column is None:
+            column = self._columns[key] = Column()
+        column.set(idx, value)
+
+    def unset(self, key, idx):
+        column = self._columns.get(key)
+        if column is not None:
+            column.unset(idx)
+
+    def row(self, idx):
+        """The properties of element `idx`, as a dict"""
+        row = {}
+        for key, column in self._columns.items():
+            if key not in self.fields:
+                value = column.get(idx)
+                if value is not MISSING:
+                    row[key] = value
+        return row
+
+    def setrow(self, idx, properties):
+        for key, value in properties.items():
+            self.set(key, idx, value)
+
+    def take(self, idx, last):
+        """
+        Remove the values of element `idx`, returning them as a dict with
+        its fields, and move the values of element `last` into its place.
+        """
+        row = {}
+        for key, column in self._columns.items():
+            value = column.get(idx)
+            if value is not MISSING:
+                row[key] = value
+            if last != idx:
+                column.move(last, idx)
+            column.truncate(last)
+        return row
+
+    def filter(self, elements, filters):
+        """
+        The `elements` (every element of the graph, in idx order) matching
+        `filters`, or None when none of the filters is on a column.
+        """
+        keys = [key for key in filters if key in self._columns]
+        if not keys:
+            return None
+        n = len(elements)
+        mask = None
+        for key in keys:
+            m = self._columns[key].mask(filters[key], n)
+            mask = m if mask is None else bytes(map(and_, mask, m))
+        result = ElementList(compress(elements, mask))
+        rest = dict((k, v) for k, v in filters.items() if k not in keys)
+        return result.filter(**rest) if rest else result
+
+    def project(self, key, n):
+        """
+        The values of `key` for the first `n` elements, skipping elements
+        without one, or with None for them if `key` is a field.
+        """
+        column = self._columns[key]
+        column._grow(n)
+        present = column.present(n)
+        if 0 not in present:
+            return list(column.decoded())
+        if key in self.fields:
+            return [v if p else None
+                    for p, v in zip(present, column.decoded())]
+        return list(compress(column.decoded(), present))
+
+    def values(self, key, n):
+        """The values of `key` for the first `n` elements, None if missing"""
+        if key not in self._columns:
+            return [None] * n
+        column = self._columns[key]
+        column._grow(n)
+        present = column.present(n)
+        if 0 not in present:
+            return list(column.decoded())
+        return [v if p else None for p, v in zip(present, column.decoded())]
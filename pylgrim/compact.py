@@ -0,0 +1,693 @@
+"""
+Array-backed graph storage.
+
+`CompactGraph` keeps no `Vertex` or `Edge` objects around at all. Vertices
+and edges are just the `idx` numbers that `Graph.addvertex` and
+`Graph.addedge` hand out, and adjacency lives in flat integer arrays:
+
+    src[e], dst[e]          the endpoints of edge `e`
+
+which `compact()` turns into CSR (compressed sparse row) form, one for each
+direction, so that the out-edges of vertex `v` are the slice
+
+    edges[offsets[v]:offsets[v + 1]]
+
+`VertexView` and `EdgeView` are thin, throwaway handles onto those arrays.
+They're only created when something asks for them, and two views of the
+same `idx` compare equal.
+"""
+from array import array
+from itertools import chain
+from operator import add, sub
+
+from pylgrim.element import ALL, Edge, ElementList, Vertex
+from pylgrim.index import MISSING, lookup
+from pylgrim.pylgrim import Graph
+
+# 64-bit signed integers on every platform, unlike 'l'
+TYPECODE = 'q'
+
+
+class CSR(object):
+    """
+    One direction of adjacency in compressed sparse row form.
+
+    `edges` holds edge indexes grouped by vertex, and `neighbours` holds the
+    vertex at the other end of each of those edges, so both can be sliced
+    with the same `offsets`. Within a vertex, edges stay in the order they
+    were added.
+    """
+    def __init__(self, nvertices, sources, targets):
+        offsets = array(TYPECODE, [0]) * (nvertices + 1)
+        for s in sources:
+            offsets[s + 1] += 1
+        for v in range(nvertices):
+            offsets[v + 1] += offsets[v]
+
+        edges = array(TYPECODE, [0]) * len(sources)
+        neighbours = array(TYPECODE, [0]) * len(sources)
+        position = array(TYPECODE, offsets)
+        for e, s in enumerate(sources):
+            p = position[s]
+            edges[p] = e
+            neighbours[p] = targets[e]
+            position[s] = p + 1
+
+        self.offsets = offsets
+        self.edges = edges
+        self.neighbours = neighbours
+
+    @classmethod
+    def fromarrays(cls, offsets, edges, neighbours):
+        """A CSR over arrays that have already been built, say by a snapshot"""
+        csr = cls.__new__(cls)
+        csr.offsets = offsets
+        csr.edges = edges
+        csr.neighbours = neighbours
+        return csr
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def edgesof(self, v):
+        if v >= len(self):
+            return ()
+        return self.edges[self.offsets[v]:self.offsets[v + 1]]
+
+    def degree(self, v):
+        if v >= len(self):
+            return 0
+        return self.offsets[v + 1] - self.offsets[v]
+
+    def neighboursof(self, v):
+        if v >= len(self):
+            return ()
+        return self.neighbours[self.offsets[v]:self.offsets[v + 1]]
+
+
+class Adjacency(object):
+    """
+    Both directions of CSR adjacency plus the two ends of every edge, which
+    is everything `pylgrim.algorithms` needs to know about a graph.
+    """
+    def __init__(self, sources, targets, out, in_):
+        self.sources = sources
+        self.targets = targets
+        self.out = out
+        self.in_ = in_
+
+    @classmethod
+    def build(cls, nvertices, sources, targets):
+        return cls(sources, targets, CSR(nvertices, sources, targets),
+                   CSR(nvertices, targets, sources))
+
+
+class CompactStore(object):
+    """
+    Column storage for the vertices and edges of a `CompactGraph`.
+
+    Edges added since the last `compact()` are kept in small per-vertex
+    lists and returned after the compacted ones, so the graph can still be
+    queried while it's being built. Calling `compact()` after a big load
+    folds them into the CSR arrays.
+    """
+    def __init__(self):
+        self.vobj = []
+        self.vlabel = []
+        self.vprops = []
+
+        self.src = array(TYPECODE)
+        self.dst = array(TYPECODE)
+        self.weight = []
+        # edge labels are interned, most graphs only have a handful
+        self.elabel = array('i')
+        self.labels = []
+        self._labelcodes = {}
+        self.eprops = []
+
+        self._out = CSR(0, (), ())
+        self._in = CSR(0, (), ())
+        self._pendingout = {}
+        self._pendingin = {}
+
+        # vertex and edge ids, when they aren't just the idx numbers, which
+        # is only ever in a graph opened from a snapshot, see `IdColumn`
+        self.vids = None
+        self.eids = None
+
+        # the CompactGraph to tell about property writes
+        self.graph = None
+
+    def nvertices(self):
+        return len(self.vobj)
+
+    def nedges(self):
+        return len(self.src)
+
+    def addvertex(self, obj=None, label=None, props=None):
+        self.vobj.append(obj)
+        self.vlabel.append(label)
+        self.vprops.append(props or None)
+        if self.vids is not None:
+            self.vids.allocate()
+        return len(self.vobj) - 1
+
+    def addedge(self, from_, to, weight=None, label=None, props=None):
+        if not (0 <= from_ < len(self.vobj) and 0 <= to < len(self.vobj)):
+            raise IndexError(
+                    "No such vertex for edge {0} -> {1}".format(from_, to))
+        self._writable()
+        e = len(self.src)
+        self.src.append(from_)
+        self.dst.append(to)
+        self.weight.append(weight)
+        self.elabel.append(self.labelcode(label))
+        self.eprops.append(props or None)
+        if self.eids is not None:
+            self.eids.allocate()
+        self._pendingout.setdefault(from_, []).append(e)
+        self._pendingin.setdefault(to, []).append(e)
+        return e
+
+    def addvertices(self, iterable):
+        start = len(self.vobj)
+        for kwds in iterable:
+            kwds = dict(kwds) if kwds else {}
+            self.vobj.append(kwds.pop('obj', None))
+            self.vlabel.append(kwds.pop('label', None))
+            self.vprops.append(kwds or None)
+            if self.vids is not None:
+                self.vids.allocate()
+        return range(start, len(self.vobj))
+
+    def addedges(self, iterable):
+        """
+        Append every `(from_, to[, weight[, label[, props]]])` tuple of vertex
+        indexes in `iterable` as an edge. If that at least doubles the number
+        of edges, the CSR arrays are rebuilt once at the end, otherwise the
+        new edges are added to the pending lists.
+        """
+        self._writable()
+        start = len(self.src)
+        nvertices = len(self.vobj)
+        src, dst, weight, elabel, eprops = (
+            self.src, self.dst, self.weight, self.elabel, self.eprops)
+        labelcode = self.labelcode
+        try:
+            for item in iterable:
+                from_, to = item[0], item[1]
+                if not (0 <= from_ < nvertices and 0 <= to < nvertices):
+                    raise IndexError("No such vertex for edge {0} -> {1}"
+                                     .format(from_, to))
+                n = len(item)
+                src.append(from_)
+                dst.append(to)
+                weight.append(item[2] if n > 2 else None)
+                elabel.append(labelcode(item[3] if n > 3 else None))
+                eprops.append((item[4] or None) if n > 4 else None)
+        except Exception:
+            # don't leave edges behind that aren't in any adjacency list
+            for column in (src, dst, weight, elabel, eprops):
+                del column[start:]
+            raise
+        end = len(src)
+        if self.eids is not None:
+            for e in range(start, end):
+                self.eids.allocate()
+
+        if end - start >= start:
+            self._pendingout = {}
+            self._pendingin = {}
+            self._out = CSR(nvertices, src, dst)
+            self._in = CSR(nvertices, dst, src)
+        else:
+            for e in range(start, end):
+                self._pendingout.setdefault(src[e], []).append(e)
+                self._pendingin.setdefault(dst[e], []).append(e)
+        return range(start, end)
+
+    def _writable(self):
+        # a store opened from a snapshot reads its edge arrays straight out
+        # of the file, until it's given an edge of its own
+        for name in ('src', 'dst', 'elabel'):
+            column = getattr(self, name)
+            if isinstance(column, memoryview):
+                copy = array(column.format)
+                copy.frombytes(column.cast('B'))
+                setattr(self, name, copy)
+
+    def labelcode(self, label):
+        try:
+            return self._labelcodes[label]
+        except KeyError:
+            self.labels.append(label)
+            code = self._labelcodes[label] = len(self.labels) - 1
+            return code
+
+    def compact(self):
+        """
+        Fold every edge added since the last call into the CSR arrays, which
+        also grow to cover every vertex added since
+        """
+        n = len(self.vobj)
+        if not self._pendingout and len(self._out) == n:
+            return
+        self._out = CSR(n, self.src, self.dst)
+        self._in = CSR(n, self.dst, self.src)
+        self._pendingout = {}
+        self._pendingin = {}
+
+    def outedges(self, v):
+        pending = self._pendingout.get(v)
+        if pending:
+            return list(self._out.edgesof(v)) + pending
+        return self._out.edgesof(v)
+
+    def inedges(self, v):
+        pending = self._pendingin.get(v)
+        if pending:
+            return list(self._in.edgesof(v)) + pending
+        return self._in.edgesof(v)
+
+    def outdegree(self, v):
+        return self._out.degree(v) + len(self._pendingout.get(v, ()))
+
+    def indegree(self, v):
+        return self._in.degree(v) + len(self._pendingin.get(v, ()))
+
+    def outneighbours(self, v):
+        pending = self._pendingout.get(v)
+        if pending:
+            return (list(self._out.neighboursof(v)) +
+                    [self.dst[e] for e in pending])
+        return self._out.neighboursof(v)
+
+    def inneighbours(self, v):
+        pending = self._pendingin.get(v)
+        if pending:
+            return (list(self._in.neighboursof(v)) +
+                    [self.src[e] for e in pending])
+        return self._in.neighboursof(v)
+
+    def withlabel(self, edges, label):
+        """
+        The edges in `edges` whose label is `label`, or passes it if it's a
+        callable. Only integer label codes get compared, no views are made.
+        """
+        elabel = self.elabel
+        if callable(label):
+            codes = set(code for code, l in enumerate(self.labels) if label(l))
+            return [e for e in edges if elabel[e] in codes]
+        try:
+            code = self._labelcodes.get(label)
+        except TypeError:
+            return []
+        if code is None:
+            return []
+        return [e for e in edges if elabel[e] == code]
+
+    def edgelabel(self, e):
+        return self.labels[self.elabel[e]]
+
+    def props(self, column, idx, create=False):
+        props = column[idx]
+        if create:
+            if props is None:
+                props = {}
+            # a snapshot's columns make a new dict every time they're read,
+            # so hold on to the one that's about to be written to
+            column[idx] = props
+        return props
+
+
+class _View(object):
+    __slots__ = ()
+
+    def __init__(self, store, idx):
+        object.__setattr__(self, '_store', store)
+        object.__setattr__(self, 'idx', idx)
+
+    @property
+    def id(self):
+        # nothing is ever removed from a CompactStore, so idx is stable,
+        # but a snapshot can bring the ids of a Graph that had removals
+        ids = self._ids()
+        return self.idx if ids is None else ids[self.idx]
+
+    def __eq__(self, other):
+        return (type(other) is type(self) and
+                other._store is self._store and other.idx == self.idx)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((type(self), id(self._store), self.idx))
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        props = self._store.props(self._column(), self.idx)
+        if props is None or name not in props:
+            raise AttributeError(name)
+        return props[name]
+
+    def __setattr__(self, name, value):
+        if hasattr(type(self), name):
+            object.__setattr__(self, name, value)
+            return
+        old = getattr(self, name, MISSING)
+        self._store.props(self._column(), self.idx, True)[name] = value
+        if self._store.graph is not None:
+            self._store.graph._propertychanged(self, name, old, value)
+
+    def properties(self):
+        return dict(self._store.props(self._column(), self.idx) or {})
+
+    def __repr__(self):
+        attrs = [("idx", self.idx)] + self._fields()
+        attrs += sorted(self.properties().items())
+        return "<{type}: {attrs}>".format(
+                type=type(self).__name__,
+                attrs=", ".join("{0}: {1}".format(k, v) for k, v in attrs))
+
+
+class VertexView(_View, Vertex):
+    """A `Vertex` whose adjacency and properties live in a `CompactStore`"""
+    __slots__ = ('_store',)
+
+    def _column(self):
+        return self._store.vprops
+
+    def _ids(self):
+        return self._store.vids
+
+    def _fields(self):
+        return [("obj", self.obj), ("label", self.label)]
+
+    @property
+    def obj(self):
+        return self._store.vobj[self.idx]
+
+    @property
+    def label(self):
+        return self._store.vlabel[self.idx]
+
+    @label.setter
+    def label(self, label):
+        old = self._store.vlabel[self.idx]
+        self._store.vlabel[self.idx] = label
+        if self._store.graph is not None:
+            self._store.graph._propertychanged(self, 'label', old, label)
+
+    def _vertices(self, idxs, kwds):
+        store = self._store
+        r = ElementList(VertexView(store, i) for i in idxs)
+        return r.filter(**kwds) if kwds else r
+
+    def _edges(self, idxs, kwds):
+        store = self._store
+        r = ElementList(EdgeView(store, e) for e in idxs)
+        return r.filter(**kwds) if kwds else r
+
+    def out(self, **kwds):
+        store = self._store
+        if 'label' in kwds:
+            edges = store.withlabel(store.outedges(self.idx),
+                                    kwds.pop('label'))
+            return self._vertices([store.dst[e] for e in edges], kwds)
+        return self._vertices(store.outneighbours(self.idx), kwds)
+
+    def outE(self, **kwds):
+        store = self._store
+        edges = store.outedges(self.idx)
+        if 'label' in kwds:
+            edges = store.withlabel(edges, kwds.pop('label'))
+        return self._edges(edges, kwds)
+
+    def in_(self, **kwds):
+        store = self._store
+        if 'label' in kwds:
+            edges = store.withlabel(store.inedges(self.idx),
+                                    kwds.pop('label'))
+            return self._vertices([store.src[e] for e in edges], kwds)
+        return self._vertices(store.inneighbours(self.idx), kwds)
+
+    def inE(self, **kwds):
+        store = self._store
+        edges = store.inedges(self.idx)
+        if 'label' in kwds:
+            edges = store.withlabel(edges, kwds.pop('label'))
+        return self._edges(edges, kwds)
+
+    def outdegree(self, label=ALL):
+        store = self._store
+        if label is ALL:
+            return store.outdegree(self.idx)
+        return len(store.withlabel(store.outedges(self.idx), label))
+
+    def indegree(self, label=ALL):
+        store = self._store
+        if label is ALL:
+            return store.indegree(self.idx)
+        return len(store.withlabel(store.inedges(self.idx), label))
+
+    def _degree(self, step):
+        n = 0
+        if step in ('out', 'outE', 'both', 'bothE'):
+            n += self.outdegree()
+        if step in ('in_', 'inE', 'both', 'bothE'):
+            n += self.indegree()
+        return n
+
+    def edgeto(self, to, weight=None, label=None, **kwds):
+        return self._store.graph.addedge(self, to, weight, label, **kwds)
+
+    def edgefrom(self, from_, weight=None, label=None, **kwds):
+        return self._store.graph.addedge(from_, self, weight, label, **kwds)
+
+
+class EdgeView(_View, Edge):
+    """An `Edge` whose endpoints and properties live in a `CompactStore`"""
+    __slots__ = ('_store',)
+
+    def _column(self):
+        return self._store.eprops
+
+    def _ids(self):
+        return self._store.eids
+
+    def _fields(self):
+        return [("from_", self.from_.idx), ("to", self.to.idx),
+                ("weight", self.weight), ("label", self.label)]
+
+    @property
+    def from_(self):
+        return VertexView(self._store, self._store.src[self.idx])
+
+    @property
+    def to(self):
+        return VertexView(self._store, self._store.dst[self.idx])
+
+    @property
+    def weight(self):
+        return self._store.weight[self.idx]
+
+    @property
+    def label(self):
+        return self._store.edgelabel(self.idx)
+
+
+def _vertexidx(store, v):
+    if isinstance(v, VertexView) and v._store is store:
+        return v.idx
+    if isinstance(v, int) and not isinstance(v, bool):
+        return v
+    raise ValueError("{0!r} is not a vertex of this graph".format(v))
+
+
+class _Vertices(object):
+    # re-iterable, so traversals started from the whole graph can be reused
+    def __init__(self, store):
+        self._store = store
+
+    def __iter__(self):
+        store = self._store
+        return (VertexView(store, i) for i in range(store.nvertices()))
+
+
+class _Without(object):
+    # a method of the base class that a subclass doesn't have, so that
+    # looking it up fails just as if it had never been defined
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, obj, klass=None):
+        raise AttributeError(
+            "{0} has no {1}; open a snapshot of it with Graph.open(path) "
+            "to remove from it".format((klass or type(obj)).__name__,
+                                       self.name))
+
+
+class CompactGraph(Graph):
+    """
+    A `Graph` that keeps its structure in integer arrays instead of `Vertex`
+    and `Edge` objects.
+
+    It's used like `Graph`, except that nothing can be removed from it;
+    `addvertex`, `addedge`, `v` and `e` return `VertexView`/`EdgeView`
+    handles, and `addedge` also takes plain vertex indexes:
+
+        >>> g = CompactGraph()
+        >>> for i in range(1000000):
+        ...     g.addvertex()
+        >>> for s, t in edges:
+        ...     g.addedge(s, t)
+        >>> g.compact()
+        >>> g.v(0).out().idx
+    """
+    def __init__(self, store=None, cache=None):
+        super(CompactGraph, self).__init__(cache=cache)
+        self._store = store if store is not None else CompactStore()
+        self._store.graph = self
+
+    def V(self, **filters):
+        result = lookup(self._vindexes, filters) if filters else None
+        if result is None:
+            result = ElementList(_Vertices(self._store))
+            if filters:
+                result = result.filter(**filters)
+        return result
+
+    def E(self, **filters):
+        result = lookup(self._eindexes, filters) if filters else None
+        if result is None:
+            store = self._store
+            result = ElementList(EdgeView(store, e)
+                                 for e in range(store.nedges()))
+            if filters:
+                result = result.filter(**filters)
+        return result
+
+    def v(self, idx, **kwds):
+        if not 0 <= idx < self._store.nvertices():
+            raise IndexError("No vertex {0}".format(idx))
+        return VertexView(self._store, idx)
+
+    def e(self, idx, **kwds):
+        if not 0 <= idx < self._store.nedges():
+            raise IndexError("No edge {0}".format(idx))
+        return EdgeView(self._store, idx)
+
+    def vertex(self, id_):
+        if self._store.vids is not None:
+            return self.v(self._store.vids.find(id_))
+        try:
+            return self.v(id_)
+        except IndexError:
+            raise KeyError(id_)
+
+    def edge(self, id_):
+        if self._store.eids is not None:
+            return self.e(self._store.eids.find(id_))
+        try:
+            return self.e(id_)
+        except IndexError:
+            raise KeyError(id_)
+
+    def addvertex(self, obj=None, label=None, *args, **kwds):
+        v = VertexView(self._store, self._store.addvertex(obj, label, kwds))
+        self._index(v, self._vindexes)
+        if self._cache is not None:
+            self._touch()
+        return v
+
+    def addedge(self, from_, to, weight=None, label=None, *args, **kwds):
+        store = self._store
+        e = EdgeView(store, store.addedge(_vertexidx(store, from_),
+                                          _vertexidx(store, to),
+                                          weight, label, kwds))
+        self._index(e, self._eindexes)
+        if self._cache is not None:
+            self._touch((e.from_, e.to))
+        return e
+
+    def addvertices(self, iterable):
+        r = self._store.addvertices(iterable)
+        if self._vindexes:
+            for idx in r:
+                self._index(VertexView(self._store, idx), self._vindexes)
+        if self._cache is not None:
+            self._touch()
+        return r
+
+    def addedges(self, iterable):
+        store = self._store
+        r = store.addedges(
+                item if (item[0].__class__ is int and item[1].__class__ is int)
+                else (_vertexidx(store, item[0]), _vertexidx(store, item[1]))
+                + tuple(item[2:])
+                for item in iterable)
+        if self._eindexes:
+            for idx in r:
+                self._index(EdgeView(store, idx), self._eindexes)
+        if self._cache is not None:
+            self._touch(chain.from_iterable(
+                (VertexView(store, store.src[idx]),
+                 VertexView(store, store.dst[idx])) for idx in r))
+        return r
+
+    @classmethod
+    def open(cls, path, mmap=True):
+        """
+        Open a snapshot written by `save`, mapping the file unless `mmap` is
+        false; see `Graph.open`
+        """
+        return super(CompactGraph, cls).open(path, mmap)
+
+    # the CSR arrays can only grow, so there's no removing anything from a
+    # CompactGraph; open a snapshot of it as a Graph to do that
+    removeedge = _Without()
+    removevertex = _Without()
+
+    def compact(self):
+        """
+        Rebuild the CSR adjacency arrays. Call this after loading a lot of
+        edges; until then, new edges are kept in slower per-vertex lists.
+        """
+        self._store.compact()
+
+    def _allvertices(self):
+        return _Vertices(self._store)
+
+    def _size(self):
+        return self._store.nvertices(), self._store.nedges()
+
+    def _vertexidx(self, v):
+        idx = _vertexidx(self._store, v)
+        if not 0 <= idx < self._store.nvertices():
+            raise IndexError("No vertex {0}".format(idx))
+        return idx
+
+    def _adjacency(self):
+        store = self._store
+        store.compact()
+        return Adjacency(store.src, store.dst, store._out, store._in)
+
+    def _degrees(self, direction):
+        store = self._store
+        store.compact()
+        csrs = {'out': [store._out], 'in': [store._in],
+                'both': [store._out, store._in]}[direction]
+        degrees = [0] * store.nvertices()
+        for csr in csrs:
+            offsets = csr.offsets
+            degrees = list(map(add, degrees,
+                               map(sub, offsets[1:], offsets[:-1])))
+        return degrees
+
+    def _readweights(self, key):
+        store = self._store
+        if key == 'weight':
+            return store.weight
+        return [props.get(key) if props else None for props in store.eprops]
@@ -3,39 +3,82 @@ import itertools
 import uuid
 
 from itertools import chain
+from operator import attrgetter
+
+from pylgrim.predicates import compilefilters
+
+# the default for `label` arguments that, unlike label=None, count every edge
+ALL = object()
 
 class Element(object):
+    """
+    Base class for `Vertex` and `Edge`.
+
+    Our own fields live in `__slots__`. Application-specific properties are
+    kept apart from them, in the instance `__dict__`, which python only
+    creates for elements that actually have any properties:
+
+        >>> v = Vertex(name="Fred")
+        >>> v.age = 30
+        >>> v.properties()
+        {'name': 'Fred', 'age': 30}
+    """
+    __slots__ = ('idx', 'id', '_graph', '__dict__')
+
     def __init__(self, *args, **kwds):
+        self.idx = None
+        self.id = None
+        self._graph = None
+        klass = type(self)
         for k, v in kwds.items():
-            if not hasattr(self, k):
+            if not hasattr(klass, k):
                 setattr(self, k, v)
             else:
                 raise AttributeError(
                         "You cannot overrite {0} on {1}".format(k, self))
 
+    def properties(self):
+        """The application-specific properties of this element"""
+        return dict(self.__dict__)
+
+    def _fields(self):
+        for klass in reversed(type(self).__mro__):
+            for name in getattr(klass, '__slots__', ()):
+                if not name.startswith('_') and hasattr(self, name):
+                    yield name, getattr(self, name)
+
     def __repr__(self):
+        items = list(self._fields()) + list(self.properties().items())
         attrs = ", ".join(["{key}: {value}".format(key=key, value=value)
-                           for key, value in self.__dict__.items()
-                           if type(getattr(self, key)) is not ElementList])
+                           for key, value in items])
 
         return "<{type}: {attrs}>".format(type=type(self).__name__, attrs=attrs)
 
-    def idx(self, _idx):
-        self.idx = _idx
-
 
 class Vertex(Element):
+    __slots__ = ('_uuid', 'obj', 'label', '_out', '_outE', '_in_', '_inE',
+                 '_outlabels', '_inlabels')
+
     def __init__(self, obj=None, label=None, *args, **kwds):
-        self.uuid = uuid.uuid4().hex
+        self._uuid = None
         self.obj = obj
         self.label = label
-        self._out = ElementList()
-        self._outE = ElementList()
-        self._in_ = ElementList()
-        self._inE = ElementList()
+        # adjacency lists are only created once there's an edge to put in them
+        self._out = self._outE = self._in_ = self._inE = None
+        # edge label -> ElementList of just the edges with that label, only
+        # made once the vertex has edges with more than one label; until
+        # then the adjacency list is the one bucket
+        self._outlabels = self._inlabels = None
         super(Vertex, self).__init__(*args, **kwds)
 
-    def edgeto(self, to, weight=None, label=None):
+    @property
+    def uuid(self):
+        """A uuid4 hex string, only generated the first time it's asked for"""
+        if self._uuid is None:
+            self._uuid = uuid.uuid4().hex
+        return self._uuid
+
+    def edgeto(self, to, weight=None, label=None, **kwds):
         """
         Defines a relationship between two vertices.
 
@@ -48,38 +91,18 @@ class Vertex(Element):
 
         >>> e = v.edgefrom(u)
         """
-        e = Edge(from_=self, to=to, weight=weight, label=label)
-
-        # Bookkeeping
-        self._out.append(to)
-        self._outE.append(e)
-
-        to._in_.append(self)
-        to._inE.append(e)
-
-        e._inV.append(to)
-        e._outV.append(self)
-
+        e = Edge(self, to, weight, label, **kwds)
+        _link(e)
         return e
 
-    def edgefrom(self, from_, weight=None, label=None):
+    def edgefrom(self, from_, weight=None, label=None, **kwds):
         """
         Defines a relationship between two vertices.
 
         Defines the reverse relationship that `edgeto` does
         """
-        e = Edge(from_=from_, to=self, weight=weight, label=label)
-
-        # Bookkeeping
-        self._in_.append(from_)
-        self._inE.append(e)
-
-        from_._out.append(self)
-        from_._outE.append(e)
-
-        e._inV.append(self)
-        e._outV.append(from_)
-
+        e = Edge(from_, self, weight, label, **kwds)
+        _link(e)
         return e
 
     def __rshift__(self, to):
@@ -89,24 +112,35 @@ class Vertex(Element):
         return self.edgefrom(from_)
 
     def out(self, **kwds):
-        if kwds:
-            return self._out.filter(**kwds)
-        return self._out
+        """
+        The vertices this one has edges to. `label` filters on the label of
+        the edge, any other keywords filter the vertices themselves:
+
+            >>> u.out(label="knows", name="Bob")
+        """
+        if 'label' in kwds:
+            edges = _labelled(self._outlabels, self._outE, kwds.pop('label'))
+            return _select(ElementList(e.to for e in edges), kwds)
+        return _select(self._out, kwds)
 
     def outE(self, **kwds):
-        if kwds:
-            return self._outE.filter(**kwds)
-        return self._outE
+        if 'label' in kwds:
+            edges = _labelled(self._outlabels, self._outE, kwds.pop('label'))
+            return _select(edges, kwds)
+        return _select(self._outE, kwds)
 
     def in_(self, **kwds):
-        if kwds:
-            return self._in_.filter(**kwds)
-        return self._in_
+        """The vertices with edges to this one, filtered like `out`"""
+        if 'label' in kwds:
+            edges = _labelled(self._inlabels, self._inE, kwds.pop('label'))
+            return _select(ElementList(e.from_ for e in edges), kwds)
+        return _select(self._in_, kwds)
 
     def inE(self, **kwds):
-        if kwds:
-            return self._inE.filter(**kwds)
-        return self._inE
+        if 'label' in kwds:
+            edges = _labelled(self._inlabels, self._inE, kwds.pop('label'))
+            return _select(edges, kwds)
+        return _select(self._inE, kwds)
 
     def both(self, **kwds):
         return self.out(**kwds) + self.in_(**kwds)
@@ -114,6 +148,47 @@ class Vertex(Element):
     def bothE(self, **kwds):
         return self.outE(**kwds) + self.inE(**kwds)
 
+    def outdegree(self, label=ALL):
+        """
+        The number of edges out of this vertex, or with `label` (a value or
+        a callable, like the `label` filter) just the ones with that label.
+        Nothing is built to count them.
+        """
+        if label is ALL:
+            return len(self._outE) if self._outE else 0
+        return _count(self._outlabels, self._outE, label)
+
+    def indegree(self, label=ALL):
+        """The number of edges into this vertex, counted like `outdegree`"""
+        if label is ALL:
+            return len(self._inE) if self._inE else 0
+        return _count(self._inlabels, self._inE, label)
+
+    def degree(self, label=ALL):
+        """`outdegree` plus `indegree`: the number of edges `bothE` returns"""
+        return self.outdegree(label) + self.indegree(label)
+
+    def _degree(self, step):
+        # how many elements `step` would return, read off the adjacency
+        # lists without making any, or None if the step isn't one of ours
+        if fastpath(type(self), step) is None:
+            return None
+        n = 0
+        if step in ('out', 'outE', 'both', 'bothE'):
+            n += self.outdegree()
+        if step in ('in_', 'inE', 'both', 'bothE'):
+            n += self.indegree()
+        return n
+
+    def traverse(self):
+        """
+        Start a lazy `Traversal` from this vertex.
+
+        >>> v.traverse().out().out().take(10)
+        """
+        from pylgrim.traversal import Traversal
+        return Traversal([self], graph=getattr(self, '_graph', None))
+
     #def __repr__(self):
         #if self.idx:
             #rep = self.idx
@@ -123,20 +198,197 @@ class Vertex(Element):
             #rep = "_"
         #return rep
 
+def _link(e):
+    # Bookkeeping. Each edge remembers where it is in every list it's put
+    # in, so `_unlink` can take it out again in O(1)
+    from_, to = e.from_, e.to
+    if from_._outE is None:
+        from_._out, from_._outE = ElementList(), ElementList()
+    elif from_._outlabels is None and _mixes(from_._outE, e._label):
+        from_._outlabels = _buckets(from_._outE, Edge._outlabelpos)
+    e._outpos = len(from_._outE)
+    from_._out.append(to)
+    from_._outE.append(e)
+    if from_._outlabels is not None:
+        bucket = _bucket(from_._outlabels, e._label)
+        e._outlabelpos = len(bucket)
+        bucket.append(e)
+
+    if to._inE is None:
+        to._in_, to._inE = ElementList(), ElementList()
+    elif to._inlabels is None and _mixes(to._inE, e._label):
+        to._inlabels = _buckets(to._inE, Edge._inlabelpos)
+    e._inpos = len(to._inE)
+    to._in_.append(from_)
+    to._inE.append(e)
+    if to._inlabels is not None:
+        bucket = _bucket(to._inlabels, e._label)
+        e._inlabelpos = len(bucket)
+        bucket.append(e)
+
+
+def _unlink(e):
+    """
+    Take `e` out of the adjacency lists of both of its vertices. The last
+    edge in each list is moved into its place, so this is O(1), but it
+    changes the order of those lists.
+    """
+    from_, to = e.from_, e.to
+    _swapremove(from_._outE, e._outpos, Edge._outpos, from_._out)
+    _swapremove(to._inE, e._inpos, Edge._inpos, to._in_)
+    _unbucket(from_._outlabels, e, Edge._outlabelpos)
+    _unbucket(to._inlabels, e, Edge._inlabelpos)
+    for position in _POSITIONS:
+        position.__set__(e, None)
+
+
+def _swapremove(edges, i, position, parallel=None):
+    # `position` is the slot holding each edge's place in `edges`; it's set
+    # through the slot descriptor so a graph doesn't hear about it as a
+    # property change
+    last = edges.pop()
+    if parallel is not None:
+        lastparallel = parallel.pop()
+    if i < len(edges):
+        edges[i] = last
+        if parallel is not None:
+            parallel[i] = lastparallel
+        position.__set__(last, i)
+
+
+def _unbucket(labels, e, position):
+    if labels is None:
+        return
+    bucket = labels[e._label]
+    _swapremove(bucket, position.__get__(e), position)
+    if not bucket:
+        del labels[e._label]
+
+
+def _rebucket(labels, e, position):
+    if labels is None:
+        return
+    bucket = _bucket(labels, e._label)
+    position.__set__(e, len(bucket))
+    bucket.append(e)
+
+
+def _bucket(labels, label):
+    try:
+        return labels[label]
+    except KeyError:
+        bucket = labels[label] = ElementList()
+        return bucket
+
+
+def _mixes(edges, label):
+    # whether an edge with `label` would be the first in `edges`, which
+    # don't have label buckets yet, with a label of its own
+    return bool(edges) and edges[0]._label != label
+
+
+def _buckets(edges, position):
+    # the label buckets of `edges`, made the first time they're needed
+    labels = {}
+    for e in edges:
+        _rebucket(labels, e, position)
+    return labels
+
+
+def _labelled(labels, edges, label):
+    """The edges in `edges` with label `label`, using the per-label buckets"""
+    if edges is None:
+        return ElementList()
+    if callable(label):
+        return edges.filter(label=label)
+    if labels is None:
+        # they all have the same label
+        return edges if edges and edges[0]._label == label \
+            else ElementList()
+    try:
+        return labels.get(label) or ElementList()
+    except TypeError:
+        return edges.filter(label=label)
+
+
+def _count(labels, edges, label):
+    """How many of `edges` have label `label`, using the per-label buckets"""
+    if edges is None:
+        return 0
+    if callable(label):
+        test = label
+    elif labels is None:
+        return len(edges) if edges and edges[0]._label == label else 0
+    else:
+        try:
+            bucket = labels.get(label)
+            return len(bucket) if bucket else 0
+        except TypeError:
+            test = lambda l: l == label
+    n = 0
+    for e in edges:
+        if test(e.label):
+            n += 1
+    return n
+
+
+def _select(elements, kwds):
+    if elements is None:
+        return ElementList()
+    if kwds:
+        return elements.filter(**kwds)
+    return elements
+
+
 class Edge(Element):
+    # the _*pos slots are where the edge is in its vertices' adjacency lists
+    # and label buckets, while it's linked into them
+    __slots__ = ('from_', 'to', 'weight', '_label', '_outpos', '_inpos',
+                 '_outlabelpos', '_inlabelpos')
+
     def __init__(self, from_, to, weight=None, label=None, *args, **kwds):
         self.from_ = from_
         self.to = to
         self.weight = weight
-        self.label = label
-        self._inV = ElementList()
-        self._outV = ElementList()
+        self._label = label
+        self._outpos = self._inpos = None
+        self._outlabelpos = self._inlabelpos = None
         super(Edge, self).__init__(*args, **kwds)
 
+    @property
+    def label(self):
+        return self._label
+
+    @label.setter
+    def label(self, label):
+        # move the edge to the right label bucket on both of its vertices,
+        # which may need buckets now if it was one of many with its label
+        linked = self._outpos is not None
+        if linked:
+            from_, to = self.from_, self.to
+            if from_._outlabels is None and len(from_._outE) > 1:
+                from_._outlabels = _buckets(from_._outE, Edge._outlabelpos)
+            if to._inlabels is None and len(to._inE) > 1:
+                to._inlabels = _buckets(to._inE, Edge._inlabelpos)
+            _unbucket(self.from_._outlabels, self, Edge._outlabelpos)
+            _unbucket(self.to._inlabels, self, Edge._inlabelpos)
+        self._label = label
+        if linked:
+            _rebucket(self.from_._outlabels, self, Edge._outlabelpos)
+            _rebucket(self.to._inlabels, self, Edge._inlabelpos)
+
+    def _fields(self):
+        for name in ('idx', 'id', 'from_', 'to', 'weight', 'label'):
+            yield name, getattr(self, name)
+
+    def _degree(self, step):
+        return 1 if fastpath(type(self), step) is not None else None
+
     def inV(self, **kwds):
-        return self._inV
+        return ElementList([self.to])
+
     def outV(self, **kwds):
-        return self._outV
+        return ElementList([self.from_])
 
     #def __repr__(self):
         #if self.label:
@@ -196,46 +448,160 @@ class ElementList(list):
     is used here for examples so we only have to construct graphs consisting of
     a few nodes.
     """
+    __slots__ = ()
+
     def __getattr__(self, name):
-        _callable = all([
-                callable(getattr(x, name))
-                for x in self
-                if hasattr(x, name)
-                ])
+        # how each type of element in the list treats `name` is worked out
+        # once (see `_dispatch`), not by probing every element
+        kinds = set([_dispatch(klass, name) for klass in set(map(type, self))])
 
         # if the attribute is callable, create and return the function.
         # if not, collect the attributes into a list and return it
 
-        if _callable:
-            def callme(*args, **kwds):
-                r = [
-                        getattr(x, name)(*args, **kwds)
-                        for x in self
-                        if hasattr(x, name)]
+        if _VALUE in kinds or kinds == set([_ABSENT]):
+            r = [getattr(x, name, _ABSENT) for x in self]
+            return ElementList([x for x in r if x is not _ABSENT])
+
+        def callme(*args, **kwds):
+            return self._call(name, args, kwds)
+        return callme
+
+    def _call(self, name, args, kwds):
+        r = []
+        for x in self:
+            method = getattr(x, name, None)
+            if method is not None:
+                r.append(method(*args, **kwds))
+        return ElementList(chain.from_iterable(r))
+
+    def _step(self, name, kwds):
+        if not kwds:
+            steps = set([fastpath(klass, name)
+                         for klass in set(map(type, self))])
+            if len(steps) == 1 and None not in steps:
+                return ElementList(steps.pop()(self))
+        return self._call(name, (), kwds)
+
+    # the traversal steps, which skip the method call on each element when
+    # the elements use the stock Vertex and Edge implementations
 
-                return ElementList( chain.from_iterable(r) )
-            return callme
-        else:
-            r = [getattr(x, name) for x in self if hasattr(x, name)]
-            return ElementList(r)
+    def out(self, **kwds):
+        return self._step('out', kwds)
 
-    def _get(self, obj, attr):
-        try:
-            return obj[attr]
-        except (KeyError, TypeError):
-            return getattr(obj, attr) if hasattr(obj, attr) else None
+    def outE(self, **kwds):
+        return self._step('outE', kwds)
+
+    def in_(self, **kwds):
+        return self._step('in_', kwds)
 
-    def _matches(self, obj, attr, filter_):
-        attr = self._get(obj, attr)
+    def inE(self, **kwds):
+        return self._step('inE', kwds)
 
-        if callable(filter_):
-            return filter_(attr)
-        else:
-            return attr == filter_
+    def both(self, **kwds):
+        return self._step('both', kwds)
+
+    def bothE(self, **kwds):
+        return self._step('bothE', kwds)
+
+    def inV(self, **kwds):
+        return self._step('inV', kwds)
+
+    def outV(self, **kwds):
+        return self._step('outV', kwds)
+
+    def __add__(self, other):
+        return ElementList(chain(self, other))
 
     def filter(self, **filters):
-        results = list(self)
-        for attr, filter_ in filters.items():
-            results = [e for e in results if self._matches(e, attr, filter_)]
-        return ElementList(results)
+        """
+        The elements matching all of `filters`. Each filter is a value to
+        compare with, or a callable such as a `pylgrim.predicates` predicate:
+
+            >>> people.filter(hometown="Flint", age=gt(28))
+        """
+        if not filters:
+            return ElementList(self)
+        return ElementList(filter(compilefilters(filters), self))
+
 
+
+_POSITIONS = (Edge._outpos, Edge._inpos, Edge._outlabelpos, Edge._inlabelpos)
+
+
+def _adjacency(*slots):
+    get = attrgetter(*slots)
+    if len(slots) == 1:
+        def step(elements):
+            return chain.from_iterable(filter(None, map(get, elements)))
+    else:
+        def step(elements):
+            return chain.from_iterable(
+                    filter(None, chain.from_iterable(map(get, elements))))
+    return step
+
+
+def _ends(slot):
+    get = attrgetter(slot)
+
+    def step(elements):
+        return map(get, elements)
+    return step
+
+
+# step name -> (the methods it stands in for, a function giving the results
+# of the step for a whole iterable of elements at once)
+_VECTORIZED = {
+    'out': ((Vertex.out,), _adjacency('_out')),
+    'outE': ((Vertex.outE,), _adjacency('_outE')),
+    'in_': ((Vertex.in_,), _adjacency('_in_')),
+    'inE': ((Vertex.inE,), _adjacency('_inE')),
+    'both': ((Vertex.both, Vertex.out, Vertex.in_),
+             _adjacency('_out', '_in_')),
+    'bothE': ((Vertex.bothE, Vertex.outE, Vertex.inE),
+              _adjacency('_outE', '_inE')),
+    'inV': ((Edge.inV,), _ends('to')),
+    'outV': ((Edge.outV,), _ends('from_')),
+}
+
+_FASTPATHS = {}
+
+
+def fastpath(klass, name):
+    """
+    The vectorized version of step `name` for elements of type `klass`, or
+    None if `klass` doesn't get that step straight from `Vertex`/`Edge` (a
+    `CompactGraph` view, say, or a subclass that overrides it).
+    """
+    try:
+        return _FASTPATHS[klass, name]
+    except KeyError:
+        methods, step = _VECTORIZED.get(name, ((None,), None))
+        if any(getattr(klass, m.__name__, None) is not m for m in methods):
+            step = None
+        _FASTPATHS[klass, name] = step
+        return step
+
+
+_CALL, _VALUE, _ABSENT = object(), object(), object()
+_DISPATCH = {}
+
+
+def _dispatch(klass, name):
+    """
+    Whether `name` is a method (`_CALL`) or an attribute (`_VALUE`) of
+    `klass`, or isn't defined by the class at all (`_ABSENT`), in which case
+    it can only be a property of the element. Classes are assumed not to grow
+    or lose methods once their elements are in an ElementList.
+    """
+    try:
+        return _DISPATCH[klass, name]
+    except KeyError:
+        attr = getattr(klass, name, _ABSENT)
+        if attr is _ABSENT:
+            kind = _ABSENT
+        elif callable(attr):
+            kind = _CALL
+        else:
+            kind = _VALUE
+        _DISPATCH[klass, name] = kind
+        return kind
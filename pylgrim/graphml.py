@@ -1,3 +1,258 @@
+"""
+Reading and writing GraphML (http://graphml.graphdrawing.org/).
 
-if __name__ == "__main__": pass
+Both directions stream. `parse` reads with `iterparse` and throws every
+`<node>`/`<edge>` element away as soon as it's been added to the graph, so
+the only thing that grows with the size of the file is the graph itself
+(and a map of GraphML node ids to vertices). `save` writes one element at a
+time straight to the file.
 
+Typed `<key>` declarations become vertex and edge properties, converted to
+the declared `attr.type`. A key named `label` sets the vertex or edge label
+and `weight` sets the edge weight. Other names that pylgrim uses itself,
+like `id`, get an underscore added, so an `id` key is read as `id_`. Empty
+`<data/>` of a typed key counts as missing. Hyperedges, ports and nested graphs
+aren't supported, and undirected edges are added as directed ones from
+`source` to `target`.
+"""
+from xml.etree.ElementTree import iterparse
+from xml.sax.saxutils import escape, quoteattr
+
+from pylgrim.element import Edge, Vertex
+
+NAMESPACE = "http://graphml.graphdrawing.org/xmlns"
+
+
+def _boolean(value):
+    return value.strip().lower() in ("true", "1")
+
+
+# attr.type -> function converting the text of a <data> element
+READERS = {
+    'boolean': _boolean,
+    'int': int,
+    'long': int,
+    'float': float,
+    'double': float,
+    'string': str,
+}
+
+
+class Key(object):
+    def __init__(self, id_, for_, name, type_, default=None):
+        self.id = id_
+        self.for_ = for_
+        self.name = name
+        self.type = type_
+        self.default = default
+
+    def read(self, text):
+        """The value of `text`, or None if it's empty and not a string"""
+        if not text and self.type != 'string':
+            return None
+        return READERS.get(self.type, str)(text or "")
+
+
+def _tag(element):
+    return element.tag.rsplit('}', 1)[-1]
+
+
+def _data(element, keys, for_):
+    properties = {}
+    for child in element:
+        if _tag(child) != 'data':
+            continue
+        key = keys.get(child.get('key'))
+        if key is None:
+            properties[child.get('key')] = child.text
+        else:
+            value = key.read(child.text)
+            if value is not None:
+                properties[key.name] = value
+    for key in keys.values():
+        if (key.for_ in (for_, 'all') and key.default is not None and
+                key.name not in properties):
+            properties[key.name] = key.default
+    return properties
+
+
+def _unreserved(properties, klass):
+    # rename the properties `klass` would refuse to have set, which leaves
+    # the ones it handles itself (label, weight) to have been taken out
+    for name in [name for name in properties if hasattr(klass, name)]:
+        renamed = name + '_'
+        while hasattr(klass, renamed) or renamed in properties:
+            renamed += '_'
+        properties[renamed] = properties.pop(name)
+    return properties
+
+
+def parse(file_, graph):
+    """
+    Add the vertices and edges in the GraphML file `file_` (a path or a
+    file object) to `graph`, and return it.
+    """
+    keys = {}
+    vertices = {}
+    parent = None
+
+    for event, element in iterparse(file_, events=('start', 'end')):
+        tag = _tag(element)
+
+        if event == 'start':
+            if tag == 'graph':
+                if parent is not None:
+                    raise ValueError("Nested graphs aren't supported")
+                parent = element
+            continue
+
+        if tag == 'key':
+            key = Key(element.get('id'), element.get('for', 'all'),
+                      element.get('attr.name', element.get('id')),
+                      element.get('attr.type', 'string'))
+            for child in element:
+                if _tag(child) == 'default':
+                    key.default = key.read(child.text)
+            keys[key.id] = key
+        elif tag == 'node':
+            properties = _data(element, keys, 'node')
+            label = properties.pop('label', None)
+            _unreserved(properties, Vertex)
+            id_ = element.get('id')
+            if id_ in vertices:
+                # an edge got to this node first
+                v = vertices[id_]
+                if label is not None:
+                    v.label = label
+                for name, value in properties.items():
+                    setattr(v, name, value)
+            else:
+                vertices[id_] = graph.addvertex(None, label, **properties)
+        elif tag == 'edge':
+            properties = _data(element, keys, 'edge')
+            ends = []
+            for id_ in (element.get('source'), element.get('target')):
+                if id_ not in vertices:
+                    vertices[id_] = graph.addvertex()
+                ends.append(vertices[id_])
+            weight = properties.pop('weight', None)
+            label = properties.pop('label', None)
+            graph.addedge(ends[0], ends[1], weight, label,
+                          **_unreserved(properties, Edge))
+        elif tag == 'hyperedge':
+            raise ValueError("Hyperedges aren't supported")
+        else:
+            continue
+
+        # everything we need is in the graph now, so let this element (and
+        # its <data>) be garbage collected
+        element.clear()
+        if parent is not None and tag in ('node', 'edge'):
+            parent.remove(element)
+
+    return graph
+
+
+# python type -> attr.type, in order of preference when a key has values of
+# more than one type
+TYPES = [
+    (bool, 'boolean'),
+    (int, 'long'),
+    (float, 'double'),
+]
+
+
+def _type(types):
+    names = set()
+    for t in types:
+        for klass, name in TYPES:
+            if issubclass(t, klass):
+                names.add(name)
+                break
+        else:
+            return 'string'
+    if names == set(['boolean']):
+        return 'boolean'
+    if names == set(['long']):
+        return 'long'
+    if names <= set(['long', 'double']):
+        return 'double'
+    return 'string'
+
+
+def _text(value, type_):
+    if type_ == 'boolean':
+        return "true" if value else "false"
+    if type_ == 'double':
+        return repr(float(value))
+    return escape(str(value))
+
+
+def _properties(element):
+    properties = element.properties()
+    if element.label is not None:
+        properties['label'] = element.label
+    weight = getattr(element, 'weight', None)
+    if weight is not None:
+        properties['weight'] = weight
+    return properties
+
+
+def _keys(elements):
+    types = {}
+    for element in elements:
+        for name, value in _properties(element).items():
+            if value is not None:
+                types.setdefault(name, set()).add(type(value))
+    return dict((name, _type(t)) for name, t in types.items())
+
+
+def save(graph, file_):
+    """
+    Write `graph` to `file_` (a path or a text file object) as GraphML.
+
+    Vertices are written with ids `n<idx>`. Properties are typed from their
+    python values, and properties whose values aren't all booleans or
+    numbers are written as strings.
+    """
+    if isinstance(file_, str):
+        with open(file_, 'w') as f:
+            return save(graph, f)
+
+    vkeys = _keys(graph.V())
+    ekeys = _keys(graph.E())
+    ids = {}
+
+    write = file_.write
+    write('<?xml version="1.0" encoding="UTF-8"?>\n')
+    write('<graphml xmlns="{0}">\n'.format(NAMESPACE))
+    for for_, keys in (('node', vkeys), ('edge', ekeys)):
+        for name, type_ in sorted(keys.items()):
+            id_ = ids[for_, name] = "d{0}".format(len(ids))
+            write('  <key id={0} for="{1}" attr.name={2} '
+                  'attr.type="{3}"/>\n'.format(quoteattr(id_), for_,
+                                               quoteattr(name), type_))
+    write('  <graph id="G" edgedefault="directed">\n')
+
+    for for_, elements, keys in (('node', graph.V(), vkeys),
+                                 ('edge', graph.E(), ekeys)):
+        for element in elements:
+            if for_ == 'node':
+                write('    <node id="n{0}"'.format(element.idx))
+            else:
+                write('    <edge source="n{0}" target="n{1}"'.format(
+                    element.from_.idx, element.to.idx))
+            data = [(name, value)
+                    for name, value in sorted(_properties(element).items())
+                    if value is not None]
+            if not data:
+                write('/>\n')
+                continue
+            write('>\n')
+            for name, value in data:
+                write('      <data key="{0}">{1}</data>\n'.format(
+                    ids[for_, name], _text(value, keys[name])))
+            write('    </{0}>\n'.format(for_))
+
+    write('  </graph>\n')
+    write('</graphml>\n')
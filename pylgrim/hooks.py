@@ -0,0 +1,46 @@
+"""
+Hooks that hear about every traversal, for exporting metrics without
+touching the code that runs the traversals.
+
+    >>> def export(traversal, plan):
+    ...     for step in plan.report():
+    ...         histogram(step['step']).observe(step['seconds'])
+    >>> hooks.add(export, sample=0.01)
+
+While there are hooks, traversals are profiled: each step is timed and its
+elements counted (see `Traversal.profile`). Once a traversal is finished,
+whether it ran to the end or was dropped part of the way through, every
+hook is called with the `Traversal` and its `Plan`. `sample` is the
+fraction of traversals a hook hears about, and only traversals some hook
+will hear about are profiled, so a low rate keeps the cost down. With no
+hooks nothing is profiled at all.
+"""
+import random
+
+# (hook, sample) pairs. Adding or removing a hook replaces the list rather
+# than changing it, so it can be read without a lock.
+_hooks = []
+
+
+def add(hook, sample=1.0):
+    """Call `hook(traversal, plan)` after a `sample` of traversals"""
+    global _hooks
+    if not 0 < sample <= 1:
+        raise ValueError("sample must be more than 0 and at most 1, "
+                         "not {0!r}".format(sample))
+    _hooks = [(h, s) for h, s in _hooks if h != hook] + [(hook, sample)]
+
+
+def remove(hook):
+    """Stop calling `hook`. Does nothing if it isn't a hook."""
+    global _hooks
+    _hooks = [(h, s) for h, s in _hooks if h != hook]
+
+
+def sampled():
+    """The hooks to call about the traversal that's starting"""
+    hooks = _hooks
+    if not hooks:
+        return ()
+    return [hook for hook, sample in hooks
+            if sample >= 1 or random.random() < sample]
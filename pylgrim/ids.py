@@ -0,0 +1,44 @@
+"""
+Vertex id strategies.
+
+Every vertex added to a `Graph` gets an `id`, which stays the same for as
+long as the vertex is in the graph, and can be looked up with
+`Graph.vertex(id)`. How ids are made is up to the graph's id strategy:
+
+    >>> Graph()                         # 0, 1, 2, ...
+    >>> Graph(ids=UUIDIds())            # the vertex's uuid
+    >>> Graph(ids=KeyIds("email"))      # the vertex's `email` property
+"""
+
+
+class SequentialIds(object):
+    """Monotonically increasing integers, the default"""
+    def __init__(self, start=0):
+        self._next = start
+
+    def allocate(self, element):
+        id_ = self._next
+        self._next = id_ + 1
+        return id_
+
+
+class UUIDIds(object):
+    """
+    The vertex's `uuid`. Vertices only generate a uuid the first time it's
+    asked for, so with any other strategy they never pay for one.
+    """
+    def allocate(self, element):
+        return element.uuid
+
+
+class KeyIds(object):
+    """A user-supplied key, taken from the property `key` of each vertex"""
+    def __init__(self, key):
+        self.key = key
+
+    def allocate(self, element):
+        try:
+            return getattr(element, self.key)
+        except AttributeError:
+            raise ValueError("{0!r} has no {1} to use as its id".format(
+                element, self.key))
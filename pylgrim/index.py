@@ -0,0 +1,166 @@
+"""
+Property indexes.
+
+An `Index` maps each value of one property to the elements that have it, so
+looking up `name="Fred"` is a dict lookup instead of a scan over every
+vertex. Indexes are created and kept up to date by `Graph`:
+
+    >>> g.createindex("name")
+    >>> g.V(name="Fred")
+"""
+from itertools import chain
+from operator import attrgetter
+
+from pylgrim.element import ElementList
+from pylgrim.predicates import Predicate
+
+# stands in for "this element doesn't have the property at all"
+MISSING = object()
+
+
+class Index(object):
+    def __init__(self, key):
+        self.key = key
+        # value -> {element: None}, a dict rather than a list so elements
+        # can be dropped in O(1) while keeping the order they were added in
+        self._entries = {}
+
+    def add(self, element, value):
+        if value is MISSING or value is None:
+            return
+        try:
+            self._entries.setdefault(value, {})[element] = None
+        except TypeError:
+            # unhashable values can't be indexed, lookups for them scan
+            pass
+
+    def remove(self, element, value):
+        try:
+            bucket = self._entries.get(value)
+        except TypeError:
+            return
+        if bucket is not None:
+            bucket.pop(element, None)
+            if not bucket:
+                del self._entries[value]
+
+    def get(self, value):
+        try:
+            return ElementList(self._entries.get(value, ()))
+        except TypeError:
+            return None
+
+    def matching(self, predicate):
+        """The values in the index that `predicate` is true for"""
+        return [value for value in self._entries if predicate(value)]
+
+    def count(self, value):
+        try:
+            return len(self._entries.get(value, ()))
+        except TypeError:
+            return None
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def _values(index, filter_):
+    """
+    The indexed values that `filter_` matches, or None if the index can't
+    answer it: a filter that matches None (which isn't indexed), or one
+    that's an arbitrary callable rather than a predicate.
+    """
+    if isinstance(filter_, Predicate):
+        if filter_(None):
+            return None
+        values = filter_.values()
+        if values is None:
+            return index.matching(filter_)
+        return values
+    if filter_ is None or callable(filter_):
+        return None
+    return (filter_,)
+
+
+def _best(indexes, filters):
+    # (count, key, values) for the indexed filter with the fewest candidates
+    best = None
+    for key, filter_ in filters.items():
+        index = indexes.get(key)
+        if index is None:
+            continue
+        values = _values(index, filter_)
+        if values is None:
+            continue
+        counts = [index.count(value) for value in values]
+        if None in counts:
+            continue
+        count = sum(counts)
+        if best is None or count < best[0]:
+            best = (count, key, values)
+    return best
+
+
+def lookup(indexes, filters):
+    """
+    Answer `filters` from `indexes` if any of them can be. The most
+    selective indexed filter picks the candidates, and the rest of the
+    filters are applied to those. Equality filters and `within` are looked
+    up directly; other predicates, like `gt` or `regex`, are tested against
+    the distinct values in the index rather than against every element.
+
+    Returns None when no index applies, so the caller should scan instead.
+    """
+    best = _best(indexes, filters)
+    if best is None:
+        return None
+
+    _, key, values = best
+    index = indexes[key]
+    if len(values) == 1:
+        candidates = index.get(values[0])
+    else:
+        # keep the elements in graph order, as a scan would have
+        candidates = ElementList(sorted(
+            set(chain.from_iterable(index.get(value) for value in values)),
+            key=attrgetter('idx')))
+    rest = dict((k, v) for k, v in filters.items() if k != key)
+    return candidates.filter(**rest) if rest else candidates
+
+
+def estimate(indexes, filters):
+    """
+    How many candidates `lookup` would start from for `filters`, without
+    looking them up, or None when no index applies.
+    """
+    best = _best(indexes, filters)
+    return None if best is None else best[0]
+
+
+class IndexedElementList(ElementList):
+    """
+    The ElementList of every vertex (or every edge) in a graph. `filter()`
+    on it is answered from the graph's indexes when it can be, and then
+    from its property columns if it has them (see `pylgrim.columns`), which
+    answer projections too.
+    """
+    __slots__ = ('_indexes', '_columns')
+
+    def __init__(self, indexes, elements=(), columns=None):
+        super(IndexedElementList, self).__init__(elements)
+        self._indexes = indexes
+        self._columns = columns
+
+    def __getattr__(self, name):
+        columns = self._columns
+        if columns is not None and name in columns:
+            return ElementList(columns.project(name, len(self)))
+        return super(IndexedElementList, self).__getattr__(name)
+
+    def filter(self, **filters):
+        result = lookup(self._indexes, filters)
+        if result is None and self._columns is not None:
+            result = self._columns.filter(self, filters)
+        if result is None:
+            return super(IndexedElementList, self).filter(**filters)
+        return result
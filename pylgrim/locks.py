@@ -0,0 +1,157 @@
+"""
+Locking for graphs that are read and written from several threads at once.
+
+A `Graph(concurrent=True)` has an `RWLock`. Everything that changes the
+graph (adding and removing vertices and edges, setting properties, creating
+indexes) holds it for writing, so the several lists an edge is linked into
+all change together, and anything that reads more than one thing at a time
+(a vertex's edges, `V()`, the steps of a traversal) holds it for reading.
+Readers don't block each other; a writer waits for the readers that are in
+the middle of a read, and readers that come along after it wait for it.
+
+A traversal only holds the read lock while it works out its next result,
+so a long traversal lets writers in between results, and each result is
+consistent, but the graph can change between one and the next. To see one
+version of the graph all the way through, hold the read lock around it:
+
+    >>> with g.reading():
+    ...     friends = v.traverse().out(label="knows").toList()
+    ...     fof = v.traverse().out(label="knows").out().toList()
+
+and to make several changes at once, so no reader sees some of them
+without the rest, the write lock:
+
+    >>> with g.writing():
+    ...     w = g.addvertex(name="Wilma")
+    ...     g.addedge(v, w, label="knows")
+"""
+import threading
+
+from functools import wraps
+
+_get_ident = threading.get_ident
+
+
+class _Holding(object):
+    # a context manager for one side of an RWLock
+    __slots__ = ('_acquire', '_release')
+
+    def __init__(self, acquire, release):
+        self._acquire = acquire
+        self._release = release
+
+    def __enter__(self):
+        self._acquire()
+
+    def __exit__(self, *exc_info):
+        self._release()
+
+
+class RWLock(object):
+    """
+    A lock that any number of threads can hold for reading, or one thread
+    for writing. Both sides are reentrant, and the thread holding it for
+    writing can also read, but a thread holding it for reading can't start
+    writing: that would wait for itself.
+
+        >>> with lock.reading():
+        ...     ...
+    """
+    def __init__(self):
+        self._condition = threading.Condition(threading.Lock())
+        self._readers = 0
+        # the thread writing, how many times over, and how many are waiting
+        # to; readers let waiting writers go first, so a steady stream of
+        # readers can't keep them out
+        self._writer = None
+        self._writes = 0
+        self._waiting = 0
+        # how many times it's been let go of after writing, so a reader can
+        # tell whether anything could have changed since it last looked
+        self.generation = 0
+        # each thread's count of the reads it holds
+        self._local = threading.local()
+        self._reading = _Holding(self.acquireread, self.releaseread)
+        self._writing = _Holding(self.acquirewrite, self.releasewrite)
+
+    def reading(self):
+        """A context manager holding the lock for reading"""
+        return self._reading
+
+    def writing(self):
+        """A context manager holding the lock for writing"""
+        return self._writing
+
+    def acquireread(self):
+        if self._writer == _get_ident():
+            self._writes += 1
+            return
+        local = self._local
+        reads = getattr(local, 'reads', 0)
+        if not reads:
+            with self._condition:
+                while self._writer is not None or self._waiting:
+                    self._condition.wait()
+                self._readers += 1
+        local.reads = reads + 1
+
+    def releaseread(self):
+        if self._writer == _get_ident():
+            self.releasewrite()
+            return
+        local = self._local
+        local.reads -= 1
+        if not local.reads:
+            with self._condition:
+                self._readers -= 1
+                if not self._readers:
+                    self._condition.notify_all()
+
+    def acquirewrite(self):
+        me = _get_ident()
+        if self._writer == me:
+            self._writes += 1
+            return
+        if getattr(self._local, 'reads', 0):
+            raise RuntimeError("Can't write while holding the lock for "
+                               "reading")
+        with self._condition:
+            self._waiting += 1
+            try:
+                while self._writer is not None or self._readers:
+                    self._condition.wait()
+            finally:
+                self._waiting -= 1
+            self._writer = me
+            self._writes = 1
+
+    def releasewrite(self):
+        self._writes -= 1
+        if not self._writes:
+            self.generation += 1
+            with self._condition:
+                self._writer = None
+                self._condition.notify_all()
+
+
+def reads(method, copy=None):
+    """
+    `method`, holding `self._lock` for reading while it runs. `copy` is
+    applied to the result inside the lock, for methods that return
+    something the next writer will change.
+    """
+    @wraps(method)
+    def locked(self, *args, **kwds):
+        with self._lock.reading():
+            result = method(self, *args, **kwds)
+            return result if copy is None else copy(result)
+    return locked
+
+
+def writes(method):
+    """`method`, holding `self._lock` for writing while it runs"""
+    @wraps(method)
+    def locked(self, *args, **kwds):
+        with self._lock.writing():
+            return method(self, *args, **kwds)
+    return locked
@@ -0,0 +1,162 @@
+"""
+Running one traversal from many starting vertices, in parallel.
+
+The graph is written once, as a snapshot (see `pylgrim.snapshot`), into a
+block of `multiprocessing.shared_memory`. Every worker process opens a
+`CompactGraph` straight over that block, so the graph is never pickled or
+copied into a worker; only the steps of the traversal, the `idx` numbers
+of each batch of starting vertices, and the results are sent back and
+forth.
+
+    >>> friends = Traversal().out(label="knows").out(label="knows")
+    >>> g.traversemany(g.V(), friends, workers=32)
+    [ElementList([...]), ElementList([...]), ...]
+
+Elements in the results are sent back as their `idx` numbers, and turned
+back into the calling graph's own vertices and edges.
+"""
+import multiprocessing
+import os
+from multiprocessing import shared_memory, util
+
+from pylgrim import snapshot
+from pylgrim.compact import CompactGraph, EdgeView, VertexView
+from pylgrim.element import ElementList
+from pylgrim.traversal import Traversal
+
+# steps that only make sense in the process that asked for them
+UNSUPPORTED = frozenset(['aggregate'])
+
+
+class _VertexRef(int):
+    # a vertex in a result, on its way back from a worker
+    __slots__ = ()
+
+
+class _EdgeRef(int):
+    __slots__ = ()
+
+
+def _encode(result):
+    if isinstance(result, VertexView):
+        return _VertexRef(result.idx)
+    if isinstance(result, EdgeView):
+        return _EdgeRef(result.idx)
+    if isinstance(result, list):
+        return type(result)(map(_encode, result))
+    if isinstance(result, dict):
+        return dict((k, _encode(v)) for k, v in result.items())
+    return result
+
+
+def _decode(graph, result):
+    if isinstance(result, _VertexRef):
+        return graph.v(int(result))
+    if isinstance(result, _EdgeRef):
+        return graph.e(int(result))
+    if isinstance(result, list):
+        return type(result)(_decode(graph, r) for r in result)
+    if isinstance(result, dict):
+        return dict((k, _decode(graph, v)) for k, v in result.items())
+    return result
+
+
+class _Into(object):
+    # a file-like object writing into a block of memory
+    def __init__(self, buffer):
+        self.buffer = buffer
+        self.position = 0
+
+    def write(self, data):
+        data = memoryview(data).cast('B')
+        self.buffer[self.position:self.position + data.nbytes] = data
+        self.position += data.nbytes
+
+
+# the graph a worker process runs its traversals on, and the shared memory
+# it's read from
+_graph = None
+_memory = None
+
+
+def _attach(name):
+    global _graph, _memory
+    _memory = shared_memory.SharedMemory(name=name)
+    _graph = CompactGraph(snapshot.openstore(snapshot.Snapshot(_memory.buf)))
+    # the graph's arrays have to go before the memory under them can be
+    # closed, when the worker exits
+    util.Finalize(_memory, _detach, exitpriority=10)
+
+
+def _detach():
+    global _graph, _memory
+    _graph = None
+    try:
+        _memory.close()
+    except BufferError:
+        pass
+
+
+def _run(graph, steps, idxs):
+    store = graph._store
+    return [_encode(ElementList(Traversal((VertexView(store, idx),), steps)))
+            for idx in idxs]
+
+
+def _local(graph, steps, idxs):
+    # the same, in this process and on the graph itself
+    return [ElementList(Traversal((graph.v(idx),), steps)) for idx in idxs]
+
+
+def _work(task):
+    steps, idxs = task
+    return _run(_graph, steps, idxs)
+
+
+def _chunks(items, size):
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def traversemany(graph, starts, traversal, workers=None, chunksize=None):
+    """
+    Run `traversal` from each vertex in `starts` in `workers` processes, and
+    return an ElementList of its results for each one, in order.
+
+    The workers can only be given a graph that fits in a snapshot, so if
+    any property (or `obj`) of the graph is something that a snapshot can't
+    hold, which is anything but numbers, strings, booleans, None and lists
+    and dicts of them, it all runs in this process instead.
+    """
+    steps = traversal._steps
+    for name, _, _ in steps:
+        if name in UNSUPPORTED:
+            raise ValueError("{0} can't run in another process".format(name))
+    idxs = [graph._vertexidx(v) for v in starts]
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if chunksize is None:
+        chunksize = max(1, -(-len(idxs) // (workers * 4)))
+
+    if workers <= 1 or len(idxs) <= 1:
+        # no other processes to share the work with
+        return _local(graph, steps, idxs)
+
+    try:
+        writer, header = snapshot.encode(graph)
+    except TypeError:
+        # a value a snapshot can't hold, so no worker could read the graph
+        return _local(graph, steps, idxs)
+    prefix = writer.prefix(header)
+    memory = shared_memory.SharedMemory(create=True,
+                                        size=len(prefix) + writer.size)
+    try:
+        writer.write(_Into(memory.buf), prefix)
+        del writer
+        with multiprocessing.Pool(workers, _attach, (memory.name,)) as pool:
+            results = pool.map(_work, [(steps, chunk) for chunk in
+                                       _chunks(idxs, chunksize)])
+    finally:
+        memory.close()
+        memory.unlink()
+
+    return [_decode(graph, result) for chunk in results for result in chunk]
@@ -0,0 +1,469 @@
+"""
+Traversal planning.
+
+A `Traversal` only records its steps. When it's run they're first turned
+into a plan, which gives exactly the same results for less work:
+
+- filters straight after `g.traverse()` are answered the way
+  `g.V(**filters)` is, from an index (or the graph's property columns)
+  instead of by testing every vertex
+- consecutive filters are merged, and the tests in a filter are put in
+  order of how few elements each is expected to keep, so the ones that
+  rule out the most run first
+- `outE().inV()` becomes `out()`, and `inE().outV()` becomes `in_()`,
+  unless the edges are needed for a path
+- in `g.traverse().out(label="bought").filter(country="NZ")`, when the
+  filter can be looked up in an index and is expected to match far fewer
+  vertices than the step would reach, the plan starts from that end: the
+  matching vertices are looked up, the starting vertices are cut down to
+  the ones with an edge to one of them, and only those are expanded
+
+`Traversal.explain()` runs a traversal and shows its plan, with how many
+elements each step was estimated to produce and how many it did:
+
+    >>> g.createindex("country")
+    >>> g.traverse().out(label="bought").filter(country="NZ").explain()
+    step                  estimated    actual
+    V()                         882       874  semi-join
+    out(label='bought')        1180      2007
+    filter(country='NZ')        882       884  semi-join from 660 matches
+
+Estimates come from the graph's indexes where there are some. A filter
+without an index is guessed to keep a tenth of what it's given.
+"""
+from itertools import chain, islice
+from operator import attrgetter
+from time import perf_counter
+from tracemalloc import get_traced_memory
+
+from pylgrim.index import MISSING, estimate
+
+# the fraction of elements a filter that isn't indexed is guessed to keep
+GUESS = 0.1
+
+# steps that are rewritten into a single one when they follow each other
+_FOLDS = {('outE', 'inV'): 'out', ('inE', 'outV'): 'in_'}
+
+# how many elements a stage makes at a time when its allocations are measured
+BATCH = 256
+
+# the end of a stage's elements
+_DONE = object()
+
+# vertex steps, and the step going the other way along the same edges
+_REVERSE = {'out': 'in_', 'in_': 'out', 'both': 'both'}
+
+# what each step leaves in the stream: vertices, edges, or (None) anything
+_VERTICES = frozenset(['out', 'in_', 'both', 'inV', 'outV', 'loop'])
+_EDGES = frozenset(['outE', 'inE', 'bothE'])
+_UNCHANGED = frozenset(['filter', 'as', 'uniquePath', 'aggregate'])
+
+
+def describe(name, args, kwds):
+    """A step as it would be written, like `out(label='knows')`"""
+    params = [repr(a) for a in args]
+    params += ["{0}={1!r}".format(k, v) for k, v in sorted(kwds.items())]
+    return "{0}({1})".format(name, ", ".join(params))
+
+
+class Operator(object):
+    """One step of a `Plan`"""
+    def __init__(self, name, args=(), kwds=None, estimate=None, note=None):
+        self.name = name
+        self.args = tuple(args)
+        self.kwds = dict(kwds or {})
+        # how many elements the step is expected to produce, or None if
+        # there's no telling, and how many it did once it's been run
+        self.estimate = estimate
+        self.actual = None
+        self.note = note
+        # when profiled, the seconds spent in the step itself and the bytes
+        # it allocated, not counting the steps before it
+        self.seconds = None
+        self.allocated = None
+        self._seconds = self._allocated = None
+
+    def __str__(self):
+        return describe(self.name, self.args, self.kwds)
+
+
+class Plan(object):
+    """
+    How a traversal runs: the elements it starts from, and the steps it
+    puts them through, with an `Operator` describing each one (the first
+    describes the starts).
+    """
+    def __init__(self, starts, steps, operators):
+        self.starts = starts
+        self.steps = steps
+        self.operators = operators
+        # what each stage records as it runs: nothing (None), how many
+        # elements it produces ('count'), that and how long it takes
+        # ('time'), or all that and how much it allocates ('memory')
+        self.recording = None
+        # whether the results can depend on any vertex in the graph, not
+        # just the ones the traversal goes through
+        self.wholegraph = False
+
+    def stage(self, i, elements):
+        """`elements`, the output of stage `i`, recorded as they go by"""
+        if self.recording is None:
+            return elements
+        if self.recording == 'count':
+            return _counted(self.operators[i], elements)
+        if self.recording == 'time':
+            return _timed(self.operators[i], elements)
+        return _measured(self.operators[i], elements)
+
+    def finish(self):
+        """
+        Work out what each stage took by itself, once the traversal has
+        finished. Pulling an element out of a stage pulls elements through
+        every stage before it, so the totals it kept include theirs. A
+        stage that frees more than it allocates, like a filter dropping
+        values an earlier stage made, is put down as allocating nothing.
+        """
+        seconds, allocated = 0.0, 0
+        for op in self.operators:
+            if op._seconds is None:
+                break
+            op.seconds = op._seconds - seconds
+            seconds = op._seconds
+            if op._allocated is not None:
+                op.allocated = max(op._allocated - allocated, 0)
+                allocated = op._allocated
+
+    def report(self):
+        """
+        The plan as a list of dicts, one per step, of its `step`, the
+        `estimated` and `actual` numbers of elements it produced, the number
+        it was given (`in`), its `seconds` and `allocated` bytes (None
+        unless it was profiled), and any `note` on how it was run.
+        """
+        report = []
+        given = None
+        for op in self.operators:
+            report.append({
+                'step': str(op),
+                'estimated': op.estimate,
+                'in': given,
+                'actual': op.actual,
+                'seconds': op.seconds,
+                'allocated': op.allocated,
+                'note': op.note,
+            })
+            given = op.actual
+        return report
+
+    def __repr__(self):
+        columns = ["step", "estimated", "actual"]
+        timed = any(op.seconds is not None for op in self.operators)
+        allocated = any(op.allocated is not None for op in self.operators)
+        if timed:
+            columns.append("ms")
+        if allocated:
+            columns.append("KiB")
+        rows = [columns + [""]]
+        for op in self.operators:
+            row = [str(op), _number(op.estimate), _number(op.actual)]
+            if timed:
+                row.append(_number(None if op.seconds is None
+                                   else op.seconds * 1e3))
+            if allocated:
+                row.append(_number(None if op.allocated is None
+                                   else op.allocated / 1024.0))
+            rows.append(row + [op.note or ""])
+        width = max(len(row[0]) for row in rows)
+        template = "{0:<{w}}  {1:>9}  {2:>8}" + "".join(
+            "  {%d:>8}" % i for i in range(3, len(columns))) + \
+            "  {%d}" % len(columns)
+        return "\n".join(template.format(*row, w=width).rstrip()
+                         for row in rows)
+
+
+def _number(n):
+    if n is None:
+        return "?"
+    if isinstance(n, int):
+        return str(n)
+    return "{0:.3g}".format(n) if n < 1000 else str(int(round(n)))
+
+
+def _counted(operator, elements):
+    operator.actual = 0
+    for element in elements:
+        operator.actual += 1
+        yield element
+
+
+def _timed(operator, elements):
+    clock = perf_counter
+    operator.actual = 0
+    operator._seconds = 0.0
+    elements = iter(elements)
+    while True:
+        start = clock()
+        element = next(elements, _DONE)
+        operator._seconds += clock() - start
+        if element is _DONE:
+            return
+        operator.actual += 1
+        yield element
+
+
+def _measured(operator, elements):
+    # Profiling allocations always runs a traversal to the end, so a stage
+    # can take BATCH elements at a time and read the memory in use once a
+    # batch rather than once an element. What it counts is the memory in
+    # use after making a batch over what was in use before, which includes
+    # what the stages before it made for the batch.
+    clock = perf_counter
+    operator.actual = 0
+    operator._seconds = 0.0
+    operator._allocated = 0
+    elements = iter(elements)
+    while True:
+        # the last batch is let go of first, so what the stages after this
+        # one did with its elements isn't put down to it
+        batch = None
+        used = get_traced_memory()[0]
+        start = clock()
+        batch = list(islice(elements, BATCH))
+        operator._seconds += clock() - start
+        operator._allocated += get_traced_memory()[0] - used
+        if not batch:
+            return
+        operator.actual += len(batch)
+        for element in batch:
+            yield element
+
+
+class _SemiJoin(object):
+    # The starts of a plan that begins from its far end. Iterating over it
+    # looks up the vertices matching `filters`, then yields the starts that
+    # `step` reaches at least one of, in their original order; `matches`
+    # then stands in for the filter.
+    def __init__(self, graph, starts, step, kwds, filters):
+        self.graph = graph
+        self.starts = starts
+        self.step = step
+        self.kwds = kwds
+        self.filters = filters
+        # the Operator of the filter, which gets a note once it's run
+        self.operator = None
+        self.ends = None
+
+    def __iter__(self):
+        self.ends = set(self.graph.V(**self.filters))
+        reverse = _REVERSE[self.step]
+        sources = set(chain.from_iterable(
+            getattr(end, reverse)(**self.kwds) for end in self.ends))
+        self.operator.note = "semi-join from {0} matches".format(
+            len(self.ends))
+        if self.starts is None:
+            return iter(sorted(sources, key=attrgetter('idx')))
+        return (start for start in self.starts if start in sources)
+
+    def matches(self, element):
+        return element in self.ends
+
+
+def _lookup(graph, filters):
+    # the vertices matching `filters`, in graph order, the way a scan
+    # would find them
+    return iter(sorted(graph.V(**filters), key=attrgetter('idx')))
+
+
+def _answerable(graph, filters):
+    # the kind of lookup `graph.V(**filters)` would be, or None for a scan
+    if estimate(graph._vindexes, filters) is not None:
+        return "index"
+    columns = graph._vcolumns
+    if columns is not None and any(key in columns for key in filters):
+        return "columns"
+    return None
+
+
+class _Statistics(object):
+    # what the planner knows about a graph, for estimating cardinalities
+    def __init__(self, graph):
+        self.graph = graph
+        self.nvertices, self.nedges = graph._size()
+
+    def selectivity(self, kind, filters, closures=()):
+        """The fraction of elements of `kind` expected to pass `filters`"""
+        if kind == 'vertex':
+            indexes, n = self.graph._vindexes, self.nvertices
+        elif kind == 'edge':
+            indexes, n = self.graph._eindexes, self.nedges
+        else:
+            indexes, n = {}, 0
+        fraction = GUESS ** len(closures)
+        for key, filter_ in filters.items():
+            count = estimate(indexes, {key: filter_}) if n else None
+            fraction *= GUESS if count is None else count / float(n)
+        return fraction
+
+    def degree(self, name, kwds):
+        """How many elements `name(**kwds)` is expected to give per element"""
+        if name in ('inV', 'outV'):
+            return 1.0
+        n = self.nvertices
+        if not n:
+            return 0.0
+        kwds = dict(kwds)
+        label = kwds.pop('label', MISSING)
+        if label is MISSING:
+            degree = self.nedges / float(n)
+        else:
+            degree = self.selectivity('edge', {'label': label}) * \
+                self.nedges / n
+        if name in ('both', 'bothE'):
+            degree *= 2
+        kind = 'edge' if name in _EDGES else 'vertex'
+        return degree * self.selectivity(kind, kwds)
+
+
+def _merge(steps):
+    # consecutive filters on different properties become one
+    merged = []
+    for step in steps:
+        if merged and step[0] == 'filter' and merged[-1][0] == 'filter' and \
+                not set(step[2]) & set(merged[-1][2]):
+            _, args, kwds = merged.pop()
+            step = ('filter', args + step[1], dict(kwds, **step[2]))
+        merged.append(step)
+    return merged
+
+
+def _fold(steps, pathsteps):
+    # only after the last step that needs paths, which would miss the edges
+    last = 0
+    for i, (name, _, _) in enumerate(steps):
+        if name in pathsteps:
+            last = i + 1
+    folded = list(steps[:last])
+    for step in steps[last:]:
+        if folded and len(folded) > last and not step[2]:
+            previous = folded[-1]
+            fold = _FOLDS.get((previous[0], step[0]))
+            if fold is not None and set(previous[2]) <= set(['label']):
+                folded[-1] = (fold, (), previous[2])
+                continue
+        folded.append(step)
+    return folded
+
+
+def _source(graph, stats, steps):
+    # the starts for a traversal of the whole graph, taking over the filter
+    # at the front of `steps` when it can be looked up
+    filters = steps[0][2] if steps and steps[0][0] == 'filter' else None
+    how = _answerable(graph, filters) if filters else None
+    if how is None:
+        return None, steps, Operator('V', estimate=stats.nvertices)
+    estimated = stats.nvertices * stats.selectivity('vertex', filters)
+    closures = steps[0][1]
+    steps = ([('filter', closures, {})] if closures else []) + steps[1:]
+    return (_lookup(graph, filters), steps,
+            Operator('V', (), filters, estimated, how + " lookup"))
+
+
+def _semijoin(graph, stats, starts, steps, n):
+    # a _SemiJoin if `steps` start with a vertex step and a filter that's
+    # cheaper to start from, otherwise None
+    if len(steps) < 2 or n is None:
+        return None
+    (name, _, kwds), (then, closures, filters) = steps[:2]
+    if name not in _REVERSE or not set(kwds) <= set(['label']) or \
+            then != 'filter' or not filters or closures:
+        return None
+    ends = estimate(graph._vindexes, filters)
+    if ends is None:
+        return None
+    degree = stats.degree(name, kwds)
+    # edges followed backwards from the ends, then forwards from the starts
+    # they reach, against forwards from every start
+    reached = min(n, ends * degree)
+    if ends * degree + reached * degree >= n * degree:
+        return None
+    join = _SemiJoin(graph, starts, name, kwds, filters)
+    join.reached = reached
+    return join
+
+
+def _kind(name, kind):
+    if name in _VERTICES:
+        return 'vertex'
+    if name in _EDGES:
+        return 'edge'
+    return kind if name in _UNCHANGED else None
+
+
+def normalize(steps, pathsteps=()):
+    """
+    `steps` with consecutive filters merged and step pairs like
+    `outE().inV()` folded into one, which the plan is made from
+    """
+    return _fold(_merge(steps), frozenset(pathsteps))
+
+
+def plan(starts, steps, graph=None, pathsteps=()):
+    """
+    Plan a traversal of `steps` from `starts`, or from every vertex of
+    `graph` if `starts` is None. Without a graph the plan can still merge
+    and fold steps, but has no indexes to use or estimates to make.
+    `pathsteps` are the names of the steps that need paths.
+    """
+    steps = normalize(steps, pathsteps)
+    size = len(starts) if hasattr(starts, '__len__') else None
+    if graph is None:
+        operators = [Operator('starts', estimate=size)]
+        operators.extend(Operator(*step) for step in steps)
+        return Plan(starts, steps, operators)
+
+    stats = _Statistics(graph)
+    wholegraph = starts is None
+    if wholegraph:
+        starts, steps, source = _source(graph, stats, steps)
+    else:
+        source = Operator('starts', estimate=size)
+    operators = [source]
+    operators.extend(Operator(*step) for step in steps)
+
+    n = source.estimate
+    join = _semijoin(graph, stats, starts, steps, n)
+    if join is not None:
+        join.operator = operators[2]
+        # the same results, so the same estimate, as going forwards
+        (name, _, kwds), (_, _, filters) = steps[:2]
+        result = n * stats.degree(name, kwds) * \
+            stats.selectivity('vertex', filters)
+        n = source.estimate = join.reached
+        source.note = ", ".join(filter(None, [source.note, "semi-join"]))
+        steps = [steps[0], ('filter', (join.matches,), {})] + steps[2:]
+        starts = join
+        wholegraph = True
+    if starts is None:
+        starts = graph._allvertices()
+
+    kind = 'vertex'
+    for i, op in enumerate(operators[1:]):
+        name, args, kwds = op.name, op.args, op.kwds
+        if name == 'filter' and len(kwds) > 1 and steps[i][2]:
+            # the tests that rule out the most go first
+            kwds = dict(sorted(
+                kwds.items(),
+                key=lambda item: stats.selectivity(kind, dict([item]))))
+            steps[i] = ('filter', args, kwds)
+        if n is not None:
+            if name in _VERTICES or name in _EDGES:
+                n = None if name == 'loop' else n * stats.degree(name, kwds)
+            elif join is not None and i == 1:
+                n = min(n, result)
+            elif name == 'filter':
+                n *= stats.selectivity(kind, kwds, args)
+        op.estimate = n
+        kind = _kind(name, kind)
+    p = Plan(starts, steps, operators)
+    p.wholegraph = wholegraph
+    return p
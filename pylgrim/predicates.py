@@ -0,0 +1,203 @@
+"""
+Filter predicates.
+
+Any keyword filter can be a plain value, which matches by equality, or a
+callable, which is called with the property's value. The predicates here
+are callables too, but ones the graph understands, so a filter on an
+indexed property can be answered from the index instead of by a scan:
+
+    >>> g.V(age=gt(30))
+    >>> g.V(name=regex("^Fr"), hometown=within("Flint", "Clarkston"))
+
+A property an element doesn't have is passed to predicates as None, and
+none of the comparison predicates match None.
+"""
+import re
+
+
+class Predicate(object):
+    """Base class for predicates, which are called with a property value"""
+    def __call__(self, value):
+        raise NotImplementedError
+
+    def values(self):
+        """
+        The exact values this predicate matches, if it only matches a known,
+        finite set of them, or None. Indexes look these up directly instead
+        of testing every value they hold.
+        """
+        return None
+
+    def __repr__(self):
+        return "{0}({1!r})".format(type(self).__name__, self.value)
+
+
+class _Comparison(Predicate):
+    def __init__(self, value):
+        self.value = value
+
+    def __call__(self, value):
+        try:
+            return self.compare(value, self.value)
+        except TypeError:
+            # None, or a value of a type that doesn't compare with ours
+            return False
+
+
+class gt(_Comparison):
+    """Values greater than `value`"""
+    @staticmethod
+    def compare(a, b):
+        return a > b
+
+
+class gte(_Comparison):
+    """Values greater than or equal to `value`"""
+    @staticmethod
+    def compare(a, b):
+        return a >= b
+
+
+class lt(_Comparison):
+    """Values less than `value`"""
+    @staticmethod
+    def compare(a, b):
+        return a < b
+
+
+class lte(_Comparison):
+    """Values less than or equal to `value`"""
+    @staticmethod
+    def compare(a, b):
+        return a <= b
+
+
+class within(Predicate):
+    """Any of `values`: `within("Flint", "Clarkston")`"""
+    def __init__(self, *values):
+        self.value = values
+        try:
+            self._values = frozenset(values)
+        except TypeError:
+            self._values = None
+
+    def __call__(self, value):
+        if self._values is not None:
+            try:
+                return value in self._values
+            except TypeError:
+                pass
+        return value in self.value
+
+    def values(self):
+        return self.value
+
+    def __repr__(self):
+        return "within{0!r}".format(self.value)
+
+
+class without(within):
+    """None of `values`"""
+    def __call__(self, value):
+        return not super(without, self).__call__(value)
+
+    def values(self):
+        return None
+
+    def __repr__(self):
+        return "without{0!r}".format(self.value)
+
+
+class regex(Predicate):
+    """
+    Strings that `pattern` matches, anywhere in the string (`re.search`).
+    `pattern` can be a string or a compiled pattern.
+    """
+    def __init__(self, pattern, flags=0):
+        self.value = pattern
+        self.flags = flags
+        if isinstance(pattern, str):
+            pattern = re.compile(pattern, flags)
+        self._search = pattern.search
+
+    def __call__(self, value):
+        return isinstance(value, str) and self._search(value) is not None
+
+    def __repr__(self):
+        if not self.flags:
+            return super(regex, self).__repr__()
+        return "regex({0!r}, flags={1!r})".format(self.value, self.flags)
+
+
+def _getattr(obj, attr):
+    return getattr(obj, attr, None)
+
+
+def _getitem(obj, attr):
+    # anything that isn't an Element or a dict: try it as a mapping first,
+    # like ElementList always has
+    try:
+        return obj[attr]
+    except (KeyError, TypeError):
+        return getattr(obj, attr, None)
+
+
+_GETTERS = {dict: dict.get}
+
+
+def getter(klass):
+    """
+    The function used to read a filtered property off an element of type
+    `klass`. Worked out once per type, so elements don't pay for a failed
+    `obj[attr]` before every attribute lookup.
+    """
+    try:
+        return _GETTERS[klass]
+    except KeyError:
+        from pylgrim.element import Element
+        if issubclass(klass, Element):
+            get = _getattr
+        elif issubclass(klass, dict):
+            get = klass.get
+        else:
+            get = _getitem
+        _GETTERS[klass] = get
+        return get
+
+
+def compilefilters(filters, closures=()):
+    """
+    Turn keyword `filters` (and any `closures`, which are called with the
+    element itself) into a single function of an element, which is True
+    when the element matches all of them.
+    """
+    tests = []
+    for attr, filter_ in filters.items():
+        if not callable(filter_):
+            filter_ = _equals(filter_)
+        tests.append((attr, filter_))
+    closures = tuple(closures)
+
+    if len(tests) == 1 and not closures:
+        (attr, test), = tests
+
+        def match(element):
+            return test(getter(type(element))(element, attr))
+        return match
+
+    def match(element):
+        get = getter(type(element))
+        for attr, test in tests:
+            if not test(get(element, attr)):
+                return False
+        for closure in closures:
+            if not closure(element):
+                return False
+        return True
+    return match
+
+
+def _equals(value):
+    def test(attr):
+        return attr == value
+    return test
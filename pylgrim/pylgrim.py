@@ -1,43 +1,889 @@
 
-import pylgrim.graphml
-from pylgrim.element import Edge, ElementList, Vertex
+import gc
 
-class Graph(object):
-    def __init__(self):
-        self._V = ElementList()
-        self._E = ElementList()
+from array import array
+from collections import Counter
+from contextlib import nullcontext
+from functools import wraps
+from heapq import nlargest
+from itertools import chain
+from operator import add, attrgetter
+from types import MethodType
+
+from pylgrim import algorithms, graphml
+from pylgrim.columns import ColumnStore
+from pylgrim.element import (Edge, ElementList, Vertex, _buckets, _mixes,
+                             _unlink)
+from pylgrim.ids import SequentialIds
+from pylgrim.index import MISSING, Index, IndexedElementList
+from pylgrim.locks import RWLock, reads, writes
+from pylgrim.traversal import Traversal
+
+
+class _Tracked(object):
+    # Elements owned by a Graph have their class switched to one with this
+    # mixin, so the graph hears about property writes and can keep its
+    # indexes up to date. Plain `Vertex`/`Edge` objects don't pay for a
+    # python-level __setattr__.
+    __slots__ = ()
+
+    def __setattr__(self, name, value):
+        old = getattr(self, name, MISSING)
+        object.__setattr__(self, name, value)
+        self._graph._propertychanged(self, name, old, value)
+
+    def __delattr__(self, name):
+        old = getattr(self, name, MISSING)
+        object.__delattr__(self, name)
+        self._graph._propertychanged(self, name, old, MISSING)
+
+
+class GraphVertex(_Tracked, Vertex):
+    __slots__ = ()
+
+
+class GraphEdge(_Tracked, Edge):
+    __slots__ = ()
+
+
+class _Columnar(_Tracked):
+    # The classes of elements owned by a `Graph(columnar=True)`. Their
+    # properties live in the graph's columns, not in their own __dict__.
+    __slots__ = ()
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        value = self._columns().get(name, self.idx)
+        if value is MISSING:
+            raise AttributeError(name)
+        return value
+
+    def __setattr__(self, name, value):
+        if hasattr(type(self), name):
+            _Tracked.__setattr__(self, name, value)
+            return
+        old = getattr(self, name, MISSING)
+        self._columns().set(name, self.idx, value)
+        self._graph._propertychanged(self, name, old, value)
+
+    def __delattr__(self, name):
+        if hasattr(type(self), name):
+            _Tracked.__delattr__(self, name)
+            return
+        old = getattr(self, name)
+        self._columns().unset(name, self.idx)
+        self._graph._propertychanged(self, name, old, MISSING)
+
+    def properties(self):
+        return self._columns().row(self.idx)
+
+
+class ColumnarVertex(_Columnar, Vertex):
+    __slots__ = ()
+
+    def _columns(self):
+        return self._graph._vcolumns
+
+
+class ColumnarEdge(_Columnar, Edge):
+    __slots__ = ()
+
+    def _columns(self):
+        return self._graph._ecolumns
 
     @property
-    def V(self):
-        return _V
+    def weight(self):
+        weight = self._graph._ecolumns.get('weight', self.idx)
+        return None if weight is MISSING else weight
+
+    @weight.setter
+    def weight(self, weight):
+        if weight is None:
+            self._graph._ecolumns.unset('weight', self.idx)
+        else:
+            self._graph._ecolumns.set('weight', self.idx, weight)
+
+
+class _Locked(object):
+    # The mixin for the elements of a `Graph(concurrent=True)`, whose
+    # property writes hold the graph's lock, see `pylgrim.locks`
+    __slots__ = ()
 
     @property
-    def E(self):
-        return _E
+    def _lock(self):
+        return self._graph._lock
+
+    def __setattr__(self, name, value):
+        with self._graph._lock.writing():
+            super(_Locked, self).__setattr__(name, value)
+
+    def __delattr__(self, name):
+        with self._graph._lock.writing():
+            super(_Locked, self).__delattr__(name)
+
+
+class _LockedVertex(_Locked):
+    # ... and whose vertices read their edges with it held, and hand out
+    # copies of their adjacency lists rather than the lists themselves.
+    # Overriding the steps also keeps traversals off the fast paths, which
+    # read those lists directly.
+    __slots__ = ()
+
+    out = reads(Vertex.out, ElementList)
+    outE = reads(Vertex.outE, ElementList)
+    in_ = reads(Vertex.in_, ElementList)
+    inE = reads(Vertex.inE, ElementList)
+    both = reads(Vertex.both)
+    bothE = reads(Vertex.bothE)
+    outdegree = reads(Vertex.outdegree)
+    indegree = reads(Vertex.indegree)
+    edgeto = writes(Vertex.edgeto)
+    edgefrom = writes(Vertex.edgefrom)
+
+
+class LockedVertex(_LockedVertex, GraphVertex):
+    __slots__ = ()
+
+
+class LockedEdge(_Locked, GraphEdge):
+    __slots__ = ()
+
+
+class LockedColumnarVertex(_LockedVertex, ColumnarVertex):
+    __slots__ = ()
+
+
+class LockedColumnarEdge(_Locked, ColumnarEdge):
+    __slots__ = ()
+
+
+# the methods of a concurrent graph that hold its lock for writing, for
+# reading, and for reading and then copy the list they return
+_WRITES = ('addvertex', 'addedge', 'addvertices', 'addedges', 'removeedge',
+           'removevertex', 'createindex', 'dropindex', 'setcache')
+_READS = ('traversemany', 'shortestpath', 'kshortestpaths', 'degreestats',
+          'savegraphml', 'save')
+_COPIES = ('V', 'E')
+
+
+def _copying(method):
+    @wraps(method)
+    def locked(self, *args, **kwds):
+        lock = self._lock
+        with lock.reading():
+            result = method(self, *args, **kwds)
+            if isinstance(result, IndexedElementList):
+                return _Copy(result, lock)
+            return ElementList(result)
+    return locked
+
+
+class _Copy(IndexedElementList):
+    # What V() and E() of a concurrent graph return: a copy of the graph's
+    # list, which goes on using the graph's indexes and columns for as long
+    # as nothing has been written to the graph since it was made, and scans
+    # itself after that
+    __slots__ = ('_lock', '_generation')
+
+    def __init__(self, elements, lock):
+        super(_Copy, self).__init__(elements._indexes, elements,
+                                    elements._columns)
+        self._lock = lock
+        self._generation = lock.generation
+
+    def __getattr__(self, name):
+        columns = self._columns
+        if columns is not None and name in columns:
+            with self._lock.reading():
+                if self._lock.generation == self._generation:
+                    return ElementList(columns.project(name, len(self)))
+        return ElementList.__getattr__(self, name)
+
+    def filter(self, **filters):
+        with self._lock.reading():
+            if self._lock.generation == self._generation:
+                return ElementList(super(_Copy, self).filter(**filters))
+        return ElementList.filter(self, **filters)
+
+
+class Graph(object):
+    def __init__(self, ids=None, columnar=False, cache=None,
+                 concurrent=False):
+        """
+        `ids` is the strategy for making vertex ids, see `pylgrim.ids`. By
+        default vertices are numbered 0, 1, 2, ... Edges are always numbered
+        that way.
+
+        With `columnar`, vertex and edge properties (and edge weights) are
+        kept in typed columns rather than on each element, which makes
+        filtering and projecting `V()` and `E()` much faster. See
+        `pylgrim.columns`.
+
+        With `concurrent`, the graph can be read from any number of threads
+        while others change it. See `reading`, `writing` and
+        `pylgrim.locks`.
+
+        With a `cache` (a `pylgrim.cache.ResultCache`), the results of
+        traversals are kept and reused until the vertices they went through
+        change. See `setcache`.
+        """
+        self._ids = ids if ids is not None else SequentialIds()
+        self._vids = {}
+        self._eids = {}
+        self._nexteid = 0
+        self._vindexes = {}
+        self._eindexes = {}
+        if columnar:
+            self._vcolumns = ColumnStore()
+            self._ecolumns = ColumnStore(fields=('weight',))
+            self._vertexclass, self._edgeclass = ColumnarVertex, ColumnarEdge
+            if concurrent:
+                self._vertexclass = LockedColumnarVertex
+                self._edgeclass = LockedColumnarEdge
+        else:
+            self._vcolumns = self._ecolumns = None
+            self._vertexclass, self._edgeclass = GraphVertex, GraphEdge
+            if concurrent:
+                self._vertexclass, self._edgeclass = LockedVertex, LockedEdge
+        self._lock = None
+        if concurrent:
+            self._lock = RWLock()
+            self._lockmethods()
+        self._V = IndexedElementList(self._vindexes, columns=self._vcolumns)
+        self._E = IndexedElementList(self._eindexes, columns=self._ecolumns)
+        # caches for the shortest path algorithms, see `_adjacency`
+        self._routing = None
+        self._weightcache = {}
+        self._edgeversion = 0
+        # bumped by every removal, which can leave the graph the same size
+        self._structure = 0
+        # while there's a result cache, bumped by every change, and the
+        # version each vertex was last changed at
+        self._cache = None
+        self._version = 0
+        self._versions = {}
+        if cache is not None:
+            self.setcache(cache)
+
+    def V(self, **filters):
+        """
+        Every vertex in the graph, or just the ones matching `filters`. The
+        filters are answered from an index when there is one:
+
+            >>> g.createindex("name")
+            >>> g.V(name="Fred")
+        """
+        return self._V.filter(**filters) if filters else self._V
+
+    def E(self, **filters):
+        """Every edge in the graph, or just the ones matching `filters`"""
+        return self._E.filter(**filters) if filters else self._E
 
     def v(self, idx, **kwds):
-        return _V[idx]
+        return self._V[idx]
 
     def e(self, idx, **kwds):
-        return _E[idx]
+        return self._E[idx]
+
+    def vertex(self, id_):
+        """The vertex with id `id_`. Raises KeyError if there isn't one."""
+        return self._vids[id_]
+
+    def edge(self, id_):
+        """The edge with id `id_`. Raises KeyError if there isn't one."""
+        return self._eids[id_]
+
+    def _vertexid(self, v):
+        id_ = self._ids.allocate(v)
+        if id_ in self._vids:
+            raise ValueError("There's already a vertex with id {0!r}".format(
+                id_))
+        return id_
+
+    def _edgeid(self):
+        id_ = self._nexteid
+        self._nexteid = id_ + 1
+        return id_
 
     def addvertex(self, obj=None, label=None, *args, **kwds):
         v = Vertex(obj, label, *args, **kwds)
+        v.id = self._vertexid(v)
+        self._vids[v.id] = v
         self._V.append(v)
-        v.idx(len(self._V) - 1)
+        v.idx = len(self._V) - 1
+        self._own(v, self._vertexclass, self._vcolumns)
+        self._index(v, self._vindexes)
+        if self._cache is not None:
+            self._touch()
         return v
 
     def addedge(self, from_, to, weight=None, label=None, *args, **kwds):
-        e = from_.edgeto(to, weight=weight, label=label)
+        e = from_.edgeto(to, weight=weight, label=label, **kwds)
+        e.id = self._edgeid()
+        self._eids[e.id] = e
         self._E.append(e)
-        e.idx(len(self._E) - 1)
+        e.idx = len(self._E) - 1
+        self._own(e, self._edgeclass, self._ecolumns)
+        self._index(e, self._eindexes)
+        if self._cache is not None:
+            self._touch((from_, to))
         return e
 
-    @staticmethod
-    def loadgraphml(self, file_):
-        v, e = graphml.parse(file_)
-        g = Graph(v, e)
+    def addvertices(self, iterable):
+        """
+        Add a vertex for every item of `iterable`, each a dict of the keyword
+        arguments `addvertex` takes (or None):
+
+            >>> g.addvertices({'name': name} for name in names)
+            range(0, 1000000)
+
+        Returns the range of `idx` numbers given to the new vertices.
+        """
+        V, vids = self._V, self._vids
+        klass, columns = self._vertexclass, self._vcolumns
+        start = len(V)
+        collecting = gc.isenabled()
+        gc.disable()
+        try:
+            idx = start
+            for kwds in iterable:
+                v = Vertex(**kwds) if kwds else Vertex()
+                v.id = self._vertexid(v)
+                vids[v.id] = v
+                v.idx = idx
+                v._graph = self
+                if columns is not None:
+                    self._adopt(v, columns)
+                v.__class__ = klass
+                V.append(v)
+                idx += 1
+        finally:
+            if collecting:
+                gc.enable()
+            # if an item failed, the vertices before it stay in the graph,
+            # so they have to be indexed all the same
+            if self._vindexes:
+                for idx in range(start, len(V)):
+                    self._index(V[idx], self._vindexes)
+            if self._cache is not None:
+                self._touch()
+        return range(start, len(V))
+
+    def addedges(self, iterable):
+        """
+        Add an edge for every tuple of `iterable`. The tuples hold the
+        positional arguments `addedge` takes, optionally followed by a dict
+        of properties:
+
+            (from_, to)
+            (from_, to, weight, label)
+            (from_, to, weight, label, {'since': 2001})
+
+        `from_` and `to` can be vertices or vertex `idx` numbers. The graph
+        ends up exactly as if `addedge` had been called for each tuple, but
+        the edges are built and linked in a single pass without any of the
+        per-edge method calls. Returns the range of `idx` numbers given to
+        the new edges.
+        """
+        V, E, eids = self._V, self._E, self._eids
+        klass, columns = self._edgeclass, self._ecolumns
+        start = len(E)
+        new = Edge.__new__
+        set_ = object.__setattr__
+        checked = set()
+
+        # nothing created here can be garbage, so don't let the collector
+        # keep rescanning millions of new objects while we build them
+        collecting = gc.isenabled()
+        gc.disable()
+        try:
+            idx = start
+            for item in iterable:
+                from_, to = item[0], item[1]
+                if from_.__class__ is int:
+                    from_ = V[from_]
+                if to.__class__ is int:
+                    to = V[to]
+                n = len(item)
+                label = item[3] if n > 3 else None
+                properties = item[4] if n > 4 else None
+
+                # everything that can be wrong with the tuple is caught here,
+                # before the edge is registered or linked to anything
+                outedges, inedges = from_._outE, to._inE
+                if properties:
+                    for k in properties:
+                        if k not in checked:
+                            if hasattr(klass, k):
+                                raise AttributeError(
+                                    "You cannot overrite {0} on edge "
+                                    "{1}".format(k, idx))
+                            checked.add(k)
+
+                # filled in and linked as a plain Edge, which has no
+                # python-level __setattr__, and only then handed to the graph
+                e = new(Edge)
+                e.idx = idx
+                e.id = id_ = self._nexteid
+                self._nexteid = id_ + 1
+                eids[id_] = e
+                e._graph = self
+                e.from_ = from_
+                e.to = to
+                e.weight = item[2] if n > 2 else None
+                e._label = label
+                if properties:
+                    for k, v in properties.items():
+                        setattr(e, k, v)
+                E.append(e)
+                idx += 1
+
+                # the same bookkeeping as Vertex.edgeto, inlined
+                edges = outedges
+                if edges is None:
+                    set_(from_, '_out', ElementList())
+                    edges = ElementList()
+                    set_(from_, '_outE', edges)
+                elif from_._outlabels is None and _mixes(edges, label):
+                    set_(from_, '_outlabels',
+                         _buckets(edges, Edge._outlabelpos))
+                e._outpos = len(edges)
+                from_._out.append(to)
+                edges.append(e)
+                labels = from_._outlabels
+                if labels is not None:
+                    if label in labels:
+                        e._outlabelpos = len(labels[label])
+                        labels[label].append(e)
+                    else:
+                        e._outlabelpos = 0
+                        labels[label] = ElementList([e])
+
+                edges = inedges
+                if edges is None:
+                    set_(to, '_in_', ElementList())
+                    edges = ElementList()
+                    set_(to, '_inE', edges)
+                elif to._inlabels is None and _mixes(edges, label):
+                    set_(to, '_inlabels', _buckets(edges, Edge._inlabelpos))
+                e._inpos = len(edges)
+                to._in_.append(from_)
+                edges.append(e)
+                labels = to._inlabels
+                if labels is not None:
+                    if label in labels:
+                        e._inlabelpos = len(labels[label])
+                        labels[label].append(e)
+                    else:
+                        e._inlabelpos = 0
+                        labels[label] = ElementList([e])
+                if columns is not None:
+                    self._adopt(e, columns)
+                e.__class__ = klass
+        finally:
+            if collecting:
+                gc.enable()
+            # as with addvertices, the edges before a bad tuple are kept
+            if self._eindexes:
+                for idx in range(start, len(E)):
+                    self._index(E[idx], self._eindexes)
+            if self._cache is not None:
+                self._touch(chain.from_iterable(
+                    (E[idx].from_, E[idx].to)
+                    for idx in range(start, len(E))))
+        return range(start, len(E))
+
+    def removeedge(self, e):
+        """
+        Remove edge `e` (or the edge with that idx) from the graph.
+
+        This is O(1). The edge that was last in `E()` is moved into the
+        removed edge's place and takes over its `idx`, and likewise in the
+        adjacency lists of the two vertices. Ids don't change, so anything
+        that needs to refer to an edge for a long time should keep its `id`
+        rather than its `idx`.
+        """
+        e = self._member(e, self._E, Edge)
+        _unlink(e)
+        self._unindex(e, self._eindexes)
+        del self._eids[e.id]
+        self._swapremove(self._E, e, self._ecolumns)
+        self._disown(e, Edge)
+        self._structure += 1
+        self._edgeversion += 1
+        if self._cache is not None:
+            self._touch((e.from_, e.to))
+
+    def removevertex(self, v):
+        """
+        Remove vertex `v` (or the vertex with that idx) and all of its edges
+        from the graph. Like `removeedge`, the last vertex in `V()` takes
+        over the removed vertex's `idx`, and ids don't change.
+        """
+        v = self._member(v, self._V, Vertex)
+        for edges in (v._outE, v._inE):
+            while edges:
+                self.removeedge(edges[-1])
+        self._unindex(v, self._vindexes)
+        del self._vids[v.id]
+        self._swapremove(self._V, v, self._vcolumns)
+        self._disown(v, Vertex)
+        self._structure += 1
+        if self._cache is not None:
+            self._touch()
+            self._versions.pop(v, None)
+
+    def _member(self, element, elements, klass):
+        if isinstance(element, int) and not isinstance(element, bool):
+            return elements[element]
+        if not isinstance(element, klass) or element._graph is not self:
+            raise ValueError("{0!r} is not in this graph".format(element))
+        return element
+
+    def _swapremove(self, elements, element, columns=None):
+        last = elements.pop()
+        if columns is not None:
+            # the removed element takes its properties back with it
+            row = columns.take(element.idx, len(elements))
+            if isinstance(element, Edge):
+                Edge.weight.__set__(element, row.pop('weight', None))
+            element.__dict__.update(row)
+        if last is not element:
+            elements[element.idx] = last
+            last.idx = element.idx
+
+    def _disown(self, element, klass):
+        element.__class__ = klass
+        element._graph = None
+        element.idx = None
+
+    def _unindex(self, element, indexes):
+        for key, index in indexes.items():
+            index.remove(element, getattr(element, key, MISSING))
+
+    def _own(self, element, klass, columns=None):
+        element._graph = self
+        if columns is not None:
+            self._adopt(element, columns)
+        element.__class__ = klass
+
+    def _adopt(self, element, columns):
+        # move a new element's properties out of its __dict__ and into the
+        # graph's columns, before it becomes a Columnar one
+        if element.__dict__:
+            columns.setrow(element.idx, element.__dict__)
+            element.__dict__.clear()
+        if isinstance(element, Edge) and element.weight is not None:
+            columns.set('weight', element.idx, element.weight)
+
+    def _index(self, element, indexes):
+        for key, index in indexes.items():
+            index.add(element, getattr(element, key, MISSING))
+
+    def _propertychanged(self, element, name, old, new):
+        if isinstance(element, Edge):
+            indexes = self._eindexes
+            self._edgeversion += 1
+        else:
+            indexes = self._vindexes
+        index = indexes.get(name)
+        if index is not None and old is not new:
+            index.remove(element, old)
+            index.add(element, new)
+        if self._cache is not None and not name.startswith('_'):
+            self._touch((element.from_, element.to)
+                        if isinstance(element, Edge) else (element,))
+
+    def _touch(self, vertices=()):
+        # a change to `vertices`, or with none, to the graph as a whole, for
+        # the result cache
+        self._version += 1
+        version = self._version
+        versions = self._versions
+        for v in vertices:
+            versions[v] = version
+
+    def setcache(self, cache):
+        """
+        Keep the results of traversals in `cache`, a
+        `pylgrim.cache.ResultCache`, or stop caching them with None:
+
+            >>> g.setcache(ResultCache(maxsize=10000, ttl=60))
+            >>> g.traverse(v).out().out().toList()
+            >>> g.cache.stats()
+            {'hits': 0, 'misses': 1, 'evictions': 0, ...}
+
+        Anything already in `cache` is cleared.
+        """
+        if cache is not None:
+            cache.clear()
+        self._cache = cache
+        self._versions = {}
+
+    def _lockmethods(self):
+        # a concurrent graph gets its own copies of the methods that read or
+        # change it, which hold its lock, so other graphs don't pay for them
+        klass = type(self)
+        for names, locking in ((_WRITES, writes), (_READS, reads),
+                               (_COPIES, _copying)):
+            for name in names:
+                method = locking(getattr(klass, name))
+                setattr(self, name, MethodType(method, self))
+
+    def reading(self):
+        """
+        A context manager that holds a `concurrent` graph's lock for
+        reading, so nothing changes it until the block ends:
+
+            >>> with g.reading():
+            ...     names = v.traverse().out().out().name.toList()
+
+        On any other graph it does nothing.
+        """
+        if self._lock is None:
+            return nullcontext()
+        return self._lock.reading()
+
+    def writing(self):
+        """
+        A context manager that holds a `concurrent` graph's lock for
+        writing, so the changes made in the block are seen all at once
+        """
+        if self._lock is None:
+            return nullcontext()
+        return self._lock.writing()
+
+    @property
+    def cache(self):
+        """The `ResultCache` traversal results are kept in, or None"""
+        return self._cache
+
+    def createindex(self, key, edges=False):
+        """
+        Index vertices (or edges, with `edges=True`) by the value of `key`.
+        The index is kept up to date as elements are added and as their
+        properties change, and `V()`, `E()` and `filter()` on them use it
+        for equality filters on `key`.
+        """
+        indexes = self._eindexes if edges else self._vindexes
+        if key not in indexes:
+            index = Index(key)
+            for element in (self.E() if edges else self.V()):
+                index.add(element, getattr(element, key, MISSING))
+            indexes[key] = index
+        return indexes[key]
+
+    def createedgeindex(self, key):
+        return self.createindex(key, edges=True)
+
+    def createlabelindex(self):
+        """Index both vertices and edges by their label"""
+        self.createindex("label")
+        self.createindex("label", edges=True)
+
+    def dropindex(self, key, edges=False):
+        (self._eindexes if edges else self._vindexes).pop(key, None)
+
+    def traverse(self, *starts):
+        """
+        Start a lazy `Traversal` from `starts`, or from every vertex in the
+        graph if no starting elements are given.
+        """
+        return Traversal(starts or None, graph=self)
+
+    def traversemany(self, starts, traversal, workers=None):
+        """
+        Run `traversal` (a `Traversal` built without starting elements)
+        from each of `starts` separately, spread over `workers` processes
+        (one per CPU by default), and return a list with an ElementList of
+        results for each start, in the same order:
+
+            >>> fof = Traversal().out(label="knows").out(label="knows")
+            >>> g.traversemany(g.V(), fof, workers=8)
+
+        The workers read the graph out of shared memory rather than a copy
+        each, so it's written there once per call, and the traversal's steps
+        have to be picklable. With one worker it all just runs here, and so
+        it does when the graph has a property that can't be saved in a
+        snapshot (anything but JSON values), since the workers couldn't be
+        given it. See `pylgrim.parallel`.
+        """
+        from pylgrim import parallel
+        return parallel.traversemany(self, starts, traversal, workers)
+
+    def shortestpath(self, from_, to, weight="weight", heuristic=None,
+                     bidirectional=False):
+        """
+        The cheapest path from vertex `from_` to vertex `to` (either can also
+        be given as an idx), as a `pylgrim.algorithms.Path`, or None if
+        there isn't one:
+
+            >>> p = g.shortestpath(a, b)
+            >>> p.cost, p.vertices, p.edges
+
+        Edges cost their `weight` property, or 1 if they don't have one.
+        With `weight=None` every edge costs 1.
+
+        This is Dijkstra's algorithm, or with `bidirectional=True` a search
+        from both ends at once. Give a `heuristic(vertex, to)` that never
+        overestimates the cost from `vertex` to `to` (and never drops by
+        more than an edge's cost across it) to use A* instead.
+        """
+        adjacency = self._adjacency()
+        weights = self._weights(weight)
+        src, dst = self._vertexidx(from_), self._vertexidx(to)
+        if heuristic is not None:
+            target = self.v(dst)
+            result = algorithms.dijkstra(
+                    adjacency, weights, src, dst,
+                    heuristic=lambda v: heuristic(self.v(v), target))
+        elif bidirectional:
+            result = algorithms.bidirectional(adjacency, weights, src, dst)
+        else:
+            result = algorithms.dijkstra(adjacency, weights, src, dst)
+        return algorithms.topath(self, result)
+
+    def kshortestpaths(self, from_, to, k, weight="weight"):
+        """
+        The `k` cheapest paths from `from_` to `to` that don't visit any
+        vertex twice, cheapest first, using Yen's algorithm. There may be
+        fewer than `k`.
+        """
+        results = algorithms.yen(self._adjacency(), self._weights(weight),
+                                 self._vertexidx(from_), self._vertexidx(to),
+                                 k)
+        return [algorithms.topath(self, result) for result in results]
+
+    def degreestats(self, direction="both", k=10):
+        """
+        How the degrees of the vertices are spread out, counting edges out
+        of each vertex, into it, or both (`direction` is `"out"`, `"in"` or
+        `"both"`). Returns a dict of
+
+            histogram   {degree: how many vertices have it}
+            top         the `k` highest-degree vertices, as (vertex, degree)
+                        pairs, highest first
+            max, mean   the highest and mean degree
+
+        The degrees come straight from the adjacency lists, so this is one
+        pass over the vertices and nothing else.
+        """
+        if direction not in ("out", "in", "both"):
+            raise ValueError(
+                "direction must be 'out', 'in' or 'both', not {0!r}".format(
+                    direction))
+        degrees = self._degrees(direction)
+        top = nlargest(k, range(len(degrees)), key=degrees.__getitem__)
+        return {
+            'histogram': dict(Counter(degrees)),
+            'top': [(self.v(i), degrees[i]) for i in top],
+            'max': max(degrees) if degrees else 0,
+            'mean': sum(degrees) / float(len(degrees)) if degrees else 0.0,
+        }
+
+    def _degrees(self, direction):
+        # the degree of every vertex, by idx
+        degrees = [0] * len(self._V)
+        for slot in {'out': ['_outE'], 'in': ['_inE'],
+                     'both': ['_outE', '_inE']}[direction]:
+            lists = map(attrgetter(slot), self._V)
+            degrees = list(map(add, degrees,
+                               [len(l) if l else 0 for l in lists]))
+        return degrees
+
+    def _allvertices(self):
+        # every vertex, for traversals of the whole graph
+        return self._V if self._lock is None else ElementList(self._V)
+
+    def _size(self):
+        return len(self._V), len(self._E)
+
+    def _vertexidx(self, v):
+        if isinstance(v, Vertex) and v._graph is self:
+            return v.idx
+        if isinstance(v, int) and not isinstance(v, bool):
+            if not 0 <= v < len(self._V):
+                raise IndexError("No vertex {0}".format(v))
+            return v
+        raise ValueError("{0!r} is not a vertex of this graph".format(v))
+
+    def _adjacency(self):
+        """
+        The graph's structure as integer CSR arrays, built the first time a
+        shortest path is asked for and again once the graph has grown.
+        """
+        size = (len(self._V), len(self._E), self._structure)
+        if self._routing is None or self._routing[0] != size:
+            from pylgrim.compact import TYPECODE, Adjacency
+            collecting = gc.isenabled()
+            gc.disable()
+            try:
+                sources = array(TYPECODE, [e.from_.idx for e in self._E])
+                targets = array(TYPECODE, [e.to.idx for e in self._E])
+                adjacency = Adjacency.build(size[0], sources, targets)
+            finally:
+                if collecting:
+                    gc.enable()
+            self._routing = (size, adjacency)
+        return self._routing[1]
+
+    def _weights(self, key):
+        """
+        Every edge's `key` property, by edge idx, cached until an edge
+        property changes or an edge is added.
+        """
+        if key is None:
+            return None
+        nedges = len(self._adjacency().sources)
+        cached = self._weightcache.get(key)
+        if cached is None or cached[0] != (self._edgeversion, nedges):
+            cached = self._weightcache[key] = (
+                    (self._edgeversion, nedges), self._readweights(key))
+        return cached[1]
+
+    def _readweights(self, key):
+        if self._ecolumns is not None:
+            return self._ecolumns.values(key, len(self._E))
+        return [getattr(e, key, None) for e in self._E]
+
+    @classmethod
+    def loadgraphml(cls, file_):
+        """
+        Build a new graph from a GraphML file. `file_` can be a path or a
+        file object.
+        """
+        return graphml.parse(file_, cls())
+
+    def savegraphml(self, file_):
+        """Write this graph to `file_` (a path or a file object) as GraphML"""
+        graphml.save(self, file_)
+
+    def save(self, path):
+        """
+        Write this graph to `path` as a binary snapshot, which `open` can
+        map straight back into memory. See `pylgrim.snapshot`.
+        """
+        from pylgrim import snapshot
+        snapshot.save(self, path)
+
+    @classmethod
+    def open(cls, path, mmap=False):
+        """
+        Open a snapshot written by `save`, read into memory as an instance
+        of `cls`:
+
+            >>> g = Graph.open("graph.snap")
+
+        With `mmap` it's a `CompactGraph` reading its arrays out of the
+        mapped file instead, which is near-instant whatever the size of the
+        graph, and is shared between every process that opens the same
+        file, but can't have anything removed from it:
+
+            >>> g = Graph.open("graph.snap", mmap=True)
 
-    def savegraphml(self):
-        return graphml.save(self)
+        Indexes aren't part of a snapshot; create them again after opening.
+        """
+        from pylgrim import snapshot
+        return snapshot.load(path, cls, mmap)
 
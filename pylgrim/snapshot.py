@@ -0,0 +1,572 @@
+"""
+Binary snapshots.
+
+A snapshot is a graph's `idx` numbering written straight to disk, so that
+opening one is a matter of mapping the file rather than rebuilding the
+graph:
+
+    >>> g.save("graph.snap")
+    >>> g = Graph.open("graph.snap", mmap=True)
+
+The file is an 8 byte magic number, the length of a JSON header and the
+header itself, followed by 8-byte aligned sections of raw machine-order
+arrays:
+
+    src, dst                        the endpoints of every edge
+    out.*, in.*                     CSR adjacency, see `pylgrim.compact`
+    elabel                          every edge's interned label code
+
+and one column per vertex or edge field and per property key. A column is
+typed by the values in it: booleans, 64-bit integers and floats are stored
+as arrays, strings as offsets into UTF-8 text (or as codes into a table of
+strings, when there are few distinct ones), and anything else as JSON. A
+bitmap marks which elements have a value at all.
+
+`Graph.open(path, mmap=True)` (and `CompactGraph.open`) maps the file and
+hands back a `CompactGraph` that reads its arrays out of the mapping, so
+only the pages a query touches are ever read, and every process that opens
+the same file shares them. Without `mmap`, `Graph.open` builds an ordinary
+`Graph` from the snapshot, which takes longer but can then be changed in
+every way, removals included. Properties are decoded from their columns
+one element at a time, as they're read. Anything added or changed after
+opening lives in memory alongside the snapshot; the file itself is never
+written to.
+"""
+import json
+import mmap as mmap_
+import os
+import sys
+from array import array
+
+from pylgrim.compact import CSR, TYPECODE, CompactGraph, CompactStore
+from pylgrim.element import Element, Vertex
+from pylgrim.ids import KeyIds, SequentialIds, UUIDIds
+from pylgrim.index import MISSING
+
+MAGIC = b'PYLGRIM\x01'
+VERSION = 1
+
+_INT64 = (-2 ** 63, 2 ** 63)
+
+
+def _aligned(n):
+    return (n + 7) & ~7
+
+
+class _Writer(object):
+    # collects the sections of a snapshot and where each one will go
+    def __init__(self):
+        self.sections = {}
+        self.chunks = []
+        self.size = 0
+
+    def add(self, name, typecode, data):
+        if not isinstance(data, (array, memoryview)):
+            data = array(typecode, data)
+        data = memoryview(data).cast('B')
+        self.sections[name] = [self.size, data.nbytes, typecode]
+        self.chunks.append(data)
+        self.size = _aligned(self.size + data.nbytes)
+        return name
+
+    def prefix(self, header):
+        """Everything that goes before the sections, `header` included"""
+        header = dict(header, sections=self.sections)
+        header = json.dumps(header).encode('utf-8')
+        prefix = MAGIC + len(header).to_bytes(8, 'little') + header
+        return prefix + b'\0' * (_aligned(len(prefix)) - len(prefix))
+
+    def write(self, f, prefix):
+        f.write(prefix)
+        for chunk in self.chunks:
+            f.write(chunk)
+            f.write(b'\0' * (_aligned(chunk.nbytes) - chunk.nbytes))
+
+
+def _strings(writer, name, strings):
+    offsets = array(TYPECODE, [0])
+    text = bytearray()
+    for s in strings:
+        text += s.encode('utf-8')
+        offsets.append(len(text))
+    return {'offsets': writer.add(name + '.offsets', TYPECODE, offsets),
+            'text': writer.add(name + '.text', 'B', text)}
+
+
+def _json(value, name):
+    try:
+        return json.dumps(value)
+    except (TypeError, ValueError):
+        raise TypeError("Can't save {0} value {1!r} in a snapshot".format(
+            name, value))
+
+
+def _column(writer, name, values):
+    """
+    Write `values`, one per element with MISSING where an element has none,
+    as the column `name`, and return its description for the header.
+    """
+    present = [v for v in values if v is not MISSING]
+    if not present:
+        return {'kind': 'none'}
+    column = {}
+    if len(present) < len(values):
+        bitmap = bytearray((len(values) + 7) // 8)
+        for i, v in enumerate(values):
+            if v is not MISSING:
+                bitmap[i >> 3] |= 1 << (i & 7)
+        column['present'] = writer.add(name + '.present', 'B', bitmap)
+
+    types = set(map(type, present))
+    if types == set([bool]):
+        column['kind'] = 'bool'
+        column['values'] = writer.add(name, 'b', [
+            v is True for v in values])
+    elif types == set([int]) and _INT64[0] <= min(present) and \
+            max(present) < _INT64[1]:
+        column['kind'] = 'int'
+        column['values'] = writer.add(name, 'q', [
+            0 if v is MISSING else v for v in values])
+    elif types == set([float]):
+        column['kind'] = 'float'
+        column['values'] = writer.add(name, 'd', [
+            0.0 if v is MISSING else v for v in values])
+    elif types == set([str]) and len(set(present)) * 2 <= len(present):
+        # few distinct strings: store each once, and a code per element
+        table = sorted(set(present))
+        codes = dict((s, i) for i, s in enumerate(table))
+        column['kind'] = 'category'
+        column['values'] = writer.add(name, 'i', [
+            -1 if v is MISSING else codes[v] for v in values])
+        column.update(_strings(writer, name + '.table', table))
+    elif types == set([str]):
+        column['kind'] = 'str'
+        column.update(_strings(writer, name, [
+            '' if v is MISSING else v for v in values]))
+    else:
+        column['kind'] = 'json'
+        column.update(_strings(writer, name, [
+            '' if v is MISSING else _json(v, name) for v in values]))
+    return column
+
+
+def _properties(writer, name, propdicts):
+    propdicts = list(propdicts)
+    keys = set()
+    for props in propdicts:
+        if props:
+            keys.update(props)
+    return dict((key, _column(writer, "{0}.{1}".format(name, key), [
+        props.get(key, MISSING) if props else MISSING
+        for props in propdicts])) for key in sorted(keys))
+
+
+def _unset(values):
+    # None is what an element has when nothing was ever set
+    return [MISSING if v is None else v for v in values]
+
+
+def _ids(elements):
+    # only written when they aren't just the idx numbers
+    ids = [e.id for e in elements]
+    return None if ids == list(range(len(ids))) else ids
+
+
+def _strategy(ids):
+    if isinstance(ids, SequentialIds):
+        return {'kind': 'sequential', 'next': ids._next}
+    if isinstance(ids, UUIDIds):
+        return {'kind': 'uuid'}
+    if isinstance(ids, KeyIds):
+        return {'kind': 'key', 'key': ids.key}
+    return None
+
+
+def encode(graph):
+    """
+    The sections of a snapshot of `graph`, ready to be written, and the
+    header describing them.
+    """
+    writer = _Writer()
+    adjacency = graph._adjacency()
+    # counted from the graph itself, which the adjacency arrays have to
+    # cover all of
+    nvertices, nedges = graph._size()
+    if len(adjacency.out) != nvertices or \
+            len(adjacency.sources) != nedges:
+        raise ValueError("The adjacency arrays of {0!r} are out of date"
+                         .format(graph))
+
+    store = getattr(graph, '_store', None)
+    if store is not None:
+        vobj, vlabel, vprops = store.vobj, store.vlabel, store.vprops
+        weight, eprops = store.weight, store.eprops
+        elabel, labels = store.elabel, store.labels
+        vids = None if store.vids is None else list(store.vids)
+        eids = None if store.eids is None else list(store.eids)
+        uuids = []
+        strategy = {'kind': 'sequential', 'next': (
+            store.nvertices() if store.vids is None else store.vids.next)}
+        nexteid = store.nedges() if store.eids is None else store.eids.next
+    else:
+        V, E = graph.V(), graph.E()
+        vobj = [v.obj for v in V]
+        vlabel = [v.label for v in V]
+        vprops = [v.properties() for v in V]
+        weight = [e.weight for e in E]
+        eprops = [e.properties() for e in E]
+        labels, codes = [], {}
+        elabel = array('i')
+        for e in E:
+            code = codes.get(e.label)
+            if code is None:
+                code = codes[e.label] = len(labels)
+                labels.append(e.label)
+            elabel.append(code)
+        vids = _ids(V)
+        eids = _ids(E)
+        uuids = [v._uuid for v in V]
+        strategy = _strategy(graph._ids)
+        nexteid = graph._nexteid
+
+    writer.add('src', TYPECODE, adjacency.sources)
+    writer.add('dst', TYPECODE, adjacency.targets)
+    for name, csr in (('out', adjacency.out), ('in', adjacency.in_)):
+        for part in ('offsets', 'edges', 'neighbours'):
+            writer.add("{0}.{1}".format(name, part), TYPECODE,
+                       getattr(csr, part))
+    writer.add('elabel', 'i', elabel)
+
+    vertices = {
+        'obj': _column(writer, 'v.obj', _unset(vobj)),
+        'label': _column(writer, 'v.label', _unset(vlabel)),
+        'uuid': _column(writer, 'v.uuid', _unset(uuids)),
+        'properties': _properties(writer, 'v.props', vprops),
+    }
+    edges = {
+        'weight': _column(writer, 'e.weight', _unset(weight)),
+        'labels': _column(writer, 'e.labels', list(labels)),
+        'properties': _properties(writer, 'e.props', eprops),
+    }
+    if vids is not None:
+        vertices['id'] = _column(writer, 'v.id', vids)
+    if eids is not None:
+        edges['id'] = _column(writer, 'e.id', eids)
+    header = {
+        'version': VERSION,
+        'byteorder': sys.byteorder,
+        'nvertices': nvertices,
+        'nedges': nedges,
+        'nlabels': len(labels),
+        'ids': strategy,
+        'nextedgeid': nexteid,
+        'vertices': vertices,
+        'edges': edges,
+    }
+    return writer, header
+
+
+def save(graph, path):
+    """
+    Write `graph` to a snapshot at `path`. The snapshot is written to a
+    temporary file next to it first and then moved into place, so nothing
+    that has the old file open ever sees a half-written one.
+    """
+    writer, header = encode(graph)
+    tmp = "{0}.{1}.tmp".format(path, os.getpid())
+    try:
+        with open(tmp, 'wb') as f:
+            writer.write(f, writer.prefix(header))
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+class Snapshot(object):
+    """
+    A snapshot in `data`, which can be anything supporting the buffer
+    protocol: the bytes of a file, an `mmap` or a block of shared memory.
+    """
+    def __init__(self, data, name="snapshot"):
+        data = memoryview(data)
+        if bytes(data[:len(MAGIC)]) != MAGIC:
+            raise ValueError("{0} isn't a pylgrim snapshot".format(name))
+        start = len(MAGIC) + 8
+        length = int.from_bytes(data[len(MAGIC):start], 'little')
+        header = json.loads(bytes(data[start:start + length]).decode('utf-8'))
+        if header['version'] != VERSION:
+            raise ValueError("{0} is a version {1} snapshot".format(
+                name, header['version']))
+        if header['byteorder'] != sys.byteorder:
+            raise ValueError("{0} was saved on a {1}-endian machine".format(
+                name, header['byteorder']))
+        self.header = header
+        # every section is a slice of this, which keeps the mapping open
+        # for as long as anything still reads from it
+        self._data = data[_aligned(start + length):]
+
+    @classmethod
+    def read(cls, path, mmap=True):
+        """The snapshot file at `path`, mapped or read into memory"""
+        with open(path, 'rb') as f:
+            if mmap:
+                data = mmap_.mmap(f.fileno(), 0, access=mmap_.ACCESS_READ)
+            else:
+                data = f.read()
+        return cls(data, path)
+
+    def section(self, name):
+        offset, nbytes, typecode = self.header['sections'][name]
+        return self._data[offset:offset + nbytes].cast(typecode)
+
+    def _strings(self, column):
+        offsets = self.section(column['offsets'])
+        text = self.section(column['text'])
+
+        def read(i):
+            return str(text[offsets[i]:offsets[i + 1]], 'utf-8')
+        return read
+
+    def reader(self, column):
+        """
+        A function of an element idx that reads its value out of `column`,
+        or MISSING if it hasn't got one.
+        """
+        kind = column['kind']
+        if kind == 'none':
+            return lambda i: MISSING
+        if kind == 'str':
+            read = self._strings(column)
+        elif kind == 'json':
+            strings = self._strings(column)
+
+            def read(i):
+                return json.loads(strings(i))
+        elif kind == 'category':
+            table = self._strings(column)
+            codes = self.section(column['values'])
+
+            def read(i):
+                return table(codes[i])
+        elif kind == 'bool':
+            values = self.section(column['values'])
+
+            def read(i):
+                return values[i] != 0
+        else:
+            read = self.section(column['values']).__getitem__
+
+        if 'present' not in column:
+            return read
+        bitmap = self.section(column['present'])
+
+        def get(i):
+            if bitmap[i >> 3] >> (i & 7) & 1:
+                return read(i)
+            return MISSING
+        return get
+
+
+class Column(object):
+    """
+    One column of a snapshot, which a `CompactStore` uses like a list.
+    Values are read out of the snapshot as they're asked for. Anything
+    written or appended after opening is kept in memory instead.
+    """
+    def __init__(self, n, read):
+        self._n = n
+        self._read = read
+        self._written = {}
+        self._appended = []
+
+    def __len__(self):
+        return self._n + len(self._appended)
+
+    def __getitem__(self, i):
+        if i >= self._n:
+            return self._appended[i - self._n]
+        if i < 0:
+            raise IndexError(i)
+        written = self._written.get(i, MISSING)
+        return self._read(i) if written is MISSING else written
+
+    def __setitem__(self, i, value):
+        if i >= self._n:
+            self._appended[i - self._n] = value
+        elif i < 0:
+            raise IndexError(i)
+        else:
+            self._written[i] = value
+
+    def __delitem__(self, key):
+        # only ever used to undo appends, see `CompactStore.addedges`
+        start = key.indices(len(self))[0]
+        if start < self._n:
+            raise IndexError("Can't remove a snapshot's own values")
+        del self._appended[start - self._n:]
+
+    def __iter__(self):
+        return map(self.__getitem__, range(len(self)))
+
+    def append(self, value):
+        self._appended.append(value)
+
+
+class IdColumn(Column):
+    """
+    The ids of a snapshot's vertices or edges, when they aren't just their
+    idx numbers. Elements added after opening get integer ids following on
+    from the ones saved.
+    """
+    def __init__(self, n, read, next_=None):
+        super(IdColumn, self).__init__(n, read)
+        self._idxs = None
+        self._next = next_
+
+    @property
+    def next(self):
+        if self._next is None:
+            self._next = max([id_ for id_ in self if isinstance(id_, int)] +
+                             [len(self) - 1]) + 1
+        return self._next
+
+    def find(self, id_):
+        """The idx of the element with id `id_`. Raises KeyError."""
+        if self._idxs is None:
+            self._idxs = dict((id_, i) for i, id_ in enumerate(self))
+        return self._idxs[id_]
+
+    def allocate(self):
+        id_ = self.next
+        self._next = id_ + 1
+        if self._idxs is not None:
+            self._idxs[id_] = len(self)
+        self.append(id_)
+        return id_
+
+
+def _defaulted(read):
+    def get(i):
+        value = read(i)
+        return None if value is MISSING else value
+    return get
+
+
+def _propsreader(snapshot, columns):
+    readers = [(key, snapshot.reader(column))
+               for key, column in sorted(columns.items())]
+
+    def read(i):
+        props = {}
+        for key, get in readers:
+            value = get(i)
+            if value is not MISSING:
+                props[key] = value
+        return props or None
+    return read
+
+
+def openstore(snapshot):
+    """A `CompactStore` reading from `snapshot`"""
+    header = snapshot.header
+    n, m = header['nvertices'], header['nedges']
+    vertices, edges = header['vertices'], header['edges']
+    section = snapshot.section
+
+    store = CompactStore()
+    store.vobj = Column(n, _defaulted(snapshot.reader(vertices['obj'])))
+    store.vlabel = Column(n, _defaulted(snapshot.reader(vertices['label'])))
+    store.vprops = Column(n, _propsreader(snapshot, vertices['properties']))
+
+    store.src = section('src')
+    store.dst = section('dst')
+    store.weight = Column(m, _defaulted(snapshot.reader(edges['weight'])))
+    store.elabel = section('elabel')
+    labels = snapshot.reader(edges['labels'])
+    store.labels = [labels(i) for i in range(header['nlabels'])]
+    store._labelcodes = dict((l, i) for i, l in enumerate(store.labels))
+    store.eprops = Column(m, _propsreader(snapshot, edges['properties']))
+
+    store._out, store._in = [
+        CSR.fromarrays(section(name + '.offsets'), section(name + '.edges'),
+                       section(name + '.neighbours'))
+        for name in ('out', 'in')]
+
+    if 'id' in vertices:
+        strategy = header['ids'] or {}
+        store.vids = IdColumn(n, snapshot.reader(vertices['id']),
+                              strategy.get('next'))
+    if 'id' in edges:
+        store.eids = IdColumn(m, snapshot.reader(edges['id']),
+                              header['nextedgeid'])
+    return store
+
+
+class _Saved(object):
+    # an id strategy handing out the ids a snapshot was saved with
+    def __init__(self, ids):
+        self._ids = iter(ids)
+
+    def allocate(self, element):
+        return next(self._ids)
+
+
+def _restored(strategy, ids):
+    kind = (strategy or {}).get('kind')
+    if kind == 'uuid':
+        return UUIDIds()
+    if kind == 'key':
+        return KeyIds(strategy['key'])
+    if kind == 'sequential':
+        return SequentialIds(strategy['next'])
+    return SequentialIds(max([id_ for id_ in ids if isinstance(id_, int)] +
+                             [-1]) + 1)
+
+
+def _build(snapshot, klass):
+    # a Graph of objects, filled from the columns of a snapshot's store
+    header = snapshot.header
+    store = openstore(snapshot)
+    vids = store.vids if store.vids is not None else range(store.nvertices())
+
+    graph = klass(ids=_Saved(vids))
+    graph.addvertices(dict(props or {}, obj=obj, label=label)
+                      for obj, label, props in zip(
+                          store.vobj, store.vlabel, store.vprops))
+    graph._ids = _restored(header['ids'], vids)
+    uuids = snapshot.reader(header['vertices']['uuid'])
+    if header['vertices']['uuid']['kind'] != 'none':
+        for v in graph.V():
+            uuid = uuids(v.idx)
+            if uuid is not MISSING:
+                Vertex._uuid.__set__(v, uuid)
+
+    labels = store.labels
+    graph.addedges((s, t, weight, labels[code], props)
+                   for s, t, weight, code, props in zip(
+                       store.src, store.dst, store.weight, store.elabel,
+                       store.eprops))
+    graph._nexteid = header['nextedgeid']
+    if store.eids is not None:
+        graph._eids = {}
+        for e, id_ in zip(graph.E(), store.eids):
+            Element.id.__set__(e, id_)
+            graph._eids[id_] = e
+    return graph
+
+
+def load(path, klass, mmap=False):
+    """
+    Open the snapshot at `path` as a graph of type `klass`. With `mmap`,
+    or if `klass` is a `CompactGraph`, that's a `CompactGraph` reading
+    straight out of the snapshot; otherwise the whole graph is built in
+    memory.
+    """
+    snapshot = Snapshot.read(path, mmap)
+    if mmap or issubclass(klass, CompactGraph):
+        if not issubclass(klass, CompactGraph):
+            klass = CompactGraph
+        return klass(openstore(snapshot))
+    return _build(snapshot, klass)
@@ -0,0 +1,312 @@
+"""
+Storage adapters, for graphs that are read through an interface rather
+than held in memory as a `Graph`.
+
+An adapter answers three questions about many vertices at once, as
+coroutines, so that a slow store (a database, a remote service) is asked
+once per step of a traversal rather than once per vertex:
+
+    adjacent(ids, step, label)  for each id, the ids of the vertices `step`
+                                ('out', 'in_' or 'both') reaches from it,
+                                along edges with `label` if one is given
+    edges(ids, step, label)     for each id, the edges themselves, as `Edge`
+                                objects between the vertices at their ends
+    vertices(ids)               the vertices with those ids, as `Vertex`
+                                objects with their obj, label and properties
+
+`MemoryStorage` puts an ordinary `Graph` behind the interface, and
+`SQLiteStorage` keeps the graph in an SQLite database, which only has to fit
+on disk:
+
+    >>> store = SQLiteStorage("graph.db")
+    >>> store.write(g)
+    >>> await store.traverse(0).out(label="knows").out().toList()
+
+Traversals of an adapter are `pylgrim.asynctraversal.AsyncTraversal`s, so
+one event loop can have many of them waiting on the store at once.
+
+Code that isn't async can read a vertex with `vertex(id)` instead. What an
+`SQLiteStorage` gives back is a `StoredVertex`, whose `out()`, `in_()`,
+`both()` and edge steps ask the store, so it traverses like any other
+vertex, but with a round trip for every vertex at every step:
+
+    >>> store.vertex(0).traverse().out(label="knows").out().toList()
+
+A `Graph` itself always holds everything in memory; an adapter is a way to
+read a graph that's kept somewhere else, not a backend for a `Graph`.
+"""
+import asyncio
+import json
+import sqlite3
+
+from concurrent.futures import ThreadPoolExecutor
+
+from pylgrim.element import ALL, Edge, ElementList, Vertex, _select
+
+# how many ids go in one `IN (...)` list, well under SQLite's limit on the
+# number of parameters in a statement
+CHUNK = 500
+
+
+def _wait(coroutine):
+    # the result of `coroutine`, for callers that aren't async
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+    # called from a coroutine after all, whose loop can't run another one
+    # until this returns: give `coroutine` a loop of its own on a thread of
+    # its own (which nested calls get too), and block until it's done
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coroutine).result()
+
+
+class StoredVertex(Vertex):
+    """
+    A vertex read from a storage adapter. Its adjacent vertices and edges
+    aren't kept on it, but asked for each time, so they're read through the
+    adapter too.
+    """
+    __slots__ = ('_storage',)
+
+    def _adjacent(self, step, kwds):
+        label = kwds.pop('label', ALL)
+        storage = self._storage
+        ids, = _wait(storage.adjacent([self.id], step, label))
+        return _select(ElementList(_wait(storage.vertices(ids))), kwds)
+
+    def _edges(self, step, kwds):
+        label = kwds.pop('label', ALL)
+        edges, = _wait(self._storage.edges([self.id], step, label))
+        return _select(ElementList(edges), kwds)
+
+    def out(self, **kwds):
+        return self._adjacent('out', kwds)
+
+    def in_(self, **kwds):
+        return self._adjacent('in_', kwds)
+
+    def both(self, **kwds):
+        return self._adjacent('both', kwds)
+
+    def outE(self, **kwds):
+        return self._edges('out', kwds)
+
+    def inE(self, **kwds):
+        return self._edges('in_', kwds)
+
+    def bothE(self, **kwds):
+        return self._edges('both', kwds)
+
+    def outdegree(self, label=ALL):
+        ids, = _wait(self._storage.adjacent([self.id], 'out', label))
+        return len(ids)
+
+    def indegree(self, label=ALL):
+        ids, = _wait(self._storage.adjacent([self.id], 'in_', label))
+        return len(ids)
+
+
+class Storage(object):
+    """The interface every storage adapter implements"""
+    async def adjacent(self, ids, step, label=ALL):
+        """
+        A list with, for each of `ids`, a list of the ids of the vertices
+        `step` reaches from it, in the order the vertex's own `step` method
+        would return them. `label` is a value or a predicate on the label
+        of the edges to follow.
+        """
+        raise NotImplementedError
+
+    async def edges(self, ids, step, label=ALL):
+        """
+        Like `adjacent`, but with the edges `step` follows from each of
+        `ids` rather than the ids at their far ends, as the vertex's own
+        `outE`, `inE` or `bothE` would return them
+        """
+        raise NotImplementedError
+
+    async def vertices(self, ids):
+        """The vertices with `ids`, in the same order"""
+        raise NotImplementedError
+
+    def vertex(self, id_):
+        """
+        The vertex with id `id_`, read right away, for code that isn't
+        async. From a coroutine it still works, but holds up the event loop
+        until the store answers; use `vertices` there.
+        """
+        return _wait(self.vertices([id_]))[0]
+
+    def traverse(self, *ids):
+        """
+        Start an `AsyncTraversal` from the vertices with `ids`:
+
+            >>> t = store.traverse(0, 1).out(label="knows").filter(age=30)
+            >>> await t.toList()
+        """
+        from pylgrim.asynctraversal import AsyncTraversal
+        return AsyncTraversal(self, ids)
+
+
+class MemoryStorage(Storage):
+    """An in-memory `Graph` behind the storage interface"""
+    def __init__(self, graph):
+        self.graph = graph
+
+    async def adjacent(self, ids, step, label=ALL):
+        vertex = self.graph.vertex
+        kwds = {} if label is ALL else {'label': label}
+        return [[v.id for v in getattr(vertex(id_), step)(**kwds)]
+                for id_ in ids]
+
+    async def edges(self, ids, step, label=ALL):
+        vertex = self.graph.vertex
+        kwds = {} if label is ALL else {'label': label}
+        step = {'out': 'outE', 'in_': 'inE', 'both': 'bothE'}[step]
+        return [list(getattr(vertex(id_), step)(**kwds)) for id_ in ids]
+
+    async def vertices(self, ids):
+        vertex = self.graph.vertex
+        return [vertex(id_) for id_ in ids]
+
+
+class SQLiteStorage(Storage):
+    """
+    A graph kept in the SQLite database at `path`, in a `vertices` table of
+    ids, JSON objs, labels and JSON properties, and an `edges` table indexed
+    by both ends.
+
+    Queries run on a thread of their own, so awaiting them doesn't hold up
+    the event loop, and the adapter can be shared by any number of
+    traversals running at once.
+    """
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS vertices (
+            id PRIMARY KEY, obj TEXT, label, properties TEXT);
+        CREATE TABLE IF NOT EXISTS edges (
+            id INTEGER PRIMARY KEY, src, dst, label, weight,
+            properties TEXT);
+        CREATE INDEX IF NOT EXISTS edges_src ON edges (src, label);
+        CREATE INDEX IF NOT EXISTS edges_dst ON edges (dst, label);
+    """
+
+    def __init__(self, path):
+        self.path = path
+        # one thread, which is the only one to ever use the connection
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._connection = None
+
+    def _connect(self):
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.path)
+            self._connection.executescript(self.SCHEMA)
+        return self._connection
+
+    def _call(self, fn, *args):
+        return self._executor.submit(fn, *args).result()
+
+    async def _run(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, *args)
+
+    def write(self, graph):
+        """Add every vertex and edge of `graph` to the database"""
+        self._call(self._write, graph)
+
+    def _write(self, graph):
+        db = self._connect()
+        with db:
+            db.executemany(
+                "INSERT INTO vertices VALUES (?, ?, ?, ?)",
+                ((v.id, json.dumps(v.obj), v.label,
+                  json.dumps(v.properties())) for v in graph.V()))
+            db.executemany(
+                "INSERT INTO edges VALUES (?, ?, ?, ?, ?, ?)",
+                ((e.id, e.from_.id, e.to.id, e.label, e.weight,
+                  json.dumps(e.properties())) for e in graph.E()))
+
+    def close(self):
+        if self._connection is not None:
+            self._call(self._connection.close)
+            self._connection = None
+        self._executor.shutdown()
+
+    async def adjacent(self, ids, step, label=ALL):
+        return await self._run(self._adjacent, ids, step, label)
+
+    def _adjacent(self, ids, step, label):
+        found = self._rows(ids, step, label, "label")
+        return [[other for other, edgelabel in rows] for rows in found]
+
+    async def edges(self, ids, step, label=ALL):
+        return await self._run(self._edges, ids, step, label)
+
+    def _edges(self, ids, step, label):
+        found = self._rows(ids, step, label,
+                           "label, id, src, dst, weight, properties")
+        ends = set(id_ for rows in found for row in rows for id_ in row[3:5])
+        vertices = dict(zip(ends, self._vertices(list(ends))))
+        edges = {}
+
+        def edge(id_, src, dst, edgelabel, weight, properties):
+            # the same Edge when a loop is reached both ways
+            if id_ not in edges:
+                e = Edge(vertices[src], vertices[dst], weight, edgelabel,
+                         **json.loads(properties))
+                e.id = id_
+                edges[id_] = e
+            return edges[id_]
+
+        return [[edge(id_, src, dst, edgelabel, weight, properties)
+                 for _, edgelabel, id_, src, dst, weight, properties in rows]
+                for rows in found]
+
+    def _rows(self, ids, step, label, columns):
+        # for each of `ids`, a row of (the id at the far end, `columns`...)
+        # for every edge `step` follows from it
+        found = dict((id_, []) for id_ in ids)
+        keys = list(found)
+        matches = None
+        if label is not ALL and callable(label):
+            matches, label = label, ALL
+        for near, far in {'out': [('src', 'dst')], 'in_': [('dst', 'src')],
+                          'both': [('src', 'dst'), ('dst', 'src')]}[step]:
+            # within each direction a vertex's edges come in the order they
+            # were added, the way they're kept in memory
+            reached = dict((id_, []) for id_ in keys)
+            for i in range(0, len(keys), CHUNK):
+                chunk = keys[i:i + CHUNK]
+                sql = "SELECT {0}, {1}, {2} FROM edges WHERE {0} IN " \
+                      "({3})".format(near, far, columns,
+                                     ", ".join("?" * len(chunk)))
+                params = list(chunk)
+                if label is not ALL:
+                    sql += " AND label IS ?"
+                    params.append(label)
+                for row in self._connect().execute(sql + " ORDER BY id",
+                                                   params):
+                    if matches is None or matches(row[2]):
+                        reached[row[0]].append(row[1:])
+            for id_ in keys:
+                found[id_].extend(reached[id_])
+        return [found[id_] for id_ in ids]
+
+    async def vertices(self, ids):
+        return await self._run(self._vertices, ids)
+
+    def _vertices(self, ids):
+        keys = list(set(ids))
+        found = {}
+        for i in range(0, len(keys), CHUNK):
+            chunk = keys[i:i + CHUNK]
+            for id_, obj, label, properties in self._connect().execute(
+                    "SELECT id, obj, label, properties FROM vertices WHERE "
+                    "id IN ({0})".format(", ".join("?" * len(chunk))),
+                    chunk):
+                v = StoredVertex(json.loads(obj), label,
+                                 **json.loads(properties))
+                v.id = id_
+                v._storage = self
+                found[id_] = v
+        return [found[id_] for id_ in ids]
@@ -0,0 +1,679 @@
+from itertools import groupby, islice
+
+import tracemalloc
+
+from pylgrim import hooks, planner
+from pylgrim.element import Edge, ElementList, Vertex, fastpath
+from pylgrim.predicates import compilefilters
+
+
+def _adjacent(method):
+    def step(elements, **kwds):
+        # runs of elements of the same type share a lookup of the fast path,
+        # and still get pulled through it one at a time
+        for klass, run in groupby(elements, type):
+            vectorized = None if kwds else fastpath(klass, method)
+            if vectorized is None:
+                for element in run:
+                    for adjacent in getattr(element, method)(**kwds):
+                        yield adjacent
+            else:
+                for adjacent in vectorized(run):
+                    yield adjacent
+    step.__name__ = method
+    return step
+
+
+def _filter(elements, *closures, **filters):
+    return filter(compilefilters(filters, closures), elements)
+
+
+def _values(elements, name):
+    for element in elements:
+        if hasattr(element, name):
+            yield getattr(element, name)
+
+
+def _aggregate(elements, collection):
+    add = _adder(collection)
+    for element in elements:
+        add(element)
+        yield element
+
+
+def _trackedaggregate(nodes, collection):
+    add = _adder(collection)
+    for node in nodes:
+        add(node.element)
+        yield node
+
+
+def _adder(collection):
+    add = getattr(collection, 'append', None)
+    return add if add is not None else collection.add
+
+
+def _degree(element, step):
+    degree = getattr(element, '_degree', None)
+    n = degree(step) if degree is not None else None
+    if n is None:
+        n = len(getattr(element, step)())
+    return n
+
+
+def _loop(elements, step='out', depth=None, emit=None, order='bfs', **kwds):
+    expand = STEPS[step]
+    search = _SEARCHES[order]
+    for start in elements:
+        for vertex in search(start, expand, kwds, depth):
+            if emit is None or emit(vertex):
+                yield vertex
+
+
+def _bfs(start, expand, kwds, depth):
+    visited = set([start])
+    frontier = [start]
+    level = 0
+    while frontier and (depth is None or level < depth):
+        level += 1
+        reached = []
+        # the whole frontier is expanded in one go, and a vertex joins the
+        # next one only the first time it's reached
+        for vertex in expand(frontier, **kwds):
+            if vertex not in visited:
+                visited.add(vertex)
+                reached.append(vertex)
+                yield vertex
+        frontier = reached
+
+
+def _dfs(start, expand, kwds, depth):
+    # vertex -> the shallowest depth it's been reached at. With a depth limit
+    # a vertex reached again by a shorter path is expanded again, or the
+    # vertices past it could be missed; it's still only emitted once.
+    seen = {start: 0}
+    stack = [iter(expand((start,), **kwds))]
+    while stack:
+        level = len(stack)
+        for vertex in stack[-1]:
+            if vertex in seen:
+                if depth is None or seen[vertex] <= level:
+                    continue
+            else:
+                yield vertex
+            seen[vertex] = level
+            if depth is None or level < depth:
+                stack.append(iter(expand((vertex,), **kwds)))
+                break
+        else:
+            stack.pop()
+
+
+_SEARCHES = {'bfs': _bfs, 'dfs': _dfs}
+
+
+STEPS = {
+    'out': _adjacent('out'),
+    'outE': _adjacent('outE'),
+    'in_': _adjacent('in_'),
+    'inE': _adjacent('inE'),
+    'both': _adjacent('both'),
+    'bothE': _adjacent('bothE'),
+    'inV': _adjacent('inV'),
+    'outV': _adjacent('outV'),
+    'filter': _filter,
+    'values': _values,
+    'loop': _loop,
+    'aggregate': _aggregate,
+}
+
+
+class PathNode(object):
+    """
+    One element of the path a traverser has taken. Each node only points at
+    the node before it, so traversers that branch off the same path share
+    its prefix instead of each copying it.
+    """
+    __slots__ = ('element', 'parent', 'names')
+
+    def __init__(self, element, parent=None, names=()):
+        self.element = element
+        self.parent = parent
+        self.names = names
+
+    def path(self):
+        """Every element from the start of the path up to this one"""
+        elements = []
+        node = self
+        while node is not None:
+            elements.append(node.element)
+            node = node.parent
+        elements.reverse()
+        return ElementList(elements)
+
+    def named(self, name):
+        """The nearest node back along the path called `name`, or None"""
+        node = self
+        while node is not None and name not in node.names:
+            node = node.parent
+        return node
+
+
+def _tracked(step):
+    # the version of an ordinary step for streams of PathNodes: whatever it
+    # makes of each node's element is added to that node's path
+    def tracked(nodes, *args, **kwds):
+        for node in nodes:
+            for element in step((node.element,), *args, **kwds):
+                yield PathNode(element, node)
+    return tracked
+
+
+def _trackedfilter(nodes, *closures, **filters):
+    match = compilefilters(filters, closures)
+    for node in nodes:
+        if match(node.element):
+            yield node
+
+
+def _as(nodes, name):
+    for node in nodes:
+        yield PathNode(node.element, node.parent, node.names + (name,))
+
+
+def _back(nodes, step):
+    for node in nodes:
+        if isinstance(step, int):
+            for i in range(step):
+                node = node.parent
+                if node is None:
+                    break
+        else:
+            node = node.named(step)
+        if node is not None:
+            yield node
+
+
+def _select(nodes, *names):
+    for node in nodes:
+        if names:
+            row = {}
+            for name in names:
+                named = node.named(name)
+                if named is not None:
+                    row[name] = named.element
+        else:
+            row = {}
+            n = node
+            while n is not None:
+                for name in n.names:
+                    row.setdefault(name, n.element)
+                n = n.parent
+        yield PathNode(row, node)
+
+
+def _paths(nodes, *closures):
+    for node in nodes:
+        path = node.path()
+        if closures:
+            path = ElementList(closures[i % len(closures)](element)
+                               for i, element in enumerate(path))
+        yield PathNode(path, node)
+
+
+def _uniquepath(nodes):
+    for node in nodes:
+        seen = set()
+        n = node
+        while n is not None:
+            try:
+                hash(n.element)
+                key = (True, n.element)
+            except TypeError:
+                key = (False, id(n.element))
+            if key in seen:
+                break
+            seen.add(key)
+            n = n.parent
+        else:
+            yield node
+
+
+# steps that need to know the path each element took; a traversal with any
+# of them runs the steps up to the last one on PathNodes instead of elements
+PATHSTEPS = {
+    'as': _as,
+    'back': _back,
+    'select': _select,
+    'paths': _paths,
+    'uniquePath': _uniquepath,
+}
+
+# steps that pass the elements they keep through unchanged, so on PathNodes
+# they pass the nodes through instead of adding to the paths
+PASSTHROUGH = {
+    'filter': _trackedfilter,
+    'aggregate': _trackedaggregate,
+}
+
+# steps whose result count is the sum of their elements' degrees
+DEGREESTEPS = frozenset(['out', 'outE', 'in_', 'inE', 'both', 'bothE',
+                         'inV', 'outV'])
+
+
+_END = object()
+
+# steps that reach elements their input didn't have, which the results of
+# the rest of the traversal then depend on
+_EXPANDING = DEGREESTEPS | frozenset(['loop'])
+
+
+def _footprint(elements, graph, footprint):
+    # note the version of every vertex that goes by, and of both ends of
+    # every edge
+    versions = graph._versions
+    for element in elements:
+        vertices = element.element if element.__class__ is PathNode \
+            else element
+        if isinstance(vertices, Edge):
+            vertices = (vertices.from_, vertices.to)
+        elif isinstance(vertices, Vertex):
+            vertices = (vertices,)
+        else:
+            vertices = ()
+        for vertex in vertices:
+            if vertex not in footprint:
+                footprint[vertex] = versions.get(vertex, 0)
+        yield element
+
+
+def _split(steps):
+    # adjacency steps with filters on what they reach, like `out(name="x")`,
+    # become the step and then a filter, so that a cached run sees (and
+    # notes down) the elements the filter drops
+    split = []
+    for name, args, kwds in steps:
+        rest = dict((k, v) for k, v in kwds.items() if k != 'label')
+        if name in DEGREESTEPS and rest:
+            label = dict((k, v) for k, v in kwds.items() if k == 'label')
+            split.append((name, args, label))
+            split.append(('filter', (), rest))
+        else:
+            split.append((name, args, kwds))
+    return split
+
+
+def _caching(cache, key, graph, elements, footprint, version):
+    # stores the results once the traversal has run to the end
+    results = []
+    for element in elements:
+        results.append(element)
+        yield element
+    if footprint is not None:
+        footprint = tuple(footprint.items())
+    cache.put(key, graph, results, footprint, version)
+
+
+def _locked(lock, elements):
+    # each result is worked out with the graph locked for reading, and
+    # writers can get in between one and the next
+    while True:
+        with lock.reading():
+            element = next(elements, _END)
+        if element is _END:
+            return
+        yield element
+
+
+def _finishing(traversal, plan, elements, hooked):
+    # runs once the traversal is exhausted, or dropped before it is
+    try:
+        for element in elements:
+            yield element
+    finally:
+        plan.finish()
+        for hook in hooked:
+            hook(traversal, plan)
+
+
+class Traversal(object):
+    """
+    Traversal is the lazy counterpart to chaining calls on an ElementList.
+
+    Chaining on an ElementList runs each step to completion before the next
+    one starts, so
+
+        >>> v.out().out()[:10]
+
+    builds every two-hop neighbour of `v` just to keep ten of them. A
+    Traversal only records the steps, and then pulls elements through all of
+    them one at a time when a result is asked for:
+
+        >>> v.traverse().out().out().take(10)
+
+    stops expanding vertices as soon as it has ten results.
+
+    Every step returns a new Traversal, so a partly built one can be reused:
+
+        >>> friends = v.traverse().out(label="knows")
+        >>> friends.name.toList()
+        >>> friends.out().next()
+
+    A Traversal is also an iterator; `next()`, `take(n)` and `toList()` all
+    continue from wherever the previous call stopped.
+
+    The steps aren't run exactly as written: they're planned first, to use
+    indexes and skip work that doesn't change the results. See
+    `pylgrim.planner` and `explain()`.
+    """
+    def __init__(self, starts=None, steps=(), graph=None):
+        # with a `graph` and no `starts`, every vertex of the graph
+        self._starts = starts
+        self._steps = tuple(steps)
+        self._graph = graph
+        self._iterator = None
+
+    def _add(self, name, args=(), kwds=None):
+        step = (name, tuple(args), dict(kwds or {}))
+        return Traversal(self._starts, self._steps + (step,), self._graph)
+
+    def _plan(self, steps=None):
+        if self._starts is None and self._graph is None:
+            raise ValueError("{0} has no starting elements".format(self))
+        return planner.plan(self._starts,
+                            self._steps if steps is None else steps,
+                            self._graph, PATHSTEPS)
+
+    def _iterate(self, plan=None):
+        lock = getattr(self._graph, '_lock', None)
+        if lock is None:
+            return self._run(plan)
+        with lock.reading():
+            elements = self._run(plan)
+        return _locked(lock, elements)
+
+    def _run(self, plan):
+        hooked = hooks.sampled()
+        cache = key = None
+        if plan is None and not hooked:
+            cache = getattr(self._graph, '_cache', None)
+        if cache is not None:
+            key = cache.key(self._starts,
+                            planner.normalize(self._steps, PATHSTEPS))
+            if key is not None:
+                results = cache.get(key, self._graph)
+                if results is not None:
+                    return iter(results)
+        if plan is None:
+            plan = self._plan(None if key is None else _split(self._steps))
+        if hooked and plan.recording in (None, 'count'):
+            plan.recording = 'time'
+        # the vertices the results depend on, and their versions, for the
+        # cache; None if they depend on the whole graph
+        footprint = None
+        if key is not None and not plan.wholegraph:
+            footprint = {}
+        version = getattr(self._graph, '_version', None)
+
+        steps = plan.steps
+        tracked = [i for i, (name, _, _) in enumerate(steps)
+                   if name in PATHSTEPS]
+        elements = iter(plan.stage(0, plan.starts))
+        if footprint is not None:
+            elements = _footprint(elements, self._graph, footprint)
+        stage = 1
+        if tracked:
+            last = tracked[-1] + 1
+            nodes = (PathNode(element) for element in elements)
+            for name, args, kwds in steps[:last]:
+                step = PATHSTEPS.get(name) or PASSTHROUGH.get(name)
+                if step is None:
+                    step = _tracked(STEPS[name])
+                nodes = plan.stage(stage, step(nodes, *args, **kwds))
+                if footprint is not None and name in _EXPANDING:
+                    nodes = _footprint(nodes, self._graph, footprint)
+                stage += 1
+            elements = (node.element for node in nodes)
+            steps = steps[last:]
+
+        for name, args, kwds in steps:
+            elements = plan.stage(stage, STEPS[name](elements, *args, **kwds))
+            if footprint is not None and name in _EXPANDING:
+                elements = _footprint(elements, self._graph, footprint)
+            stage += 1
+        if key is not None:
+            elements = _caching(cache, key, self._graph, elements, footprint,
+                                version)
+        if plan.recording in ('time', 'memory'):
+            # the hooks get a copy, so the iterator doesn't keep this
+            # traversal alive, and is closed as soon as it's dropped
+            elements = _finishing(
+                Traversal(self._starts, self._steps, self._graph), plan,
+                elements, hooked)
+        return elements
+
+    def explain(self):
+        """
+        Plan this traversal and run it to the end (separately, so this one
+        isn't used up), and return the `Plan`: every step as it actually
+        runs, with how many elements it was estimated to produce and how
+        many it did.
+
+            >>> g.traverse().filter(name="Fred").out().explain()
+            step            estimated    actual
+            V(name='Fred')          1         1  index lookup
+            out()                   4         3
+        """
+        plan = self._plan()
+        plan.recording = 'count'
+        for _ in self._iterate(plan):
+            pass
+        return plan
+
+    def profile(self, allocations=False):
+        """
+        Like `explain()`, but also time each step, and with `allocations`
+        measure the memory each one allocates (with `tracemalloc`, which
+        slows everything down a lot). The `Plan` returned has the time and
+        net bytes allocated by each step itself, not counting the steps
+        before it; `report()` on it gives them as a list of dicts:
+
+            >>> g.traverse().out().out(label="knows").profile()
+            step                 estimated    actual        ms
+            V()                       1000      1000     0.211
+            out()                     4000      4012      1.93
+            out(label='knows')         800       791      4.52
+        """
+        plan = self._plan()
+        plan.recording = 'memory' if allocations else 'time'
+        tracing = tracemalloc.is_tracing()
+        if allocations and not tracing:
+            tracemalloc.start()
+        try:
+            for _ in self._iterate(plan):
+                pass
+        finally:
+            if allocations and not tracing:
+                tracemalloc.stop()
+        return plan
+
+    def out(self, **kwds):
+        return self._add('out', kwds=kwds)
+
+    def outE(self, **kwds):
+        return self._add('outE', kwds=kwds)
+
+    def in_(self, **kwds):
+        return self._add('in_', kwds=kwds)
+
+    def inE(self, **kwds):
+        return self._add('inE', kwds=kwds)
+
+    def both(self, **kwds):
+        return self._add('both', kwds=kwds)
+
+    def bothE(self, **kwds):
+        return self._add('bothE', kwds=kwds)
+
+    def inV(self, **kwds):
+        return self._add('inV', kwds=kwds)
+
+    def outV(self, **kwds):
+        return self._add('outV', kwds=kwds)
+
+    def filter(self, *closures, **filters):
+        return self._add('filter', closures, filters)
+
+    def values(self, name):
+        return self._add('values', (name,))
+
+    def loop(self, step='out', depth=None, emit=None, order='bfs', **kwds):
+        """
+        Repeat `step` (`'out'`, `'in_'` or `'both'`, with `kwds` as its
+        filters) from each incoming vertex, emitting every vertex it reaches
+        within `depth` steps, or all of them if `depth` is None. Each vertex
+        is expanded and emitted at most once per incoming vertex, so
+
+            >>> v.traverse().loop('out', depth=3, label="knows")
+
+        is like `.out().out().out()` without the duplicates, and only needs
+        memory for the distinct vertices reached, not for every path.
+
+        `emit` is a predicate picking which reached vertices are emitted
+        (they're expanded either way), and `order` is `'bfs'` (nearest
+        first) or `'dfs'`.
+        """
+        if step not in ('out', 'in_', 'both'):
+            raise ValueError("Can't loop over {0!r}".format(step))
+        if order not in _SEARCHES:
+            raise ValueError("order must be 'bfs' or 'dfs', not {0!r}".format(
+                order))
+        kwds.update(step=step, depth=depth, emit=emit, order=order)
+        return self._add('loop', kwds=kwds)
+
+    def as_(self, name):
+        """Name the current step, for `back` and `select`"""
+        return self._add('as', (name,))
+
+    def back(self, step):
+        """
+        Go back to the element `step` steps earlier in each path, or to the
+        one at the step named `step` with `as_`:
+
+            >>> v.traverse().as_('x').out(name="Bob").back('x')
+        """
+        return self._add('back', (step,))
+
+    def select(self, *names):
+        """
+        A dict of the elements at the steps called `names` in each path, or
+        at every named step if no names are given.
+        """
+        return self._add('select', names)
+
+    def paths(self, *closures):
+        """
+        The path each element took to get here, as an ElementList. The
+        `closures`, if any, are applied to its elements in turn.
+        """
+        return self._add('paths', closures)
+
+    def uniquePath(self):
+        """Only elements whose path doesn't go through anything twice"""
+        return self._add('uniquePath')
+
+    def aggregate(self, collection):
+        """
+        Add every element to `collection` (a list, a set, or anything with
+        `append` or `add`) as it goes past, and pass it on.
+        """
+        return self._add('aggregate', (collection,))
+
+    # The rest of these are reductions: they use up the traversal and fold
+    # its results one at a time, so only their running totals are kept.
+
+    def count(self):
+        """
+        The number of results. When the last step is an adjacency step
+        without filters, like `g.traverse().out().count()`, it's added up
+        from the degrees of the elements before it instead.
+        """
+        if self._iterator is None and self._steps:
+            name, args, kwds = self._steps[-1]
+            if name in DEGREESTEPS and not kwds:
+                before = Traversal(self._starts, self._steps[:-1],
+                                   self._graph)
+                self._iterator = iter(())
+                return sum(_degree(element, name)
+                           for element in before._iterate())
+        n = 0
+        for _ in self:
+            n += 1
+        return n
+
+    def sum(self, start=0):
+        return sum(self, start)
+
+    def min(self):
+        """The smallest result, or None if there aren't any"""
+        return min(self, default=None)
+
+    def max(self):
+        """The largest result, or None if there aren't any"""
+        return max(self, default=None)
+
+    def mean(self):
+        """The mean of the results, or None if there aren't any"""
+        total, n = 0, 0
+        for value in self:
+            total += value
+            n += 1
+        return total / float(n) if n else None
+
+    def groupCount(self, key=None):
+        """
+        A dict of how many times each result came up. `key` groups results
+        by a property name or a function of the result instead:
+
+            >>> v.traverse().out().out().groupCount()
+            >>> g.traverse().groupCount("hometown")
+        """
+        if key is None:
+            by = None
+        elif callable(key):
+            by = key
+        else:
+            by = lambda element: getattr(element, key, None)
+        counts = {}
+        get = counts.get
+        for element in self:
+            k = element if by is None else by(element)
+            counts[k] = get(k, 0) + 1
+        return counts
+
+    def __getattr__(self, name):
+        # Anything that isn't a step is a property projection, the same way
+        # `ElementList` collects attributes: `v.traverse().out().name`
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return self.values(name)
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        if self._iterator is None:
+            self._iterator = self._iterate()
+        return next(self._iterator)
+
+    __next__ = next
+
+    def take(self, n):
+        return ElementList(islice(self, n))
+
+    def toList(self):
+        return ElementList(self)
+
+    def __repr__(self):
+        steps = [planner.describe(*step) for step in self._steps]
+        return "<Traversal: {0}>".format(".".join(steps) or "_")
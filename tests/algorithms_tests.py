@@ -0,0 +1,155 @@
+import random
+
+from unittest import TestCase
+
+from pylgrim.algorithms import Path
+from pylgrim import CompactGraph, Graph
+
+
+def simplepaths(g, src, dst):
+    """Every loopless path from src to dst, as (cost, [edge idx])"""
+    paths = []
+
+    def walk(v, visited, edges, cost):
+        if v == dst:
+            paths.append((cost, edges))
+            return
+        for e in g.v(v).outE():
+            if e.to.idx not in visited:
+                walk(e.to.idx, visited | set([e.to.idx]), edges + [e.idx],
+                     cost + (1 if e.weight is None else e.weight))
+    walk(src, set([src]), [], 0)
+    return sorted(paths)
+
+
+class ShortestPathTests(TestCase):
+    def setUp(self):
+        #      1       1
+        #   a ---> b ---> d
+        #   |             ^
+        #   | 5           | 1
+        #   v      1      |
+        #   c ----------->+   and a -> c -> d costs 5 + 1
+        self.g = Graph()
+        self.a, self.b, self.c, self.d, self.e = [
+            self.g.addvertex(name=n) for n in "abcde"]
+        self.ab = self.g.addedge(self.a, self.b, 1)
+        self.bd = self.g.addedge(self.b, self.d, 1)
+        self.ac = self.g.addedge(self.a, self.c, 5)
+        self.cd = self.g.addedge(self.c, self.d, 1)
+
+    def testShortestPath(self):
+        p = self.g.shortestpath(self.a, self.d)
+        self.assertIsInstance(p, Path)
+        self.assertEqual(p.cost, 2)
+        self.assertEqual(p.vertices, [self.a, self.b, self.d])
+        self.assertEqual(p.edges, [self.ab, self.bd])
+        self.assertEqual(len(p), 2)
+
+    def testUnreachable(self):
+        self.assertIsNone(self.g.shortestpath(self.a, self.e))
+        self.assertIsNone(self.g.shortestpath(self.d, self.a))
+        self.assertIsNone(self.g.shortestpath(self.a, self.e,
+                                              bidirectional=True))
+
+    def testToItself(self):
+        p = self.g.shortestpath(self.a, self.a)
+        self.assertEqual((p.cost, p.vertices, p.edges), (0, [self.a], []))
+        self.assertEqual(len(p), 0)
+        self.assertTrue(p)
+
+    def testByIdx(self):
+        self.assertEqual(self.g.shortestpath(0, 3).edges, [self.ab, self.bd])
+        with self.assertRaises(IndexError):
+            self.g.shortestpath(0, 10)
+
+    def testWeightChanges(self):
+        self.g.shortestpath(self.a, self.d)
+        self.bd.weight = 10
+        self.assertEqual(self.g.shortestpath(self.a, self.d).edges,
+                         [self.ac, self.cd])
+        e = self.g.addedge(self.a, self.d, 2)
+        self.assertEqual(self.g.shortestpath(self.a, self.d).edges, [e])
+
+    def testOtherWeights(self):
+        self.ac.cost = 0
+        self.cd.cost = 0
+        p = self.g.shortestpath(self.a, self.d, weight="cost")
+        self.assertEqual((p.cost, p.edges), (0, [self.ac, self.cd]))
+        p = self.g.shortestpath(self.a, self.d, weight=None)
+        self.assertEqual(p.cost, 2)
+
+    def testNegativeWeight(self):
+        self.ab.weight = -1
+        with self.assertRaises(ValueError):
+            self.g.shortestpath(self.a, self.d)
+
+    def testKShortestPaths(self):
+        paths = self.g.kshortestpaths(self.a, self.d, 3)
+        self.assertEqual([p.cost for p in paths], [2, 6])
+        self.assertEqual(paths[1].vertices, [self.a, self.c, self.d])
+
+    def testAStar(self):
+        distances = {"a": 2, "b": 1, "c": 1, "d": 0, "e": 0}
+        p = self.g.shortestpath(self.a, self.d,
+                                heuristic=lambda v, to: distances[v.name])
+        self.assertEqual(p.edges, [self.ab, self.bd])
+
+
+class CompactShortestPathTests(TestCase):
+    def setUp(self):
+        self.g = CompactGraph()
+        self.a, self.b = self.g.addvertex(), self.g.addvertex()
+
+    def testNoEdges(self):
+        self.assertIsNone(self.g.shortestpath(self.a, self.b))
+        self.assertEqual(self.g.shortestpath(self.a, self.a).vertices,
+                         [self.a])
+        self.assertEqual(self.g.kshortestpaths(self.a, self.b, 2), [])
+
+    def testVertexAddedSinceBuilding(self):
+        e = self.g.addedge(self.a, self.b)
+        self.assertEqual(self.g.shortestpath(self.a, self.b).edges, [e])
+        c = self.g.addvertex()
+        for kwds in ({}, {'bidirectional': True}):
+            self.assertIsNone(self.g.shortestpath(self.a, c, **kwds))
+            self.assertEqual(self.g.shortestpath(c, c, **kwds).vertices, [c])
+        f = self.g.addedge(self.b, c)
+        self.assertEqual(self.g.shortestpath(self.a, c).edges, [e, f])
+
+
+class RandomShortestPathTests(TestCase):
+    def build(self, klass, seed):
+        rng = random.Random(seed)
+        g = klass()
+        for i in range(12):
+            g.addvertex()
+        for i in range(30):
+            g.addedge(g.v(rng.randrange(12)), g.v(rng.randrange(12)),
+                      rng.choice([None, 0, 1, 2, 3.5, 7]))
+        return g
+
+    def testSameAsBruteForce(self):
+        for klass in (Graph, CompactGraph):
+            for seed in range(20):
+                g = self.build(klass, seed)
+                for src, dst in [(0, 1), (2, 7), (5, 3)]:
+                    expected = simplepaths(g, src, dst)
+                    cost = expected[0][0] if expected else None
+                    for kwds in ({}, {'bidirectional': True},
+                                 {'heuristic': lambda v, to: 0}):
+                        p = g.shortestpath(src, dst, **kwds)
+                        self.assertEqual(p and p.cost, cost)
+                        if p:
+                            self.assertEqual(p.vertices[0].idx, src)
+                            self.assertEqual(p.vertices[-1].idx, dst)
+                            self.assertEqual(
+                                sum(1 if e.weight is None else e.weight
+                                    for e in p.edges), cost)
+
+                    paths = g.kshortestpaths(src, dst, 4)
+                    self.assertEqual([p.cost for p in paths],
+                                     [c for c, _ in expected[:4]])
+                    self.assertEqual(
+                        len(set(tuple(p.edges.idx) for p in paths)),
+                        len(paths))
@@ -0,0 +1,127 @@
+from unittest import TestCase
+
+from pylgrim import CompactGraph, Graph
+from pylgrim.cache import ResultCache
+from pylgrim.predicates import gt
+from pylgrim.traversal import Traversal
+
+
+class CacheTests(TestCase):
+    def setUp(self):
+        self.g = Graph(cache=ResultCache(maxsize=4))
+        self.vs = [self.g.addvertex(n=i) for i in range(10)]
+        for i in range(9):
+            self.g.addedge(self.vs[i], self.vs[i + 1], label="next")
+        self.stats = self.g.cache.stats
+
+    def testHit(self):
+        t, u = self.vs[:2]
+        first = self.g.traverse(t).out().out().n.toList()
+        self.assertEqual(first, [2])
+        self.assertEqual(self.stats()['misses'], 1)
+        self.assertEqual(self.g.traverse(t).out().out().n.toList(), first)
+        self.assertEqual(self.stats()['hits'], 1)
+        # the same plan, written differently
+        self.assertEqual(self.g.traverse(t).outE().inV().out().n.toList(),
+                         first)
+        self.assertEqual(self.stats()['hits'], 2)
+        # different starts
+        self.g.traverse(u).out().out().n.toList()
+        self.assertEqual(self.stats()['misses'], 2)
+
+    def testInvalidatedByFootprint(self):
+        v0, v1, v2, v3 = self.vs[:4]
+        self.assertEqual(self.g.traverse(v0).out().n.toList(), [1])
+        # nowhere near it
+        self.g.addedge(self.vs[8], self.vs[5])
+        self.vs[9].n = 90
+        self.g.traverse(v0).out().n.toList()
+        self.assertEqual(self.stats()['hits'], 1)
+
+        v1.n = 10
+        self.assertEqual(self.g.traverse(v0).out().n.toList(), [10])
+        self.g.addedge(v0, v3)
+        self.assertEqual(self.g.traverse(v0).out().n.toList(), [10, 3])
+        self.assertEqual(self.g.traverse(v0).out(label="next").n.toList(),
+                         [10])
+        v0.outE()[0].label = "other"
+        self.assertEqual(self.g.traverse(v0).out(label="next").n.toList(),
+                         [])
+        self.assertEqual(self.stats()['invalidations'], 3)
+
+        # a neighbour the step's own filter dropped
+        self.assertEqual(self.g.traverse(v2).out(n=30).toList(), [])
+        v3.n = 30
+        self.assertEqual(self.g.traverse(v2).out(n=30).toList(), [v3])
+        self.assertEqual(self.stats()['invalidations'], 4)
+        # and one a loop dropped, which isn't cached at all
+        self.assertEqual(self.g.traverse(v2).loop('out', n=40).toList(), [])
+        v3.n = 40
+        self.assertEqual(self.g.traverse(v2).loop('out', n=40).toList(),
+                         [v3])
+
+    def testInvalidatedByRemoval(self):
+        v0, v1 = self.vs[:2]
+        self.g.traverse(v0).out().toList()
+        self.g.removeedge(v0.outE()[0])
+        self.assertEqual(self.g.traverse(v0).out().toList(), [])
+        self.g.traverse(v1).n.toList()
+        self.g.removevertex(v1)
+        self.g.traverse(v1).n.toList()
+        self.assertEqual(self.stats()['hits'], 0)
+        self.assertEqual(self.stats()['invalidations'], 2)
+
+    def testWholeGraph(self):
+        t = self.g.traverse().filter(n=gt(5))
+        self.assertEqual(len(t.toList()), 4)
+        self.g.traverse().filter(n=gt(5)).toList()
+        self.assertEqual(self.stats()['hits'], 1)
+        self.g.addvertex(n=100)
+        self.assertEqual(len(self.g.traverse().filter(n=gt(5)).toList()), 5)
+        self.assertEqual(self.stats()['hits'], 1)
+
+    def testNotCached(self):
+        v0 = self.vs[0]
+        for _ in range(2):
+            self.g.traverse(v0).out().filter(lambda v: v.n > 0).toList()
+            self.g.traverse(v0).aggregate([]).out().toList()
+            Traversal(iter([v0]), graph=self.g).out().toList()
+        self.assertEqual(self.stats()['size'], 0)
+        # only traversals that ran to the end are stored
+        self.g.traverse().out().take(2)
+        self.assertEqual(self.stats()['size'], 0)
+        # explaining always runs it
+        self.g.traverse().out().toList()
+        self.assertEqual(self.g.traverse().out().explain().operators[-1]
+                         .actual, 9)
+        self.assertEqual(self.stats()['hits'], 0)
+
+    def testEviction(self):
+        for v in self.vs[:6]:
+            self.g.traverse(v).out().toList()
+        self.assertEqual(self.stats()['evictions'], 2)
+        self.assertEqual(self.stats()['size'], 4)
+        self.g.traverse(self.vs[5]).out().toList()
+        self.g.traverse(self.vs[0]).out().toList()
+        self.assertEqual(self.stats()['hits'], 1)
+
+    def testTtl(self):
+        self.g.setcache(ResultCache(ttl=-1))
+        for _ in range(2):
+            self.g.traverse(self.vs[0]).out().toList()
+        self.assertEqual(self.g.cache.stats()['expirations'], 1)
+        self.assertEqual(self.g.cache.stats()['hits'], 0)
+
+    def testCompact(self):
+        g = CompactGraph(cache=ResultCache())
+        g.addvertices({'n': i} for i in range(4))
+        g.addedges([(0, 1), (1, 2), (2, 3)])
+        self.assertEqual(g.traverse(g.v(0)).out().out().n.toList(), [2])
+        g.traverse(g.v(0)).out().out().n.toList()
+        self.assertEqual(g.cache.stats()['hits'], 1)
+        g.addedge(1, 3)
+        self.assertEqual(g.traverse(g.v(0)).out().out().n.toList(), [2, 3])
+        g.v(3).label = "last"
+        self.assertEqual(g.traverse(g.v(0)).out().out().label.toList(),
+                         [None, "last"])
+        self.assertEqual(g.cache.stats()['hits'], 1)
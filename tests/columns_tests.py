@@ -0,0 +1,199 @@
+from unittest import TestCase
+
+from pylgrim import Graph
+from pylgrim.columns import Column
+from pylgrim.index import MISSING
+from pylgrim.predicates import gt, gte, lt, regex, within, without
+
+from tests.graphs import people
+
+
+class ColumnTests(TestCase):
+    def testTyped(self):
+        for values, kind in (([1, 2, 3], 'int'), ([1.5, 2.5], 'float'),
+                             ([True, False], 'bool'), (["a", "b"], 'str'),
+                             ([(1,), None], 'object')):
+            c = Column()
+            for i, value in enumerate(values):
+                c.set(i, value)
+            self.assertEqual(c.kind, kind)
+            self.assertEqual([c.get(i) for i in range(len(values))], values)
+
+    def testMissing(self):
+        c = Column()
+        c.set(3, 7)
+        self.assertEqual([c.get(i) for i in range(5)],
+                         [MISSING, MISSING, MISSING, 7, MISSING])
+        c.unset(3)
+        self.assertIs(c.get(3), MISSING)
+
+    def testWiden(self):
+        c = Column()
+        c.set(0, 1)
+        c.set(2, "two")
+        self.assertEqual(c.kind, 'object')
+        self.assertEqual([c.get(0), c.get(1), c.get(2)], [1, MISSING, "two"])
+        c = Column()
+        c.set(0, 1)
+        c.set(1, True)
+        self.assertIs(c.get(1), True)
+        c.set(2, 2 ** 70)
+        self.assertEqual(c.get(2), 2 ** 70)
+
+    def testDictionaryEncoded(self):
+        c = Column()
+        for i, town in enumerate(["Flint", "Clarkston", "Flint", "Flint"]):
+            c.set(i, town)
+        self.assertEqual(c.table, ["Flint", "Clarkston"])
+        self.assertEqual(list(c.values), [0, 1, 0, 0])
+
+    def testMoveAndTruncate(self):
+        c = Column()
+        for i in range(10):
+            c.set(i, i * 10)
+        c.unset(9)
+        c.move(9, 2)
+        c.move(8, 3)
+        c.truncate(8)
+        self.assertEqual([c.get(i) for i in range(10)],
+                         [0, 10, MISSING, 80, 40, 50, 60, 70,
+                          MISSING, MISSING])
+
+    def testMask(self):
+        c = Column()
+        for i, value in enumerate([5, 10, 15]):
+            c.set(i, value)
+        self.assertEqual(c.mask(gt(7), 4), b'\x00\x01\x01\x00')
+        self.assertEqual(c.mask(10, 4), b'\x00\x01\x00\x00')
+        self.assertEqual(c.mask(None, 4), b'\x00\x00\x00\x01')
+        self.assertEqual(c.mask(without(5), 4), b'\x00\x01\x01\x01')
+        self.assertEqual(c.mask(gt("a"), 4), b'\x00\x00\x00\x00')
+
+
+class ColumnarGraphTests(TestCase):
+    def setUp(self):
+        self.plain = people(Graph())
+        self.columnar = people(Graph(columnar=True))
+
+    def assertBoth(self, f, expected):
+        """`f` gives `expected` on both the plain and the columnar graph"""
+        self.assertEqual(f(self.plain), expected)
+        self.assertEqual(f(self.columnar), expected)
+
+    def assertNames(self, expected, **filters):
+        self.assertBoth(lambda g: g.V(**filters).name, expected)
+
+    def testProperties(self):
+        self.assertBoth(lambda g: g.v(2).properties(),
+                        {'name': "Cat", 'age': 41, 'town': None,
+                         'country': "UK", 'score': "high"})
+        self.assertBoth(lambda g: g.v(3).properties(),
+                        {'name': "Dan", 'town': "Clarkston", 'country': "US",
+                         'score': 1})
+        self.assertBoth(lambda g: (g.e(0).weight, g.e(0).properties()),
+                        (1, {'since': 2010}))
+        self.assertBoth(lambda g: (g.e(1).weight, g.e(1).properties()),
+                        (2.5, {}))
+        self.assertEqual(self.columnar.v(0).__dict__, {})
+
+    def testEqualityFilters(self):
+        self.assertNames(["Bob", "Ivy"], age=27)
+        self.assertNames(["Ann", "Eve", "Jo"], town="Flint")
+        self.assertNames(["Cat", "Hal"], score="high")
+        self.assertNames(["Bob", "Ivy"], label=None, age=27)
+
+    def testMissingValues(self):
+        # None matches a property that's None or not there at all
+        self.assertNames(["Cat", "Fay", "Ivy"], town=None)
+        self.assertNames(["Dan", "Eve", "Gus", "Jo"], age=within(19, 30, None))
+        self.assertNames(["Cat", "Dan", "Eve", "Fay", "Gus", "Hal", "Jo"],
+                         age=without(27, 34))
+        self.assertBoth(lambda g: len(g.V(nothing=None)), 10)
+
+    def testPredicates(self):
+        self.assertNames(["Cat", "Fay", "Hal"], age=gt(40))
+        self.assertNames(["Bob", "Dan", "Gus", "Hal"], town=regex("^[CD]"))
+        self.assertNames(["Bob", "Eve"], town=within("Flint", "Detroit"),
+                         age=lt(30))
+        # strings don't compare with numbers, so they never match
+        self.assertNames(["Ann", "Dan"], score=gte(0.5))
+        self.assertNames(["Hal"],
+                         age=lambda age: age is not None and age % 7 == 0)
+
+    def testEdgeFilters(self):
+        self.assertBoth(lambda g: g.E(weight=gt(1)).idx, [1, 5, 8, 12, 15])
+        self.assertBoth(lambda g: g.E(weight=None, since=lt(2010)).idx, [10])
+
+    def testProjections(self):
+        self.assertBoth(lambda g: list(g.V().age),
+                        [34, 27, 41, 19, 52, 30, 63, 27])
+        self.assertBoth(lambda g: list(g.V().score),
+                        [0.9, "high", 1, 0.2, "high"])
+        self.assertBoth(lambda g: list(g.E().weight),
+                        [1, 2.5, None, 1, None, 2.5, 1, None, 2.5, 1, None,
+                         None, 2.5, 1, None, 2.5])
+        self.assertBoth(lambda g: list(g.E().since),
+                        [2010, 2015, 2001, 2019, 2008, 2012])
+
+    def testWrites(self):
+        for g in (self.plain, self.columnar):
+            g.createindex("town")
+            g.v(0).age = "old"
+            g.v(1).town = "Lansing"
+            del g.v(2).age
+            g.e(0).weight = 7
+            g.e(1).weight = None
+            g.e(2).since = 1999
+        self.assertBoth(lambda g: g.v(0).age, "old")
+        self.assertBoth(lambda g: g.v(2).properties(),
+                        {'name': "Cat", 'town': None, 'country': "UK",
+                         'score': "high"})
+        self.assertNames(["Bob"], town="Lansing")
+        self.assertNames(["Bob", "Eve", "Fay", "Gus", "Hal", "Ivy"],
+                         age=gt(10))
+        self.assertBoth(lambda g: list(g.E().weight)[:3], [7, None, None])
+        self.assertBoth(lambda g: list(g.E().since),
+                        [2010, 1999, 2001, 2019, 2008, 2012])
+        self.assertRaises(AttributeError, delattr, self.columnar.v(2), 'age')
+
+    def testBulk(self):
+        g = Graph(columnar=True)
+        g.addvertices([{'name': "a", 'age': 1}, {'name': "b"}, None])
+        g.addedges([(0, 1, 2.5, "x", {'since': 2001}), (1, 2)])
+        self.assertEqual(g.V().name, ["a", "b"])
+        self.assertEqual(g.V(age=None).idx, [1, 2])
+        self.assertEqual(g.E().weight, [2.5, None])
+        self.assertEqual(g.e(0).since, 2001)
+        self.assertEqual(g.shortestpath(0, 2).cost, 3.5)
+
+    def testRemoval(self):
+        for g in (self.plain, self.columnar):
+            g.removevertex(2)
+            g.removeedge(0)
+            g.removevertex(0)
+            g.removeedge(3)
+        # the last vertex (and edge) is moved into each one's place, and its
+        # properties go with it
+        self.assertBoth(lambda g: g.V().name,
+                        ["Ivy", "Bob", "Jo", "Dan", "Eve", "Fay", "Gus",
+                         "Hal"])
+        self.assertBoth(lambda g: list(g.V().score), [1, 0.2, "high"])
+        self.assertBoth(
+            lambda g: [(e.from_.name, e.to.name, e.weight, e.properties())
+                       for e in g.E()],
+            [("Hal", "Dan", None, {}), ("Ivy", "Jo", 2.5, {}),
+             ("Jo", "Ivy", 1, {'since': 2012}), ("Fay", "Eve", 2.5, {}),
+             ("Dan", "Dan", None, {}), ("Gus", "Hal", 1, {}),
+             ("Dan", "Eve", 1, {}), ("Eve", "Fay", None, {'since': 2019})])
+        self.assertNames(["Jo", "Eve"], town="Flint")
+        self.assertNames(["Fay", "Hal"], age=gt(40))
+        self.assertBoth(lambda g: g.E(weight=2.5).idx, [1, 3])
+
+    def testRemovedVertexKeepsProperties(self):
+        g = Graph(columnar=True)
+        v = g.addvertex(name="Fred")
+        g.addvertex(name="Bob")
+        g.removevertex(v)
+        self.assertEqual(v.name, "Fred")
+        self.assertEqual(v.properties(), {'name': "Fred"})
+        self.assertEqual(g.v(0).name, "Bob")
@@ -0,0 +1,143 @@
+import random
+
+from unittest import TestCase
+
+from pylgrim.compact import CSR, CompactGraph, EdgeView, VertexView
+from pylgrim.element import Edge, Vertex
+from pylgrim import Graph
+
+
+class CSRTests(TestCase):
+    def testSlices(self):
+        csr = CSR(4, [0, 2, 0, 1, 2], [1, 0, 3, 2, 3])
+        self.assertEqual(list(csr.offsets), [0, 2, 3, 5, 5])
+        self.assertEqual(list(csr.edgesof(0)), [0, 2])
+        self.assertEqual(list(csr.neighboursof(0)), [1, 3])
+        self.assertEqual(list(csr.edgesof(2)), [1, 4])
+        self.assertEqual(list(csr.neighboursof(3)), [])
+        self.assertEqual(list(csr.neighboursof(10)), [])
+
+
+class CompactGraphTests(TestCase):
+    def setUp(self):
+        self.g = CompactGraph()
+        self.t = self.g.addvertex(name="_t")
+        self.u = self.g.addvertex(name="_u")
+        self.v = self.g.addvertex(name="_v")
+        self.e1 = self.g.addedge(self.t, self.u, weight=4, label="knows")
+        self.e2 = self.g.addedge(self.t, self.v, weight=5, label="likes")
+        self.e3 = self.g.addedge(self.u, self.v, label="knows")
+
+    def testIsAGraph(self):
+        self.assertIsInstance(self.g, Graph)
+
+    def testViews(self):
+        self.assertIsInstance(self.t, VertexView)
+        self.assertIsInstance(self.t, Vertex)
+        self.assertIsInstance(self.e1, EdgeView)
+        self.assertIsInstance(self.e1, Edge)
+
+    def testViewsCompareByIdx(self):
+        self.assertEqual(self.g.v(0), self.t)
+        self.assertEqual(self.g.e(2), self.e3)
+        self.assertNotEqual(self.g.v(1), self.t)
+        self.assertEqual(len(set([self.g.v(0), self.g.v(0), self.t])), 1)
+
+    def testProperties(self):
+        self.assertEqual(self.t.name, "_t")
+        self.assertEqual(self.e1.weight, 4)
+        self.assertEqual(self.e1.label, "knows")
+        self.g.v(1).age = 30
+        self.assertEqual(self.u.age, 30)
+        with self.assertRaises(AttributeError):
+            self.t.age
+
+    def testAdjacency(self):
+        self.assertEqual(self.t.out(), [self.u, self.v])
+        self.assertEqual(self.v.in_(), [self.t, self.u])
+        self.assertEqual(self.t.outE(), [self.e1, self.e2])
+        self.assertEqual(self.v.inE(), [self.e2, self.e3])
+        self.assertEqual(self.u.both(), [self.v, self.t])
+        self.assertEqual(self.e1.inV(), [self.u])
+        self.assertEqual(self.e1.outV(), [self.t])
+
+    def testAdjacencyAfterCompact(self):
+        self.g.compact()
+        self.assertEqual(self.t.out(), [self.u, self.v])
+        self.assertEqual(self.v.inE(), [self.e2, self.e3])
+        e4 = self.t >> self.v
+        self.assertEqual(self.t.outE(), [self.e1, self.e2, e4])
+        self.g.compact()
+        self.assertEqual(self.t.outE(), [self.e1, self.e2, e4])
+
+    def testCompactCoversNewVertices(self):
+        self.g.compact()
+        w = self.g.addvertex(name="_w")
+        self.g.compact()
+        self.assertEqual(len(self.g._store._out), 4)
+        self.assertEqual(w.out(), [])
+        self.assertEqual(self.g._adjacency().out.degree(3), 0)
+        # and a graph that's never had an edge
+        g = CompactGraph()
+        g.addvertices([{}, {}])
+        g.compact()
+        self.assertEqual(len(g._store._in), 2)
+
+    def testFilters(self):
+        self.assertEqual(self.t.out(name="_v"), [self.v])
+        self.assertEqual(self.t.outE(label="likes").inV().name, ["_v"])
+
+    def testEdgeLabelFilters(self):
+        self.assertEqual(self.t.out(label="knows"), [self.u])
+        self.assertEqual(self.v.in_(label="knows"), [self.u])
+        self.assertEqual(self.t.outE(label="likes"), [self.e2])
+        self.assertEqual(self.t.outE(label="hates"), [])
+        self.assertEqual(self.t.out(label=lambda l: l != "likes"), [self.u])
+        self.assertEqual(self.v.inE(label="knows", weight=None), [self.e3])
+
+    def testAddEdgeByIdx(self):
+        e = self.g.addedge(2, 0)
+        self.assertEqual(self.v.out(), [self.t])
+        self.assertEqual(e.from_, self.v)
+
+    def testAddEdgeToMissingVertex(self):
+        with self.assertRaises(IndexError):
+            self.g.addedge(0, 10)
+        with self.assertRaises(ValueError):
+            self.g.addedge(self.t, Vertex())
+
+    def testTraversal(self):
+        self.assertEqual(self.g.traverse().out().name.toList(),
+                         ["_u", "_v", "_v"])
+
+    def testSameAsObjectGraph(self):
+        rng = random.Random(42)
+        g = Graph()
+        c = CompactGraph()
+        for i in range(50):
+            g.addvertex(n=i)
+            c.addvertex(n=i)
+        for i in range(300):
+            s, t = rng.randrange(50), rng.randrange(50)
+            g.addedge(g.v(s), g.v(t))
+            c.addedge(s, t)
+            if i == 150:
+                c.compact()
+
+        for i in range(50):
+            self.assertEqual(c.v(i).out().n, g.v(i).out().n)
+            self.assertEqual(c.v(i).in_().n, g.v(i).in_().n)
+            self.assertEqual(c.v(i).outE().idx, g.v(i).outE().idx)
+            self.assertEqual(c.v(i).degree(), g.v(i).degree())
+
+    def testDegrees(self):
+        self.assertEqual(self.t.outdegree(), 2)
+        self.assertEqual(self.v.indegree(), 2)
+        self.assertEqual(self.u.degree(), 2)
+        self.assertEqual(self.t.outdegree(label="knows"), 1)
+        self.assertEqual(self.v.indegree(label=lambda l: True), 2)
+        self.g.compact()
+        self.g.addedge(self.v, self.t)
+        self.assertEqual(self.t.degree(), 3)
+        self.assertEqual(self.g.degreestats()['histogram'], {3: 2, 2: 1})
+
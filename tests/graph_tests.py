@@ -1,10 +1,13 @@
+import random
 import string
 
 from nose.tools import *
 from unittest import TestCase
 
 from pylgrim.element import Edge, ElementList, Vertex
-from pylgrim import Graph
+from pylgrim import CompactGraph, Graph
+from pylgrim.cache import ResultCache
+from pylgrim.ids import KeyIds, UUIDIds
 
 def ishex(s):
     return all(c in string.hexdigits for c in s)
@@ -422,3 +425,443 @@ class ElementListTests(TestCase):
         self.assertEqual(result1, [obj1, obj3])
         self.assertEqual(result2, [obj3])
 
+
+
+class IndexTests(TestCase):
+    def setUp(self):
+        self.g = Graph()
+        self.fred = self.g.addvertex(name="Fred", age=30)
+        self.bob = self.g.addvertex(name="Bob", age=30)
+        self.sally = self.g.addvertex(name="Sally", age=25)
+        self.e1 = self.g.addedge(self.fred, self.bob, label="knows", since=1)
+        self.e2 = self.g.addedge(self.bob, self.sally, label="likes")
+
+    def testVWithoutIndex(self):
+        self.assertEqual(self.g.V(), [self.fred, self.bob, self.sally])
+        self.assertEqual(self.g.V(age=30), [self.fred, self.bob])
+
+    def testVUsesIndex(self):
+        index = self.g.createindex("name")
+        self.assertEqual(len(index), 3)
+        self.assertEqual(self.g.V(name="Bob"), [self.bob])
+        self.assertEqual(self.g.V(name="Nobody"), [])
+        self.assertEqual(self.g.V().filter(name="Fred"), [self.fred])
+
+    def testIndexWithOtherFilters(self):
+        self.g.createindex("age")
+        self.assertEqual(self.g.V(age=30, name="Bob"), [self.bob])
+        self.assertEqual(self.g.V(age=lambda a: a < 30), [self.sally])
+
+    def testIndexUpdatedOnAddVertex(self):
+        self.g.createindex("name")
+        fred2 = self.g.addvertex(name="Fred")
+        self.assertEqual(self.g.V(name="Fred"), [self.fred, fred2])
+
+    def testIndexUpdatedOnPropertyChange(self):
+        self.g.createindex("name")
+        self.bob.name = "Robert"
+        self.assertEqual(self.g.V(name="Bob"), [])
+        self.assertEqual(self.g.V(name="Robert"), [self.bob])
+        del self.bob.name
+        self.assertEqual(self.g.V(name="Robert"), [])
+        self.sally.name = "Fred"
+        self.assertEqual(self.g.V(name="Fred"), [self.fred, self.sally])
+
+    def testEdgeIndex(self):
+        self.g.createedgeindex("since")
+        self.assertEqual(self.g.E(since=1), [self.e1])
+        self.assertEqual(self.e1.since, 1)
+
+    def testLabelIndex(self):
+        self.g.createlabelindex()
+        self.assertEqual(self.g.E(label="likes"), [self.e2])
+        e3 = self.g.addedge(self.sally, self.fred, label="likes")
+        self.assertEqual(self.g.E(label="likes"), [self.e2, e3])
+        self.e2.label = "loves"
+        self.assertEqual(self.g.E(label="likes"), [e3])
+
+    def testDropIndex(self):
+        self.g.createindex("name")
+        self.g.dropindex("name")
+        self.bob.name = "Robert"
+        self.assertEqual(self.g.V(name="Robert"), [self.bob])
+
+    def testUnhashableValues(self):
+        self.g.createindex("tags")
+        v = self.g.addvertex(tags=["a", "b"])
+        self.assertEqual(self.g.V(tags=["a", "b"]), [v])
+
+    def testCompactGraphIndex(self):
+        g = CompactGraph()
+        fred = g.addvertex(name="Fred")
+        bob = g.addvertex(name="Bob")
+        g.createindex("name")
+        self.assertEqual(g.V(name="Bob"), [bob])
+        bob.name = "Robert"
+        self.assertEqual(g.V(name="Robert"), [bob])
+        e = g.addedge(fred, bob, label="knows")
+        g.createlabelindex()
+        self.assertEqual(g.E(label="knows"), [e])
+
+
+class BulkLoadTests(TestCase):
+    def build(self, graph, bulk):
+        rng = random.Random(7)
+        props = [{'name': "v{0}".format(i)} for i in range(30)]
+        edges = [(rng.randrange(30), rng.randrange(30), rng.random(),
+                  rng.choice(["knows", "likes", None]), {'n': i})
+                 for i in range(200)]
+        if bulk:
+            self.assertEqual(graph.addvertices(props), range(0, 30))
+            self.assertEqual(graph.addedges(edges[:100]), range(0, 100))
+            graph.addedges(edges[100:])
+        else:
+            for p in props:
+                graph.addvertex(**p)
+            for s, t, w, l, p in edges:
+                graph.addedge(graph.v(s), graph.v(t), w, l, **p)
+        return graph
+
+    def assertSameGraph(self, g, h):
+        self.assertEqual(len(g.V()), len(h.V()))
+        self.assertEqual(len(g.E()), len(h.E()))
+        idxs = lambda elements: [x.idx for x in elements]
+        for a, b in zip(g.V(), h.V()):
+            self.assertEqual(a.properties(), b.properties())
+            self.assertEqual(a.idx, b.idx)
+            for step in ('out', 'in_', 'outE', 'inE'):
+                self.assertEqual(idxs(getattr(a, step)()),
+                                 idxs(getattr(b, step)()))
+            for label in ("knows", "likes", None):
+                self.assertEqual(idxs(a.outE(label=label)),
+                                 idxs(b.outE(label=label)))
+                self.assertEqual(idxs(a.in_(label=label)),
+                                 idxs(b.in_(label=label)))
+        for a, b in zip(g.E(), h.E()):
+            self.assertEqual(type(a), type(b))
+            self.assertEqual(a.properties(), b.properties())
+            self.assertEqual((a.idx, a.from_.idx, a.to.idx, a.weight, a.label),
+                             (b.idx, b.from_.idx, b.to.idx, b.weight, b.label))
+
+    def testSameAsAddEdge(self):
+        self.assertSameGraph(self.build(Graph(), False),
+                             self.build(Graph(), True))
+
+    def testCompactSameAsAddEdge(self):
+        self.assertSameGraph(self.build(CompactGraph(), False),
+                             self.build(CompactGraph(), True))
+
+    def testBulkKeepsIndexesUpToDate(self):
+        g = Graph()
+        g.createindex("name")
+        g.createlabelindex()
+        self.build(g, True)
+        self.assertEqual(g.V(name="v3"), [g.v(3)])
+        self.assertEqual(g.E(label="knows"), g.E().filter(label="knows"))
+        g.v(3).name = "three"
+        self.assertEqual(g.V(name="three"), [g.v(3)])
+
+    def testBulkVertexObjects(self):
+        g = Graph()
+        g.addvertices([{'name': "a"}, None])
+        e = g.addedges([(g.v(0), g.v(1))])
+        self.assertEqual(g.v(0).out(), [g.v(1)])
+        self.assertEqual(g.e(e[0]).from_, g.v(0))
+
+    def testBulkCantOverwrite(self):
+        g = Graph()
+        g.addvertices([None, None])
+        with self.assertRaises(AttributeError):
+            g.addedges([(0, 1, None, None, {'to': 5})])
+
+    def testBulkEdgesBeforeAFailure(self):
+        g = Graph()
+        a, b = g.addvertex(), g.addvertex()
+        g.createindex("since")
+        g.setcache(ResultCache())
+        self.assertEqual(g.traverse(a).out().count(), 0)
+        with self.assertRaises(AttributeError):
+            g.addedges([(a, b, 1, None, {'since': 1}),
+                        (a, b, 1, None, {'to': 5})])
+        # the first edge is added, indexed and seen by the cache, and
+        # nothing is left of the second
+        self.assertEqual(len(g.E()), 1)
+        self.assertEqual(g.E(since=1), [g.e(0)])
+        self.assertEqual(a.out(), [b])
+        self.assertEqual(g.traverse(a).out().count(), 1)
+        with self.assertRaises(KeyError):
+            g.edge(1)
+        with self.assertRaises(AttributeError):
+            g.addedges([(a, b), (a, None)])
+        self.assertEqual(len(g.E()), 2)
+        self.assertEqual(a.out(), [b, b])
+        self.assertEqual(g.addedges([(b, a)]), range(2, 3))
+
+    def testBulkVerticesBeforeAFailure(self):
+        g = Graph(ids=KeyIds("name"))
+        g.createindex("name")
+        g.setcache(ResultCache())
+        g.addvertex(name="B")
+        self.assertEqual(g.traverse().count(), 1)
+        with self.assertRaises(ValueError):
+            g.addvertices([{'name': "A"}, {'name': "B"}, {'name': "C"}])
+        self.assertEqual(g.V(name="A"), [g.v(1)])
+        self.assertEqual(g.V().name, ["B", "A"])
+        self.assertEqual(g.traverse().count(), 2)
+
+    def testCompactBulkBadVertex(self):
+        g = CompactGraph()
+        g.addvertices([None, None])
+        with self.assertRaises(IndexError):
+            g.addedges([(0, 1), (0, 5)])
+        self.assertEqual(len(g.E()), 0)
+        self.assertEqual(g.v(0).out(), [])
+
+
+class IdTests(TestCase):
+    def testSequentialIds(self):
+        g = Graph()
+        t = g.addvertex()
+        u = g.addvertex()
+        e = g.addedge(t, u)
+        self.assertEqual((t.id, u.id), (0, 1))
+        self.assertEqual(e.id, 0)
+        self.assertIs(g.vertex(1), u)
+        self.assertIs(g.edge(0), e)
+        with self.assertRaises(KeyError):
+            g.vertex(2)
+
+    def testUUIDIsLazy(self):
+        g = Graph()
+        t = g.addvertex()
+        self.assertIsNone(t._uuid)
+        self.assertTrue(ishex(t.uuid))
+        self.assertEqual(t.uuid, t.uuid)
+
+    def testUUIDIds(self):
+        g = Graph(ids=UUIDIds())
+        t = g.addvertex()
+        self.assertEqual(t.id, t.uuid)
+        self.assertIs(g.vertex(t.uuid), t)
+
+    def testKeyIds(self):
+        g = Graph(ids=KeyIds("email"))
+        t = g.addvertex(email="t@example.com")
+        self.assertEqual(t.id, "t@example.com")
+        self.assertIs(g.vertex("t@example.com"), t)
+        with self.assertRaises(ValueError):
+            g.addvertex(email="t@example.com")
+        with self.assertRaises(ValueError):
+            g.addvertex(name="no email")
+        self.assertEqual(len(g.V()), 1)
+
+    def testBulkIds(self):
+        g = Graph()
+        g.addvertex()
+        r = g.addvertices([None, None])
+        g.addedges([(0, 1), (1, 2)])
+        self.assertEqual([g.v(i).id for i in r], [1, 2])
+        self.assertEqual(g.edge(1).to, g.v(2))
+
+    def testCompactGraphIds(self):
+        g = CompactGraph()
+        t = g.addvertex()
+        self.assertEqual(t.id, 0)
+        self.assertEqual(g.vertex(0), t)
+        with self.assertRaises(KeyError):
+            g.vertex(1)
+
+
+class DegreeStatsTests(TestCase):
+    def build(self, klass):
+        g = klass()
+        g.addvertices([None] * 5)
+        # 0 is a hub with edges to everyone else, 1 -> 2 -> 3
+        g.addedges([(0, 1), (0, 2), (0, 3), (0, 4), (1, 2), (2, 3)])
+        return g
+
+    def testDegreeStats(self):
+        for klass in (Graph, CompactGraph):
+            g = self.build(klass)
+            stats = g.degreestats(k=2)
+            self.assertEqual(stats['histogram'], {4: 1, 2: 2, 3: 1, 1: 1})
+            self.assertEqual(stats['top'], [(g.v(0), 4), (g.v(2), 3)])
+            self.assertEqual(stats['max'], 4)
+            self.assertEqual(stats['mean'], 12 / 5.0)
+
+            stats = g.degreestats("in", k=1)
+            self.assertEqual(stats['histogram'], {0: 1, 1: 2, 2: 2})
+            self.assertEqual(stats['top'], [(g.v(2), 2)])
+            self.assertEqual(g.degreestats("out")['histogram'],
+                             {4: 1, 1: 2, 0: 2})
+
+    def testEmptyGraph(self):
+        stats = Graph().degreestats()
+        self.assertEqual((stats['histogram'], stats['top'], stats['max']),
+                         ({}, [], 0))
+
+    def testNoEdges(self):
+        for klass in (Graph, CompactGraph):
+            g = klass()
+            g.addvertices([None] * 3)
+            for direction in ("out", "in", "both"):
+                stats = g.degreestats(direction)
+                self.assertEqual(stats['histogram'], {0: 3})
+                self.assertEqual(sum(stats['histogram'].values()), 3)
+                self.assertEqual((stats['max'], stats['mean']), (0, 0.0))
+            # and once the adjacency arrays have been built, new vertices
+            # are counted too
+            g.addvertex()
+            self.assertEqual(g.degreestats()['histogram'], {0: 4})
+
+    def testBadDirection(self):
+        with self.assertRaises(ValueError):
+            Graph().degreestats("sideways")
+
+
+
+class RemovalTests(TestCase):
+    def setUp(self):
+        self.g = Graph()
+        self.t = self.g.addvertex(name="_t")
+        self.u = self.g.addvertex(name="_u")
+        self.v = self.g.addvertex(name="_v")
+        self.e1 = self.g.addedge(self.t, self.u, label="knows")
+        self.e2 = self.g.addedge(self.t, self.v, label="likes")
+        self.e3 = self.g.addedge(self.u, self.v, label="knows")
+
+    def check(self, g):
+        """Every edge is exactly where its vertices think it is"""
+        for e in g.E():
+            self.assertIs(g.E()[e.idx], e)
+            self.assertIs(e.from_._outE[e._outpos], e)
+            self.assertIs(e.from_._out[e._outpos], e.to)
+            self.assertIs(e.to._inE[e._inpos], e)
+            self.assertIs(e.to._in_[e._inpos], e.from_)
+            # buckets are only made for edges with more than one label
+            if e.from_._outlabels is None:
+                self.assertEqual(set(f.label for f in e.from_._outE),
+                                 set([e.label]))
+            else:
+                self.assertIs(e.from_._outlabels[e.label][e._outlabelpos], e)
+            if e.to._inlabels is None:
+                self.assertEqual(set(f.label for f in e.to._inE),
+                                 set([e.label]))
+            else:
+                self.assertIs(e.to._inlabels[e.label][e._inlabelpos], e)
+        for v in g.V():
+            self.assertIs(g.V()[v.idx], v)
+            if v._outlabels is not None:
+                self.assertEqual(sum(map(len, v._outlabels.values())),
+                                 v.outdegree())
+
+    def testRemoveEdge(self):
+        self.g.removeedge(self.e1)
+        self.assertEqual(self.t.out(), [self.v])
+        self.assertEqual(self.u.in_(), [])
+        self.assertEqual(self.t.out(label="knows"), [])
+        self.assertEqual(list(self.g.E()), [self.e3, self.e2])
+        self.assertEqual((self.e3.idx, self.e2.idx), (0, 1))
+        self.assertIsNone(self.e1.idx)
+        self.assertNotIn(self.e1, self.g.E())
+        self.check(self.g)
+
+    def testRemoveEdgeByIdx(self):
+        self.g.removeedge(2)
+        self.assertEqual(self.v.in_(), [self.t])
+        self.check(self.g)
+
+    def testIdsAreStable(self):
+        ids = dict((e.id, e) for e in (self.e2, self.e3))
+        self.g.removeedge(self.e1)
+        for id_, e in ids.items():
+            self.assertIs(self.g.edge(id_), e)
+        with self.assertRaises(KeyError):
+            self.g.edge(self.e1.id)
+        v_id = self.v.id
+        self.g.removevertex(self.t)
+        self.assertIs(self.g.vertex(v_id), self.v)
+        self.assertEqual(self.g.addvertex().id, 3)
+
+    def testRemoveVertex(self):
+        loop = self.g.addedge(self.u, self.u)
+        self.g.removevertex(self.u)
+        self.assertEqual(list(self.g.V()), [self.t, self.v])
+        self.assertEqual(list(self.g.E()), [self.e2])
+        self.assertEqual(self.v.in_(), [self.t])
+        self.assertEqual(self.u.degree(), 0)
+        self.assertIsNone(loop.idx)
+        self.check(self.g)
+
+    def testRemovedElementsAreDetached(self):
+        self.g.removevertex(self.v)
+        self.v.name = "changed"
+        with self.assertRaises(ValueError):
+            self.g.removevertex(self.v)
+        with self.assertRaises(ValueError):
+            self.g.removeedge(self.e2)
+        with self.assertRaises(ValueError):
+            Graph().removevertex(self.t)
+
+    def testRelabelAfterRemoval(self):
+        self.g.removeedge(self.e1)
+        self.e2.label = "knows"
+        self.assertEqual(self.t.outE(label="knows"), [self.e2])
+        self.check(self.g)
+
+    def testLabelBucketsMadeOnDemand(self):
+        # u has only "knows" edges out, t has two labels
+        self.assertIsNone(self.u._outlabels)
+        self.assertEqual(sorted(self.t._outlabels), ["knows", "likes"])
+        self.assertEqual(self.u.outE(label="knows"), [self.e3])
+        self.assertEqual(self.u.outdegree(label="likes"), 0)
+        e4 = self.g.addedge(self.u, self.t, label="knows")
+        self.assertIsNone(self.u._outlabels)
+        e4.label = "likes"
+        self.assertEqual(self.u.outE(label="likes"), [e4])
+        self.assertEqual(self.u.outE(label="knows"), [self.e3])
+        self.g.addedges([(self.v.id, self.u.id, None, "hates")])
+        self.assertEqual(self.u.in_(label="hates"), [self.v])
+        self.assertEqual(self.u.indegree(label="knows"), 1)
+        self.check(self.g)
+
+    def testIndexesForgetRemovedElements(self):
+        self.g.createindex("name")
+        self.g.createindex("label", edges=True)
+        self.g.removevertex(self.u)
+        self.assertEqual(self.g.V(name="_u"), [])
+        self.assertEqual(self.g.E(label="knows"), [])
+        self.assertEqual(self.g.V(name="_v"), [self.v])
+
+    def testShortestPathsSeeRemovals(self):
+        self.assertEqual(self.g.shortestpath(self.u, self.v).edges, [self.e3])
+        self.g.removeedge(self.e3)
+        self.assertIsNone(self.g.shortestpath(self.u, self.v))
+        e = self.g.addedge(self.v, self.u)
+        self.assertEqual(self.g.shortestpath(self.v, self.u).edges, [e])
+
+    def testRandomRemovals(self):
+        rng = random.Random(7)
+        g = Graph()
+        g.addvertices({'n': i} for i in range(30))
+        g.addedges((rng.randrange(30), rng.randrange(30), None,
+                    rng.choice("ab")) for i in range(200))
+        for i in range(150):
+            if rng.random() < 0.8 and len(g.E()):
+                g.removeedge(rng.choice(g.E()))
+            elif len(g.V()) > 1:
+                g.removevertex(rng.choice(g.V()))
+            if i % 10 == 0:
+                g.addedge(rng.choice(g.V()), rng.choice(g.V()), label="a")
+            self.check(g)
+        self.assertEqual(sum(v.outdegree() for v in g.V()), len(g.E()))
+
+    def testCompactGraphDoesntSupportRemoval(self):
+        g = CompactGraph()
+        g.addvertex()
+        self.assertFalse(hasattr(g, 'removevertex'))
+        self.assertFalse(hasattr(g, 'removeedge'))
+        self.assertFalse(hasattr(CompactGraph, 'removeedge'))
+        with self.assertRaisesRegex(AttributeError, "removeedge"):
+            g.removeedge(0)
+        self.assertEqual(len(g.V()), 1)
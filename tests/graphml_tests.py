@@ -0,0 +1,106 @@
+import io
+import os
+
+from unittest import TestCase
+
+from pylgrim import CompactGraph, Graph
+
+DATA = os.path.join(os.path.dirname(__file__), "data")
+
+
+class GraphMLTests(TestCase):
+    def testLoad(self):
+        g = Graph.loadgraphml(os.path.join(DATA, "graph.xml"))
+        self.assertEqual(len(g.V()), 6)
+        self.assertEqual(len(g.E()), 5)
+        self.assertEqual(g.v(0).out(), [g.v(1), g.v(3)])
+        self.assertEqual(g.v(2).out(), [g.v(4)])
+
+    def testLoadTypedKeys(self):
+        g = Graph.loadgraphml(os.path.join(DATA, "typed.xml"))
+        fred, bob = g.V()
+        self.assertEqual(fred.name, "Fred")
+        self.assertEqual(fred.age, 30)
+        self.assertIs(fred.admin, True)
+        self.assertEqual(fred.label, "person")
+        self.assertEqual(bob.name, "Bob")
+        self.assertEqual(bob.age, 18)
+        self.assertEqual(bob.label, "person")
+        self.assertFalse(hasattr(bob, "admin"))
+
+        e, = g.E()
+        self.assertEqual(e.weight, 0.5)
+        self.assertEqual(e.label, "knows")
+        self.assertEqual(fred.out(label="knows"), [bob])
+
+    def testLoadCompactGraph(self):
+        g = CompactGraph.loadgraphml(os.path.join(DATA, "typed.xml"))
+        self.assertIsInstance(g, CompactGraph)
+        self.assertEqual(g.v(0).out(label="knows").name, ["Bob"])
+        self.assertEqual(g.v(1).label, "person")
+
+    def testRoundTrip(self):
+        g = Graph()
+        t = g.addvertex(label="person", name="<Fred & co>", age=30)
+        u = g.addvertex(score=1.5, admin=False)
+        v = g.addvertex(score=2)
+        g.addedge(t, u, weight=4, label="knows", since=2001)
+        g.addedge(u, v, label="likes")
+
+        f = io.StringIO()
+        g.savegraphml(f)
+        f.seek(0)
+        h = Graph.loadgraphml(f)
+
+        self.assertEqual(len(h.V()), 3)
+        for a, b in zip(g.V(), h.V()):
+            self.assertEqual(a.properties(), b.properties())
+            self.assertEqual(a.label, b.label)
+        for a, b in zip(g.E(), h.E()):
+            self.assertEqual(a.properties(), b.properties())
+            self.assertEqual((a.from_.idx, a.to.idx, a.weight, a.label),
+                             (b.from_.idx, b.to.idx, b.weight, b.label))
+        self.assertIsInstance(h.v(1).score, float)
+        self.assertIsInstance(h.v(2).score, float)
+        self.assertIs(h.v(1).admin, False)
+
+    def loadstring(self, body):
+        return Graph.loadgraphml(io.StringIO(
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n'
+            + body + '</graphml>\n'))
+
+    def testReservedNames(self):
+        g = self.loadstring(
+            '<key id="d0" for="all" attr.name="id" attr.type="string"/>'
+            '<key id="d1" for="edge" attr.name="to" attr.type="int"/>'
+            '<key id="d2" for="node" attr.name="id_" attr.type="int"/>'
+            '<graph edgedefault="directed">'
+            '<edge source="a" target="b"><data key="d0">ab</data>'
+            '<data key="d1">3</data></edge>'
+            '<node id="a"><data key="d0">first</data></node>'
+            '<node id="b"><data key="d0">second</data>'
+            '<data key="d2">2</data></node>'
+            '</graph>')
+        a, b = g.V()
+        self.assertEqual((a.id, a.id_), (0, "first"))
+        self.assertEqual(b.properties(), {'id_': 2, 'id__': "second"})
+        e, = g.E()
+        self.assertEqual((e.to, e.id_, e.to_), (b, "ab", 3))
+
+    def testEmptyData(self):
+        g = self.loadstring(
+            '<key id="age" for="node" attr.name="age" attr.type="int"/>'
+            '<key id="score" for="node" attr.name="score" attr.type="double">'
+            '<default>1.5</default></key>'
+            '<key id="rank" for="node" attr.name="rank" attr.type="int">'
+            '<default></default></key>'
+            '<key id="name" for="node" attr.name="name"/>'
+            '<graph edgedefault="directed">'
+            '<node id="a"><data key="age"/><data key="score"></data>'
+            '<data key="rank"/><data key="name"/></node>'
+            '<node id="b"><data key="age">7</data></node>'
+            '</graph>')
+        a, b = g.V()
+        self.assertEqual(a.properties(), {'score': 1.5, 'name': ""})
+        self.assertEqual(b.properties(), {'age': 7, 'score': 1.5})
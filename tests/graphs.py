@@ -0,0 +1,50 @@
+"""
+A small graph for tests to share, written out in full so that what a test
+expects of it can be worked out by hand.
+
+    >>> g = people(Graph())
+"""
+
+# some properties are left out, so filters and columns see missing values
+PEOPLE = [
+    {'name': "Ann", 'age': 34, 'town': "Flint", 'country': "US",
+     'score': 0.9},
+    {'name': "Bob", 'age': 27, 'town': "Detroit", 'country': "US"},
+    {'name': "Cat", 'age': 41, 'town': None, 'country': "UK",
+     'score': "high"},
+    {'name': "Dan", 'town': "Clarkston", 'country': "US", 'score': 1},
+    {'name': "Eve", 'age': 19, 'town': "Flint", 'country': "NZ"},
+    {'name': "Fay", 'age': 52, 'country': "UK", 'score': 0.2},
+    {'name': "Gus", 'age': 30, 'town': "Detroit", 'country': "US"},
+    {'name': "Hal", 'age': 63, 'town': "Clarkston", 'country': "NZ",
+     'score': "high"},
+    {'name': "Ivy", 'age': 27, 'country': "US"},
+    {'name': "Jo", 'town': "Flint", 'country': "UK"},
+]
+
+# (from, to, weight, label, properties), by vertex idx
+KNOWS = [
+    (0, 1, 1, "knows", {'since': 2010}),
+    (0, 2, 2.5, "likes", None),
+    (1, 2, None, "knows", {'since': 2015}),
+    (1, 4, 1, "likes", None),
+    (2, 0, None, "knows", None),
+    (2, 7, 2.5, "knows", {'since': 2001}),
+    (3, 4, 1, "knows", None),
+    (4, 5, None, "likes", {'since': 2019}),
+    (5, 4, 2.5, "knows", None),
+    (6, 7, 1, "likes", None),
+    (6, 0, None, "knows", {'since': 2008}),
+    (7, 3, None, "knows", None),
+    (8, 9, 2.5, "likes", None),
+    (9, 8, 1, "knows", {'since': 2012}),
+    (3, 3, None, "likes", None),
+    (0, 1, 2.5, "likes", None),
+]
+
+
+def people(g):
+    """Add PEOPLE and the KNOWS edges between them to `g`, and return it"""
+    g.addvertices(PEOPLE)
+    g.addedges(KNOWS)
+    return g
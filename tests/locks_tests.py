@@ -0,0 +1,165 @@
+import threading
+import time
+
+from unittest import TestCase
+
+from pylgrim import Graph
+from pylgrim.locks import RWLock
+from pylgrim.predicates import Predicate
+
+
+class Recording(Predicate):
+    """Equality with `value`, remembering every value it's tested on"""
+    def __init__(self, value):
+        self.value = value
+        self.tested = []
+
+    def __call__(self, value):
+        self.tested.append(value)
+        return value == self.value
+
+
+class RWLockTests(TestCase):
+    def setUp(self):
+        self.lock = RWLock()
+        self.events = []
+
+    def testReadersShare(self):
+        inside = threading.Barrier(2, timeout=5)
+
+        def read():
+            with self.lock.reading():
+                # only passes if both threads are reading at once
+                inside.wait()
+
+        threads = [threading.Thread(target=read) for _ in range(2)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertFalse(inside.broken)
+
+    def testWriterWaitsForReaders(self):
+        def write():
+            with self.lock.writing():
+                self.events.append("write")
+
+        with self.lock.reading():
+            writer = threading.Thread(target=write)
+            writer.start()
+            time.sleep(0.05)
+            self.events.append("read")
+        writer.join()
+        self.assertEqual(self.events, ["read", "write"])
+
+    def testReentrant(self):
+        with self.lock.writing():
+            with self.lock.writing():
+                with self.lock.reading():
+                    pass
+        with self.lock.reading():
+            with self.lock.reading():
+                self.assertRaises(RuntimeError, self.lock.acquirewrite)
+        # and it's all been let go
+        with self.lock.writing():
+            pass
+
+
+class ConcurrentGraphTests(TestCase):
+    def setUp(self):
+        self.g = Graph(concurrent=True)
+        self.vs = [self.g.addvertex(n=i) for i in range(50)]
+
+    def testSameResults(self):
+        g = Graph()
+        vs = [g.addvertex(n=i) for i in range(50)]
+        for graph, vertices in ((g, vs), (self.g, self.vs)):
+            for i in range(200):
+                graph.addedge(vertices[i % 50], vertices[i * 7 % 50],
+                              label="x" if i % 3 else "y")
+            graph.removevertex(vertices[10])
+        self.assertEqual(self.g.V().n, g.V().n)
+        self.assertEqual(self.vs[0].out(label="x").n, vs[0].out(label="x").n)
+        self.assertEqual(self.g.traverse().out().out().n.toList(),
+                         g.traverse().out().out().n.toList())
+        self.assertEqual(self.g.traverse().both().count(),
+                         g.traverse().both().count())
+
+    def testCopies(self):
+        v, w = self.vs[:2]
+        self.g.addedge(v, w)
+        out = v.out()
+        self.g.addedge(v, v)
+        self.assertEqual(out, [w])
+        V = self.g.V()
+        self.g.addvertex()
+        self.assertEqual(len(V), 50)
+
+    def testCopiesUseIndexes(self):
+        for v in self.vs:
+            v.country = "NZ" if v.n % 5 == 0 else "US"
+        self.g.createindex("country")
+        nz = Recording("NZ")
+
+        V = self.g.V()
+        # answered from the index, which tests None and its two values
+        self.assertEqual(V.filter(country=nz).n, list(range(0, 50, 5)))
+        self.assertEqual(nz.tested, [None, "NZ", "US"])
+        self.assertEqual(self.g.V(country="US").n[:2], [1, 2])
+
+        # once the graph has changed, the copy has to be scanned
+        self.g.addvertex(n=50, country="NZ")
+        del nz.tested[:]
+        self.assertEqual(len(V.filter(country=nz)), 10)
+        self.assertEqual(len(nz.tested), 50)
+        del nz.tested[:]
+        self.assertEqual(len(self.g.V().filter(country=nz)), 11)
+        self.assertEqual(len(nz.tested), 3)
+
+    def testCopiesUseColumns(self):
+        g = Graph(concurrent=True, columnar=True)
+        g.addvertices({'n': i} for i in range(10))
+        V = g.V()
+        self.assertEqual(V.n, list(range(10)))
+        self.assertEqual(V.filter(n=3), [g.v(3)])
+        g.v(3).n = 30
+        self.assertEqual(V.n[3], 30)
+        self.assertEqual(V.filter(n=30), [g.v(3)])
+        self.assertEqual(g.V().filter(n=30), [g.v(3)])
+
+    def testReadersSeeWholeEdges(self):
+        stop = threading.Event()
+        errors = []
+
+        def write():
+            i = 0
+            while not stop.is_set():
+                self.g.addedge(self.vs[i % 50], self.vs[i * 13 % 50])
+                if i % 5 == 4:
+                    self.g.removeedge(self.g.E()[i % 3])
+                i += 1
+
+        def read():
+            while not stop.is_set():
+                with self.g.reading():
+                    outs = sum(v.outdegree() for v in self.g.V())
+                    ins = sum(v.indegree() for v in self.g.V())
+                    if outs != ins or outs != len(self.g.E()):
+                        errors.append((outs, ins))
+                for e in self.vs[0].traverse().outE():
+                    if e not in e.to.inE():
+                        # the edge may have been removed since, but never
+                        # be half linked
+                        if e.to is not None and e._graph is not None:
+                            errors.append(e)
+
+        threads = [threading.Thread(target=write)] + \
+            [threading.Thread(target=read) for _ in range(3)]
+        for t in threads:
+            t.start()
+        time.sleep(0.5)
+        stop.set()
+        for t in threads:
+            t.join()
+        self.assertEqual(errors, [])
+        self.assertGreater(len(self.g.E()), 0)
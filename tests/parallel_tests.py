@@ -0,0 +1,92 @@
+from unittest import TestCase
+
+from pylgrim import CompactGraph, Graph
+from pylgrim.element import ElementList
+from pylgrim.predicates import gt
+from pylgrim.traversal import Traversal
+
+from tests.graphs import people
+
+
+class TraverseManyTests(TestCase):
+    def setUp(self):
+        self.g = people(Graph())
+
+    def assertResults(self, starts, traversal, expected, f=lambda r: r.name):
+        """
+        `traversal` from each of `starts`, in-process and in two workers,
+        gives `expected`, with `f` applied to each start's results
+        """
+        for workers in (1, 2):
+            results = self.g.traversemany(starts, traversal, workers=workers)
+            self.assertEqual([f(result) for result in results], expected)
+
+    def testOut(self):
+        self.assertResults([0, 4, 8], Traversal().out(),
+                           [["Bob", "Cat", "Bob"], ["Fay"], ["Jo"]])
+
+    def testLabels(self):
+        self.assertResults([0, 2],
+                           Traversal().out(label="knows").out(label="knows"),
+                           [["Cat"], ["Bob", "Dan"]])
+
+    def testFilterValues(self):
+        self.assertResults([4, 0],
+                           Traversal().both().filter(age=gt(30))
+                                      .values("name"),
+                           [["Fay", "Fay"], ["Cat", "Cat"]], list)
+
+    def testFolded(self):
+        self.assertResults([7, 3], Traversal().outE().inV().out(),
+                           [["Eve", "Dan"], ["Fay", "Eve", "Dan"]])
+
+    def testSelect(self):
+        self.assertResults(
+            [9, 1], Traversal().as_("a").out().as_("b").select("a", "b"),
+            [[("Jo", "Ivy")], [("Bob", "Cat"), ("Bob", "Eve")]],
+            lambda rows: [(row['a'].name, row['b'].name) for row in rows])
+
+    def testPaths(self):
+        self.assertResults(
+            [6], Traversal().out().out().paths(),
+            [[["Gus", "Hal", "Dan"], ["Gus", "Ann", "Bob"],
+              ["Gus", "Ann", "Cat"], ["Gus", "Ann", "Bob"]]],
+            lambda paths: [path.name for path in paths])
+
+    def testLoop(self):
+        self.assertResults([7, 9], Traversal().loop(depth=3),
+                           [["Dan", "Eve", "Fay"], ["Ivy"]])
+
+    def testResultsAreTheGraphsOwn(self):
+        starts = self.g.V()[::-1]
+        results = self.g.traversemany(starts, Traversal().out(), workers=2)
+        self.assertEqual(len(results), len(starts))
+        for start, result in zip(starts, results):
+            self.assertIsInstance(result, ElementList)
+            self.assertEqual(result, start.out())
+            for v in result:
+                self.assertIs(v, self.g.v(v.idx))
+
+    def testCompactGraph(self):
+        g = people(CompactGraph())
+        traversal = Traversal().out(label="knows").outE()
+        self.assertEqual(
+            [[e.idx for e in r]
+             for r in g.traversemany([5, 0, 5], traversal, workers=2)],
+            [[7], [2, 3], [7]])
+
+    def testUnsaveableProperties(self):
+        # a graph the workers can't be given runs in this process
+        thing = object()
+        self.g.v(1).thing = thing
+        results = self.g.traversemany([0, 2], Traversal().out().thing,
+                                      workers=2)
+        self.assertEqual(results, [[thing, thing], []])
+        self.assertIs(results[0][0], thing)
+
+    def testBadArguments(self):
+        self.assertRaises(ValueError, self.g.traversemany, [0],
+                          Traversal().out().aggregate([]))
+        self.assertRaises(IndexError, self.g.traversemany, [1000],
+                          Traversal().out())
+        self.assertEqual(self.g.traversemany([], Traversal().out()), [])
@@ -0,0 +1,149 @@
+from unittest import TestCase
+
+from pylgrim import CompactGraph, Graph
+from pylgrim.planner import plan
+from pylgrim.predicates import gt, within
+from pylgrim.traversal import PATHSTEPS, Traversal
+
+from tests.graphs import people
+
+
+class PlannerTests(TestCase):
+    def setUp(self):
+        self.g = people(Graph())
+
+    def assertPlanned(self, traversal, expected):
+        """
+        `traversal`, from every vertex, gives the vertices named `expected`
+        on a plain graph, with and without indexes, and on columnar and
+        compact ones
+        """
+        indexed = people(Graph())
+        indexed.createindex("country")
+        indexed.createindex("age")
+        indexed.createlabelindex()
+        compact = people(CompactGraph())
+        compact.createindex("country")
+        for g in (self.g, indexed, people(Graph(columnar=True)), compact):
+            planned = Traversal(None, traversal._steps, g)
+            self.assertEqual(planned.toList().name, expected)
+            planned = Traversal(None, traversal._steps, g)
+            self.assertEqual(planned.count(), len(expected))
+
+    def testFilterAfterStep(self):
+        self.assertPlanned(
+            Traversal().out(label="likes").filter(country="NZ"),
+            ["Eve", "Hal"])
+        self.assertPlanned(
+            Traversal().in_(label="knows").filter(country="NZ"), ["Hal"])
+        self.assertPlanned(
+            Traversal().both().filter(country=within("NZ", "UK")),
+            ["Cat", "Cat", "Cat", "Eve", "Hal", "Eve", "Hal", "Fay", "Fay",
+             "Eve", "Eve", "Hal", "Cat", "Jo", "Jo"])
+
+    def testFilterFirst(self):
+        self.assertPlanned(
+            Traversal().filter(country="NZ").out(label="knows"), ["Dan"])
+        self.assertPlanned(
+            Traversal().filter(country="UK").filter(age=gt(40)).out()
+                       .filter(country="NZ"),
+            ["Hal", "Eve"])
+        self.assertPlanned(
+            Traversal().filter(lambda v: v.idx % 2, country="UK").outE()
+                       .inV(),
+            ["Eve", "Ivy"])
+
+    def testFolded(self):
+        self.assertPlanned(
+            Traversal().outE(label="likes").inV().filter(country="NZ").out(),
+            ["Fay", "Dan"])
+        self.assertPlanned(
+            Traversal().inE().outV().filter(age=27, country="US"),
+            ["Bob", "Bob", "Ivy"])
+
+    def testPathsKeepEdges(self):
+        paths = self.g.traverse().outE().inV().paths().toList()
+        self.assertEqual(len(paths), 16)
+        self.assertTrue(all(len(path) == 3 for path in paths))
+        self.assertEqual([path[1].label for path in paths[:3]],
+                         ["knows", "likes", "likes"])
+
+    def testFold(self):
+        p = plan([], Traversal().outE(label="x").inV().inE().outV()._steps,
+                 pathsteps=PATHSTEPS)
+        self.assertEqual([step[0] for step in p.steps], ['out', 'in_'])
+        self.assertEqual(p.steps[0][2], {'label': "x"})
+        for traversal in (Traversal().outE().inV().paths(),
+                          Traversal().outE(weight=1).inV(),
+                          Traversal().outE().inV(label="x")):
+            p = plan([], traversal._steps, pathsteps=PATHSTEPS)
+            self.assertIn('outE', [step[0] for step in p.steps])
+        p = plan([], Traversal().paths().outE().inV()._steps,
+                 pathsteps=PATHSTEPS)
+        self.assertEqual([step[0] for step in p.steps], ['paths', 'out'])
+
+    def testIndexLookup(self):
+        self.g.createindex("country")
+        t = self.g.traverse().filter(country="NZ", age=gt(40)).out()
+        p = t.explain()
+        source = p.operators[0]
+        self.assertEqual(str(source), "V(age=gt(40), country='NZ')")
+        self.assertEqual(source.note, "index lookup")
+        # only Hal, who knows Dan
+        self.assertEqual(source.actual, 1)
+        self.assertEqual([str(op) for op in p.operators[1:]], ["out()"])
+        self.assertEqual(t.toList().name, ["Dan"])
+
+    def testSemiJoin(self):
+        self.g.createindex("country")
+        self.g.createlabelindex()
+        t = self.g.traverse().out(label="likes").filter(country="NZ")
+        p = t.explain()
+        # only Bob and Gus like anyone from NZ
+        self.assertEqual(p.operators[0].note, "semi-join")
+        self.assertEqual(p.operators[0].actual, 2)
+        self.assertEqual(p.operators[2].note, "semi-join from 2 matches")
+        self.assertEqual(p.operators[2].actual, 2)
+        self.assertEqual(t.toList().name, ["Eve", "Hal"])
+        # from explicit starts, duplicates and all
+        starts = [self.g.v(i) for i in (1, 6, 1, 2)] * 50
+        self.assertEqual(
+            self.g.traverse(*starts).out(label="likes").filter(
+                country="NZ").toList().name,
+            ["Eve", "Hal", "Eve"] * 50)
+
+    def testNoSemiJoinFromFewStarts(self):
+        self.g.createindex("country")
+        p = self.g.v(0).traverse().out().filter(country="US").explain()
+        self.assertIsNone(p.operators[0].note)
+        self.assertEqual(p.operators[-1].actual, 2)
+
+    def testFilterOrder(self):
+        self.g.createindex("country")
+        self.g.createindex("age")
+        # two people are 27, and five are from the US
+        t = self.g.traverse().out().out().filter(country="US", age=27)
+        p = plan(None, t._steps, self.g, PATHSTEPS)
+        self.assertEqual(list(t._steps[2][2]), ['country', 'age'])
+        self.assertEqual(list(p.steps[2][2]), ['age', 'country'])
+        self.assertEqual(t.toList().name, ["Bob", "Bob", "Bob", "Bob", "Ivy"])
+
+    def testExplain(self):
+        t = self.g.traverse().out().out()
+        p = t.explain()
+        self.assertEqual([op.actual for op in p.operators], [10, 16, 26])
+        # sixteen edges between ten vertices
+        self.assertEqual([op.estimate for op in p.operators],
+                         [10, 16, 25.6])
+        lines = repr(p).splitlines()
+        self.assertEqual(lines[0].split(), ["step", "estimated", "actual"])
+        self.assertEqual(lines[3].split(), ["out()", "25.6", "26"])
+        # explaining doesn't use up the traversal
+        self.assertEqual(len(t.toList()), 26)
+
+    def testExplainWithoutGraph(self):
+        p = Traversal([self.g.v(0)]).out().explain()
+        self.assertEqual(p.operators[0].estimate, 1)
+        self.assertIsNone(p.operators[1].estimate)
+        self.assertEqual(p.operators[1].actual, 3)
+        self.assertIn("?", repr(p))
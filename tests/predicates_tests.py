@@ -0,0 +1,91 @@
+import re
+
+from unittest import TestCase
+
+from pylgrim.element import ElementList
+from pylgrim.predicates import gt, gte, lt, lte, regex, within, without
+from pylgrim import CompactGraph, Graph
+
+
+class PredicateTests(TestCase):
+    def testComparisons(self):
+        self.assertTrue(gt(3)(4))
+        self.assertFalse(gt(3)(3))
+        self.assertTrue(gte(3)(3))
+        self.assertTrue(lt(3)(2))
+        self.assertFalse(lte(3)(4))
+
+    def testComparisonsDontMatchNone(self):
+        for predicate in (gt(3), gte(3), lt(3), lte(3)):
+            self.assertFalse(predicate(None))
+        self.assertFalse(gt(3)("a string"))
+
+    def testWithin(self):
+        self.assertTrue(within("a", "b")("a"))
+        self.assertFalse(within("a", "b")("c"))
+        self.assertTrue(within([1], [2])([2]))
+        self.assertTrue(without("a", "b")("c"))
+        self.assertTrue(without("a", "b")(None))
+
+    def testRegex(self):
+        self.assertTrue(regex("^Fr")("Fred"))
+        self.assertFalse(regex("^Fr")("Alfred"))
+        self.assertTrue(regex(re.compile("red$"))("Alfred"))
+        self.assertFalse(regex("1")(1))
+
+
+class FilterTests(TestCase):
+    def setUp(self):
+        self.g = Graph()
+        for name, age, town in [("Paul", 28, "Flint"),
+                                ("Dana", 24, "Clarkston"),
+                                ("Bob", 29, "Flint"),
+                                ("Fred", 31, "Detroit"),
+                                ("Frank", None, "Flint")]:
+            self.g.addvertex(name=name, age=age, town=town)
+
+    def names(self, elements):
+        return [e.name for e in elements]
+
+    def testFilter(self):
+        self.assertEqual(self.names(self.g.V(age=gt(28))),
+                         ["Bob", "Fred"])
+        self.assertEqual(self.names(self.g.V(age=lte(28), town="Flint")),
+                         ["Paul"])
+        self.assertEqual(self.names(self.g.V(name=regex("^Fr"))),
+                         ["Fred", "Frank"])
+        self.assertEqual(self.names(self.g.V(town=without("Flint"))),
+                         ["Dana", "Fred"])
+
+    def testFilterOnDicts(self):
+        rows = ElementList([{'age': 28}, {'age': 31}, {}])
+        self.assertEqual(rows.filter(age=gt(30)), [{'age': 31}])
+        self.assertEqual(rows.filter(age=None), [{}])
+
+    def testIndexedSameAsScan(self):
+        filters = [dict(age=gt(28)), dict(age=within(24, 31)),
+                   dict(town=within("Flint", "Detroit"), age=lt(30)),
+                   dict(name=regex("a")), dict(town=without("Flint")),
+                   dict(age=None), dict(age=lambda a: a is None)]
+        scans = [self.names(self.g.V(**f)) for f in filters]
+        for key in ("age", "town", "name"):
+            self.g.createindex(key)
+        self.assertEqual([self.names(self.g.V(**f)) for f in filters],
+                         scans)
+
+    def testIndexedCompactGraph(self):
+        g = CompactGraph()
+        for age in (40, 10, 30, 20):
+            g.addvertex(age=age)
+        g.createindex("age")
+        self.assertEqual(g.V(age=gt(15)).age, [40, 30, 20])
+        self.assertEqual(g.V(age=within(20, 40)).age, [40, 20])
+
+    def testTraversalFilter(self):
+        t = self.g.vertex(0)
+        for v in self.g.V():
+            if v is not t:
+                self.g.addedge(t, v)
+        result = t.traverse().out().filter(lambda v: v.town != "Detroit",
+                                           age=gte(29)).name.toList()
+        self.assertEqual(result, ["Bob"])
@@ -38,6 +38,22 @@ class ElementTests(TestCase):
         with self.assertRaises(AttributeError):
             Vertex(uuid="if this gets set, baaad!")
 
+    def testElementsCantOverwriteOurMethods(self):
+        with self.assertRaises(AttributeError):
+            Vertex(out="nope")
+        with self.assertRaises(AttributeError):
+            Vertex(idx=5)
+        with self.assertRaises(AttributeError):
+            Edge(Vertex(), Vertex(), inV="nope")
+
+    def testElementPropertiesAreSeparate(self):
+        """User properties are kept apart from our own fields"""
+        t = Vertex(name="_t")
+        t.age = 30
+        self.assertEqual(Vertex().properties(), {})
+        self.assertEqual(t.properties(), {'name': "_t", 'age': 30})
+        self.assertEqual(t.age, 30)
+
 
     def testVertexEdgeTo(self):
         """Connect 2 Vertices with an edge"""
@@ -422,3 +438,92 @@ class ElementListTests(TestCase):
         self.assertEqual(result1, [obj1, obj3])
         self.assertEqual(result2, [obj3])
 
+    def testforwardssteps(self):
+        t, u, v = Vertex(name="_t"), Vertex(name="_u"), Vertex()
+        e1, e2, e3 = t >> u, t >> v, u >> v
+        a = ElementList([t, u, v])
+        self.assertIsInstance(a.out(), ElementList)
+        self.assertEqual(a.out(), [u, v, v])
+        self.assertEqual(a.in_(), [t, t, u])
+        self.assertEqual(a.both(), [u, v, v, t, t, u])
+        self.assertEqual(a.outE().inV(), [u, v, v])
+        self.assertEqual(a.inE().outV(), [t, t, u])
+        self.assertEqual(a.out(name="_u"), [u])
+
+    def testforwardsoverriddensteps(self):
+        class Reversed(Vertex):
+            __slots__ = ()
+
+            def out(self, **kwds):
+                return super(Reversed, self).out(**kwds)[::-1]
+        t = Reversed()
+        u, v = Vertex(), Vertex()
+        t >> u
+        t >> v
+        self.assertEqual(ElementList([t]).out(), [v, u])
+        self.assertEqual(ElementList([u, t]).out(), [v, u])
+
+    def testforwardsproperties(self):
+        t, u, v = Vertex(name="_t"), Vertex(name="_u"), Vertex()
+        a = ElementList([t, u, v])
+        self.assertEqual(a.name, ["_t", "_u"])
+        self.assertEqual(a.label, [None, None, None])
+        self.assertEqual(ElementList([t, t >> u]).out(), [u])
+        self.assertEqual(ElementList([]).out(), [])
+
+
+
+class LabelTests(TestCase):
+    def setUp(self):
+        self.t = Vertex(name="_t")
+        self.u = Vertex(name="_u")
+        self.v = Vertex(name="_v")
+        self.w = Vertex(name="_w")
+        self.e1 = self.t.edgeto(self.u, label="knows")
+        self.e2 = self.t.edgeto(self.v, label="likes")
+        self.e3 = self.t.edgeto(self.w, label="knows")
+        self.e4 = self.u.edgeto(self.t)
+
+    def testOutByEdgeLabel(self):
+        """`label` filters on the label of the edge, not the vertex"""
+        self.assertEqual(self.t.out(label="knows"), [self.u, self.w])
+        self.assertEqual(self.t.out(label="likes"), [self.v])
+        self.assertEqual(self.t.out(label="hates"), [])
+        self.assertEqual(self.u.out(label=None), [self.t])
+
+    def testOutEByEdgeLabel(self):
+        self.assertEqual(self.t.outE(label="knows"), [self.e1, self.e3])
+        self.assertEqual(self.u.inE(label="knows"), [self.e1])
+        self.assertEqual(self.w.in_(label="knows"), [self.t])
+        self.assertEqual(self.v.in_(label="knows"), [])
+
+    def testMixedFilters(self):
+        self.assertEqual(self.t.out(label="knows", name="_w"), [self.w])
+        self.assertEqual(self.t.out(label=lambda l: l != "likes"),
+                         [self.u, self.w])
+        self.assertEqual(self.t.both(label="knows"), [self.u, self.w])
+
+    def testRelabel(self):
+        self.e2.label = "knows"
+        self.assertEqual(self.t.outE(label="knows"),
+                         [self.e1, self.e3, self.e2])
+        self.assertEqual(self.t.outE(label="likes"), [])
+        self.assertEqual(self.v.inE(label="knows"), [self.e2])
+        self.assertEqual(self.t.outE(), [self.e1, self.e2, self.e3])
+
+    def testDegrees(self):
+        self.assertEqual(self.t.outdegree(), 3)
+        self.assertEqual(self.t.indegree(), 1)
+        self.assertEqual(self.t.degree(), 4)
+        self.assertEqual(self.v.outdegree(), 0)
+        self.assertEqual(Vertex().degree(), 0)
+
+    def testDegreesByLabel(self):
+        self.assertEqual(self.t.outdegree(label="knows"), 2)
+        self.assertEqual(self.t.outdegree(label="hates"), 0)
+        self.assertEqual(self.t.degree(label=None), 1)
+        self.assertEqual(self.t.outdegree(label=lambda l: l != "knows"), 1)
+        self.assertEqual(self.u.indegree(label="knows"), 1)
+        self.e2.label = "knows"
+        self.assertEqual(self.t.outdegree(label="knows"), 3)
+
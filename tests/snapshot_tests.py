@@ -0,0 +1,170 @@
+import os
+import shutil
+import tempfile
+
+from unittest import TestCase
+
+from pylgrim import CompactGraph, Graph
+from pylgrim.ids import KeyIds, SequentialIds, UUIDIds
+
+
+def contents(g):
+    vertices = [(v.idx, v.id, v.obj, v.label, v.properties()) for v in g.V()]
+    edges = [(e.idx, e.id, e.from_.idx, e.to.idx, e.weight, e.label,
+              e.properties()) for e in g.E()]
+    return vertices, edges
+
+
+class SnapshotTests(TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "graph.snap")
+
+        g = self.g = Graph()
+        t = g.addvertex(label="person", name="Fred", age=30, admin=True)
+        u = g.addvertex(obj=[1, 2], label="person", name="Bob", age=18)
+        v = g.addvertex(name="Bob", score=1.5, tags={"x": [1, 2]})
+        w = g.addvertex(nothing=None)
+        g.addedge(t, u, 4, "knows", since=2001)
+        g.addedge(u, v, 0.5, "likes")
+        g.addedge(t, v, label="knows")
+        g.addedge(v, w)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def testRoundTrip(self):
+        self.g.save(self.path)
+        for klass in (Graph, CompactGraph):
+            for mmap in (True, False):
+                h = klass.open(self.path, mmap=mmap)
+                self.assertEqual(contents(h), contents(self.g))
+
+    def testOpenTypes(self):
+        self.g.save(self.path)
+        self.assertIsInstance(Graph.open(self.path, mmap=True), CompactGraph)
+        self.assertIsInstance(CompactGraph.open(self.path), CompactGraph)
+        self.assertIsInstance(CompactGraph.open(self.path, mmap=False),
+                              CompactGraph)
+        h = Graph.open(self.path)
+        self.assertIs(type(h), Graph)
+        self.assertIsInstance(h._ids, SequentialIds)
+        self.assertEqual(h.addvertex().id, 4)
+        # which can be removed from, unlike a mapped one
+        h.removevertex(h.v(1))
+        self.assertEqual(len(h.E()), 2)
+        self.assertFalse(hasattr(Graph.open(self.path, mmap=True),
+                                 'removevertex'))
+
+    def testAdjacency(self):
+        self.g.save(self.path)
+        h = Graph.open(self.path, mmap=True)
+        self.assertEqual(h.v(0).out().idx, [1, 2])
+        self.assertEqual(h.v(2).in_().idx, [1, 0])
+        self.assertEqual(h.v(0).out(label="knows").name, ["Bob", "Bob"])
+        self.assertEqual(h.v(1).outE().label, ["likes"])
+        self.assertEqual(h.v(2).degree(), 3)
+        self.assertEqual(h.shortestpath(0, 3).cost, 2)
+
+    def testCompactGraph(self):
+        g = CompactGraph()
+        g.addvertices({'name': str(i)} for i in range(4))
+        g.addedges([(0, 1, 1.5), (1, 2, 2.5, "x"), (2, 3)])
+        g.save(self.path)
+        h = Graph.open(self.path, mmap=False)
+        self.assertEqual(contents(h), contents(g))
+
+    def testCompactGraphVerticesAfterBuilding(self):
+        g = CompactGraph()
+        g.addvertices({'n': i} for i in range(2))
+        g.addedge(0, 1)
+        g.compact()
+        g.addvertex(n=2)
+        g.save(self.path)
+        for mmap in (True, False):
+            h = Graph.open(self.path, mmap=mmap)
+            self.assertEqual(h.V().n, [0, 1, 2])
+            self.assertEqual(h.v(2).out(), [])
+            self.assertEqual(h.v(0).out().n, [1])
+
+    def testEdgelessCompactGraph(self):
+        g = CompactGraph()
+        g.addvertices({'n': i} for i in range(3))
+        g.save(self.path)
+        for mmap in (True, False):
+            h = Graph.open(self.path, mmap=mmap)
+            self.assertEqual(h.V().n, [0, 1, 2])
+            self.assertEqual(len(h.E()), 0)
+
+    def testChangesAfterOpening(self):
+        self.g.save(self.path)
+        h = Graph.open(self.path, mmap=True)
+        before = open(self.path, 'rb').read()
+
+        h.v(0).name = "Frederick"
+        h.v(3).label = "thing"
+        x = h.addvertex(name="X")
+        e = h.addedge(x, h.v(0), 2, "knows")
+        self.assertEqual(h.v(0).name, "Frederick")
+        self.assertEqual(h.v(3).label, "thing")
+        self.assertEqual(x.idx, 4)
+        self.assertEqual(e.idx, 4)
+        self.assertEqual(h.v(0).in_(), [x])
+        self.assertEqual(h.v(4).out(label="knows").name, ["Frederick"])
+        self.assertEqual(h.V(name="Frederick"), [h.v(0)])
+
+        # the snapshot itself is left alone, and saving again has it all
+        self.assertEqual(open(self.path, 'rb').read(), before)
+        h.save(self.path)
+        self.assertEqual(contents(Graph.open(self.path)), contents(h))
+
+    def testIdsAfterRemoval(self):
+        g = Graph()
+        vs = [g.addvertex(n=i) for i in range(5)]
+        for a, b in zip(vs, vs[1:]):
+            g.addedge(a, b)
+        g.removevertex(vs[1])
+        g.save(self.path)
+
+        for mmap in (True, False):
+            h = Graph.open(self.path, mmap=mmap)
+            self.assertEqual(contents(h), contents(g))
+            self.assertEqual(h.vertex(4).n, 4)
+            self.assertEqual(h.edge(3).idx, 1)
+            self.assertRaises(KeyError, h.vertex, 1)
+            self.assertEqual(h.addvertex().id, 5)
+
+    def testIdStrategies(self):
+        g = Graph(ids=UUIDIds())
+        v = g.addvertex()
+        g.save(self.path)
+        h = Graph.open(self.path, mmap=False)
+        self.assertIsInstance(h._ids, UUIDIds)
+        self.assertEqual(h.v(0).id, v.id)
+        self.assertEqual(h.v(0).uuid, v.uuid)
+
+        g = Graph(ids=KeyIds("email"))
+        g.addvertex(email="fred@example.com")
+        g.save(self.path)
+        h = Graph.open(self.path, mmap=False)
+        self.assertEqual(h.vertex("fred@example.com").idx, 0)
+        self.assertRaises(ValueError, h.addvertex, email="fred@example.com")
+        self.assertEqual(Graph.open(self.path).vertex("fred@example.com").idx,
+                         0)
+
+    def testEmpty(self):
+        Graph().save(self.path)
+        h = Graph.open(self.path)
+        self.assertEqual(len(h.V()), 0)
+        self.assertEqual(len(h.E()), 0)
+
+    def testUnsaveable(self):
+        g = Graph()
+        g.addvertex(thing=object())
+        self.assertRaises(TypeError, g.save, self.path)
+        self.assertEqual(os.listdir(self.dir), [])
+
+    def testNotASnapshot(self):
+        with open(self.path, 'w') as f:
+            f.write("<graphml/>")
+        self.assertRaises(ValueError, Graph.open, self.path)
@@ -0,0 +1,172 @@
+import asyncio
+import os
+import random
+import shutil
+import tempfile
+
+from unittest import TestCase
+
+from pylgrim import Graph
+from pylgrim.element import ALL, ElementList
+from pylgrim.predicates import gt, within
+from pylgrim.storage import MemoryStorage, SQLiteStorage, StoredVertex
+
+
+class CountingStorage(MemoryStorage):
+    """A MemoryStorage that counts the calls made to it"""
+    def __init__(self, graph):
+        super(CountingStorage, self).__init__(graph)
+        self.calls = []
+
+    async def adjacent(self, ids, step, label=ALL):
+        self.calls.append(('adjacent', len(ids)))
+        await asyncio.sleep(0)
+        return await super(CountingStorage, self).adjacent(ids, step, label)
+
+    async def vertices(self, ids):
+        self.calls.append(('vertices', len(ids)))
+        await asyncio.sleep(0)
+        return await super(CountingStorage, self).vertices(ids)
+
+
+class StorageTests(TestCase):
+    def setUp(self):
+        rng = random.Random(0)
+        self.g = Graph()
+        self.g.addvertices({'n': i, 'country': rng.choice(["NZ", "US", "UK"])}
+                           for i in range(60))
+        self.g.addedges((rng.randrange(60), rng.randrange(60), None,
+                         rng.choice(["knows", "likes", None]))
+                        for i in range(240))
+        self.tmp = tempfile.mkdtemp()
+        self.sqlite = SQLiteStorage(os.path.join(self.tmp, "graph.db"))
+        self.sqlite.write(self.g)
+
+    def tearDown(self):
+        self.sqlite.close()
+        shutil.rmtree(self.tmp)
+
+    def assertSameResults(self, storage):
+        V = self.g.V()
+        starts = [V[0], V[7], V[7], V[30]]
+        ids = [v.id for v in starts]
+        cases = [
+            (storage.traverse(*ids).out(),
+             ElementList(starts).out()),
+            (storage.traverse(*ids).out(label="knows").in_(),
+             ElementList(starts).out(label="knows").in_()),
+            (storage.traverse(*ids).both(label=None).filter(country="NZ"),
+             ElementList(starts).both(label=None).filter(country="NZ")),
+            (storage.traverse(*ids).out(label=within("knows", "likes"),
+                                        n=gt(20)).out(),
+             ElementList(starts).out(label=within("knows", "likes"),
+                                     n=gt(20)).out()),
+        ]
+        for traversal, expected in cases:
+            self.assertEqual(asyncio.run(traversal.ids()),
+                             [v.id for v in expected])
+            vertices = asyncio.run(traversal.toList())
+            self.assertEqual([v.n for v in vertices], [v.n for v in expected])
+            self.assertEqual(asyncio.run(traversal.count()), len(expected))
+        self.assertEqual(
+            asyncio.run(storage.traverse(*ids).out().values('n').toList()),
+            [v.n for v in ElementList(starts).out()])
+
+    def testMemory(self):
+        self.assertSameResults(MemoryStorage(self.g))
+
+    def testSQLite(self):
+        self.assertSameResults(self.sqlite)
+
+    def testSync(self):
+        v = self.sqlite.vertex(7)
+        self.assertIsInstance(v, StoredVertex)
+        expected = self.g.vertex(7)
+        self.assertEqual((v.n, v.country), (expected.n, expected.country))
+        self.assertEqual(v.out(label="knows").n,
+                         expected.out(label="knows").n)
+        self.assertEqual(v.both(country="NZ").n, expected.both(country="NZ").n)
+        self.assertEqual((v.outdegree(), v.indegree(label=None)),
+                         (expected.outdegree(), expected.indegree(label=None)))
+        self.assertEqual(v.traverse().out().in_(label="likes").n.toList(),
+                         expected.traverse().out().in_(label="likes").n
+                         .toList())
+        self.assertIs(MemoryStorage(self.g).vertex(7), expected)
+
+    def testSyncEdges(self):
+        fields = lambda edges: [(e.id, e.from_.id, e.to.id, e.label, e.weight)
+                                for e in edges]
+        for i in (0, 7, 30):
+            v, expected = self.sqlite.vertex(i), self.g.vertex(i)
+            for step in ('outE', 'inE', 'bothE'):
+                self.assertEqual(fields(getattr(v, step)()),
+                                 fields(getattr(expected, step)()))
+                self.assertEqual(
+                    fields(getattr(v, step)(label=within("knows", None))),
+                    fields(getattr(expected, step)(
+                        label=within("knows", None))))
+            self.assertEqual([e.to.country for e in v.outE(label="likes")],
+                             [e.to.country
+                              for e in expected.outE(label="likes")])
+
+    def testObjAndEdgeProperties(self):
+        g = Graph()
+        a = g.addvertex({'x': [1, 2]}, "thing", name="a")
+        b = g.addvertex("b")
+        g.addedge(a, b, 2.5, "knows", since=2001)
+        g.addedge(b, b)
+        storage = SQLiteStorage(os.path.join(self.tmp, "objs.db"))
+        try:
+            storage.write(g)
+            v, w = storage.vertex(a.id), storage.vertex(b.id)
+            self.assertEqual((v.obj, v.label, v.name),
+                             ({'x': [1, 2]}, "thing", "a"))
+            self.assertEqual(w.obj, "b")
+            e, = v.outE()
+            self.assertEqual((e.weight, e.label, e.since, e.to.obj),
+                             (2.5, "knows", 2001, "b"))
+            # a loop is one edge, reached both ways
+            loops = w.bothE(label=None)
+            self.assertEqual(len(loops), 2)
+            self.assertIs(loops[0], loops[1])
+        finally:
+            storage.close()
+
+    def testSyncInsideALoop(self):
+        async def read():
+            v = self.sqlite.vertex(7)
+            return v.out().n, [e.to.n for e in v.outE()]
+
+        expected = self.g.vertex(7)
+        self.assertEqual(asyncio.run(read()),
+                         (expected.out().n, [e.to.n for e in expected.outE()]))
+
+    def testBatchedPerHop(self):
+        storage = CountingStorage(self.g)
+        ids = [v.id for v in self.g.V()[:10]]
+        t = storage.traverse(*ids).out().out().filter(country="NZ").out()
+        asyncio.run(t.count())
+        self.assertEqual([call for call, n in storage.calls],
+                         ['adjacent', 'adjacent', 'vertices', 'adjacent'])
+        # each distinct vertex of the frontier is asked for once
+        frontier = asyncio.run(storage.traverse(*ids).out().ids())
+        self.assertEqual(storage.calls[1][1], len(set(frontier)))
+
+    def testConcurrentTraversals(self):
+        storage = CountingStorage(self.g)
+
+        async def both():
+            return await asyncio.gather(
+                storage.traverse(0).out().out().ids(),
+                storage.traverse(1).in_().in_().ids())
+
+        first, second = asyncio.run(both())
+        # the two traversals took turns waiting on the store
+        self.assertEqual([n for call, n in storage.calls][:2], [1, 1])
+        self.assertEqual(first, [v.id for v in self.g.vertex(0).out().out()])
+        self.assertEqual(second,
+                         [v.id for v in self.g.vertex(1).in_().in_()])
+
+    def testValuesLast(self):
+        self.assertRaises(ValueError,
+                          MemoryStorage(self.g).traverse(0).values('n').out)
@@ -0,0 +1,392 @@
+from unittest import TestCase
+
+from pylgrim import hooks
+from pylgrim.element import ElementList, Vertex
+from pylgrim.traversal import PathNode, Traversal
+from pylgrim import CompactGraph, Graph
+
+
+class CountingVertex(Vertex):
+    """A Vertex that counts how many times it gets expanded"""
+    expanded = 0
+
+    def out(self, **kwds):
+        CountingVertex.expanded += 1
+        return super(CountingVertex, self).out(**kwds)
+
+
+class TraversalTests(TestCase):
+    def setUp(self):
+        self.g = Graph()
+        self.t = self.g.addvertex(name="_t")
+        self.u = self.g.addvertex(name="_u")
+        self.v = self.g.addvertex(name="_v")
+        self.w = self.g.addvertex(name="_w")
+        self.g.addedge(self.t, self.u, label="knows")
+        self.g.addedge(self.t, self.v, label="likes")
+        self.g.addedge(self.u, self.w, label="knows")
+        self.g.addedge(self.v, self.w, label="knows")
+
+    def testTraverseFromVertex(self):
+        """Vertex().traverse() starts at that vertex"""
+        self.assertIsInstance(self.t.traverse(), Traversal)
+        self.assertEqual(self.t.traverse().toList(), [self.t])
+
+    def testTraverseFromGraph(self):
+        """Graph().traverse() starts at every vertex in the graph"""
+        result = self.g.traverse().toList()
+        self.assertEqual(result, [self.t, self.u, self.v, self.w])
+
+    def testTraverseFromGraphWithStarts(self):
+        result = self.g.traverse(self.u, self.v).out().toList()
+        self.assertEqual(result, [self.w, self.w])
+
+    def testSameResultsAsElementList(self):
+        """Traversals give the same results as the eager ElementList chain"""
+        self.assertEqual(self.t.traverse().out().out().toList(),
+                         self.t.out().out())
+        self.assertEqual(self.t.traverse().outE().inV().toList(),
+                         self.t.outE().inV())
+        self.assertEqual(self.w.traverse().in_().in_().toList(),
+                         self.w.in_().in_())
+        self.assertEqual(self.u.traverse().bothE().outV().toList(),
+                         self.u.bothE().outV())
+
+    def testToListReturnsElementList(self):
+        self.assertIsInstance(self.t.traverse().out().toList(), ElementList)
+
+    def testStepFilters(self):
+        result = self.t.traverse().out(label="knows").toList()
+        self.assertEqual(result, [self.u])
+        result = self.t.traverse().outE(label="knows").inV().toList()
+        self.assertEqual(result, [self.u])
+
+    def testFilterStep(self):
+        result = self.t.traverse().out().filter(name="_v").toList()
+        self.assertEqual(result, [self.v])
+        result = self.t.traverse().out().filter(
+            lambda e: e.name != "_v").toList()
+        self.assertEqual(result, [self.u])
+
+    def testPropertyProjection(self):
+        self.assertEqual(self.t.traverse().out().name.toList(), ["_u", "_v"])
+        self.assertEqual(self.t.traverse().out().values("name").toList(),
+                         ["_u", "_v"])
+
+    def testNext(self):
+        traversal = self.t.traverse().out()
+        self.assertEqual(traversal.next(), self.u)
+        self.assertEqual(traversal.next(), self.v)
+        with self.assertRaises(StopIteration):
+            traversal.next()
+
+    def testTakeContinues(self):
+        traversal = self.g.traverse()
+        self.assertEqual(traversal.take(3), [self.t, self.u, self.v])
+        self.assertEqual(traversal.take(3), [self.w])
+        self.assertEqual(traversal.toList(), [])
+
+    def testTraversalsAreReusable(self):
+        friends = self.t.traverse().out()
+        self.assertEqual(friends.name.toList(), ["_u", "_v"])
+        self.assertEqual(friends.out().toList(), [self.w, self.w])
+
+    def testTakeShortCircuits(self):
+        """take(n) stops expanding once it has enough results"""
+        hub = CountingVertex()
+        for i in range(100):
+            spoke = CountingVertex()
+            hub >> spoke
+            spoke >> CountingVertex()
+
+        CountingVertex.expanded = 0
+        result = hub.traverse().out().out().take(2)
+
+        self.assertEqual(len(result), 2)
+        self.assertEqual(CountingVertex.expanded, 3)
+
+    def testAnonymousTraversalNeedsStarts(self):
+        with self.assertRaises(ValueError):
+            Traversal().out().toList()
+
+
+class LoopTests(TestCase):
+    def setUp(self):
+        # a -> b -> d -> e, a -> c -> d, with a cycle e -> a
+        self.g = Graph()
+        for name in "abcde":
+            setattr(self, name, self.g.addvertex(name=name))
+        for from_, to in ["ab", "ac", "bd", "cd", "de", "ea"]:
+            self.g.addedge(getattr(self, from_), getattr(self, to),
+                           label="ok" if to != "c" else "no")
+
+    def names(self, traversal):
+        return "".join(traversal.name.toList())
+
+    def testBreadthFirst(self):
+        self.assertEqual(self.names(self.a.traverse().loop()), "bcde")
+        self.assertEqual(self.names(self.a.traverse().loop(depth=2)), "bcd")
+        self.assertEqual(self.names(self.e.traverse().loop('in_')), "dbca")
+        self.assertEqual(self.names(self.d.traverse().loop('both', depth=1)),
+                         "ebc")
+
+    def testDeduplicates(self):
+        self.assertEqual(self.a.traverse().out().out().toList(),
+                         [self.d, self.d])
+        self.assertEqual(self.names(self.a.traverse().loop(depth=2)), "bcd")
+
+    def testDepthFirst(self):
+        self.assertEqual(self.names(self.a.traverse().loop(order='dfs')),
+                         "bdec")
+        self.assertEqual(
+            self.names(self.a.traverse().loop(order='dfs', depth=2)), "bdc")
+
+    def testDepthFirstReexpandsShallowerVertices(self):
+        # a -> b -> c -> d, and a -> c: with depth 2, d is only in reach
+        # through the shorter path to c, which DFS finds second
+        g = Graph()
+        a, b, c, d = [g.addvertex(name=n) for n in "abcd"]
+        g.addedge(a, b)
+        g.addedge(b, c)
+        g.addedge(c, d)
+        g.addedge(a, c)
+        result = a.traverse().loop(order='dfs', depth=2)
+        self.assertEqual(self.names(result), "bcd")
+
+    def testEmitAndFilters(self):
+        result = self.a.traverse().loop(emit=lambda v: v.name in "ce")
+        self.assertEqual(self.names(result), "ce")
+        result = self.a.traverse().loop(label="ok")
+        self.assertEqual(self.names(result), "bde")
+
+    def testEachStartSearchedSeparately(self):
+        result = self.g.traverse(self.a, self.d).loop(depth=1)
+        self.assertEqual(self.names(result), "bce")
+
+    def testBadArguments(self):
+        with self.assertRaises(ValueError):
+            self.a.traverse().loop('outE')
+        with self.assertRaises(ValueError):
+            self.a.traverse().loop(order='sideways')
+
+
+class PathTests(TestCase):
+    def setUp(self):
+        self.g = Graph()
+        self.t = self.g.addvertex(name="_t")
+        self.u = self.g.addvertex(name="_u")
+        self.v = self.g.addvertex(name="_v")
+        self.w = self.g.addvertex(name="_w")
+        self.g.addedge(self.t, self.u)
+        self.g.addedge(self.t, self.v)
+        self.g.addedge(self.u, self.w)
+        self.g.addedge(self.v, self.w)
+        self.g.addedge(self.w, self.t)
+
+    def testPaths(self):
+        result = self.t.traverse().out().out().paths().toList()
+        self.assertEqual(result, [[self.t, self.u, self.w],
+                                  [self.t, self.v, self.w]])
+        self.assertIsInstance(result[0], ElementList)
+
+    def testPathsWithClosures(self):
+        result = self.t.traverse().out().paths(lambda v: v.name).toList()
+        self.assertEqual(result, [["_t", "_u"], ["_t", "_v"]])
+        result = self.t.traverse().outE().inV().paths(
+            lambda v: v.name, lambda e: "->").toList()
+        self.assertEqual(result, [["_t", "->", "_u"], ["_t", "->", "_v"]])
+
+    def testFiltersDontExtendPaths(self):
+        result = self.t.traverse().out().filter(name="_v").paths().toList()
+        self.assertEqual(result, [[self.t, self.v]])
+
+    def testBack(self):
+        result = self.t.traverse().out().out().back(1).toList()
+        self.assertEqual(result, [self.u, self.v])
+        result = self.t.traverse().as_('x').out().out().back('x').toList()
+        self.assertEqual(result, [self.t, self.t])
+        result = self.t.traverse().out().as_('f').out().filter(
+            name="_w").back('f').name.toList()
+        self.assertEqual(result, ["_u", "_v"])
+
+    def testSelect(self):
+        result = self.t.traverse().as_('a').out().as_('b').out().select(
+            'a', 'b').toList()
+        self.assertEqual(result, [{'a': self.t, 'b': self.u},
+                                  {'a': self.t, 'b': self.v}])
+        result = self.t.traverse().as_('a').out().as_('b').select().toList()
+        self.assertEqual(result, [{'a': self.t, 'b': self.u},
+                                  {'a': self.t, 'b': self.v}])
+
+    def testUniquePath(self):
+        result = self.t.traverse().out().out().out().uniquePath().toList()
+        self.assertEqual(result, [])
+        result = self.u.traverse().out().out().out().uniquePath().toList()
+        self.assertEqual(result, [self.v])
+
+    def testStepsAfterPathStepsRunUntracked(self):
+        result = self.t.traverse().as_('x').out().back('x').out().name
+        self.assertEqual(result.toList(), ["_u", "_v", "_u", "_v"])
+
+    def testPathsSharePrefixes(self):
+        root = PathNode(self.t)
+        a, b = PathNode(self.u, root), PathNode(self.v, root)
+        self.assertIs(a.parent, b.parent)
+        self.assertEqual(a.path(), [self.t, self.u])
+        self.assertEqual(b.path(), [self.t, self.v])
+
+
+class ReductionTests(TestCase):
+    def setUp(self):
+        self.g = Graph()
+        self.t = self.g.addvertex(name="_t", age=30, town="Flint")
+        self.u = self.g.addvertex(name="_u", age=20, town="Flint")
+        self.v = self.g.addvertex(name="_v", age=40, town="Detroit")
+        self.g.addedge(self.t, self.u)
+        self.g.addedge(self.t, self.v)
+        self.g.addedge(self.u, self.v)
+        self.g.addedge(self.v, self.t)
+
+    def testCount(self):
+        self.assertEqual(self.g.traverse().count(), 3)
+        self.assertEqual(self.g.traverse().out().count(), 4)
+        self.assertEqual(self.g.traverse().out().out().count(), 5)
+        self.assertEqual(self.g.traverse().bothE().count(), 8)
+        self.assertEqual(self.g.traverse().outE().inV().count(), 4)
+        self.assertEqual(self.t.traverse().out(name="_v").count(), 1)
+        self.assertEqual(self.t.traverse().out().filter(age=20).count(), 1)
+
+    def testCountFromDegrees(self):
+        counting = CountingVertex()
+        counting >> Vertex()
+        counting >> Vertex()
+        self.assertEqual(counting.traverse().out().count(), 2)
+        # overridden steps are still called
+        CountingVertex.expanded = 0
+        self.assertEqual(counting.traverse().out().count(), 2)
+        self.assertEqual(CountingVertex.expanded, 1)
+
+        c = CompactGraph()
+        for i in range(4):
+            c.addvertex()
+        c.addedges([(0, 1), (0, 2), (1, 2)])
+        c.addedge(2, 0)
+        self.assertEqual(c.traverse().out().count(), 4)
+        self.assertEqual(c.traverse().both().count(), 8)
+        self.assertEqual(c.v(0).traverse().outE().inV().count(), 2)
+
+    def testCountContinues(self):
+        traversal = self.g.traverse().out()
+        traversal.next()
+        self.assertEqual(traversal.count(), 3)
+        self.assertEqual(traversal.count(), 0)
+
+    def testNumbers(self):
+        self.assertEqual(self.g.traverse().age.sum(), 90)
+        self.assertEqual(self.g.traverse().age.min(), 20)
+        self.assertEqual(self.g.traverse().age.max(), 40)
+        self.assertEqual(self.g.traverse().age.mean(), 30)
+        self.assertEqual(self.g.traverse().filter(age=0).age.mean(), None)
+        self.assertEqual(self.g.traverse().filter(age=0).age.max(), None)
+
+    def testGroupCount(self):
+        self.assertEqual(self.g.traverse().out().groupCount(),
+                         {self.t: 1, self.u: 1, self.v: 2})
+        self.assertEqual(self.g.traverse().groupCount("town"),
+                         {"Flint": 2, "Detroit": 1})
+        self.assertEqual(
+            self.g.traverse().age.groupCount(lambda age: age > 25),
+            {True: 2, False: 1})
+
+    def testAggregate(self):
+        seen = []
+        result = self.t.traverse().aggregate(seen).out().name.toList()
+        self.assertEqual(result, ["_u", "_v"])
+        self.assertEqual(seen, [self.t])
+        seen = set()
+        self.g.traverse().out().aggregate(seen).count()
+        self.assertEqual(seen, set([self.t, self.u, self.v]))
+
+    def testAggregateKeepsPaths(self):
+        seen = []
+        result = self.t.traverse().out().aggregate(seen).paths().toList()
+        self.assertEqual(result, [[self.t, self.u], [self.t, self.v]])
+        self.assertEqual(seen, [self.u, self.v])
+
+
+class ProfileTests(TestCase):
+    def setUp(self):
+        self.g = Graph()
+        vs = [self.g.addvertex(n=i) for i in range(20)]
+        for i, v in enumerate(vs):
+            for j in (1, 2, 3):
+                self.g.addedge(v, vs[(i * j + 1) % 20], label="x")
+        self.calls = []
+
+    def tearDown(self):
+        hooks.remove(self.hook)
+
+    def hook(self, traversal, plan):
+        self.calls.append((repr(traversal), plan.report()))
+
+    def testProfile(self):
+        plan = self.g.traverse().out().out(label="x").n.profile()
+        report = plan.report()
+        self.assertEqual([step['step'] for step in report],
+                         ["V()", "out()", "out(label='x')", "values('n')"])
+        self.assertEqual([step['actual'] for step in report],
+                         [20, 60, 180, 180])
+        self.assertEqual([step['in'] for step in report],
+                         [None, 20, 60, 180])
+        for step in report:
+            self.assertGreaterEqual(step['seconds'], 0)
+            self.assertIsNone(step['allocated'])
+        self.assertIn("ms", repr(plan).splitlines()[0])
+
+    def testProfileAllocations(self):
+        report = self.g.traverse().out().paths().profile(
+            allocations=True).report()
+        for step in report:
+            self.assertGreaterEqual(step['allocated'], 0)
+        # V() makes nothing new, while out() makes a node for each of its
+        # 60 elements to keep the path it took, and paths() then makes a
+        # list for each
+        self.assertLess(report[0]['allocated'], 4096)
+        self.assertGreater(report[1]['allocated'], 60 * 32)
+        self.assertLess(report[1]['allocated'], 60 * 512)
+        self.assertGreater(report[2]['allocated'], 60 * 56)
+        self.assertLess(report[2]['allocated'], 60 * 1024)
+
+        # filters and values of vertices allocate next to nothing
+        report = self.g.traverse().out().filter(n=3).n.profile(
+            allocations=True).report()
+        self.assertEqual([step['actual'] for step in report], [20, 60, 4, 4])
+        for step in report:
+            self.assertGreaterEqual(step['allocated'], 0)
+            self.assertLess(step['allocated'], 4096)
+
+    def testHooks(self):
+        hooks.add(self.hook)
+        result = self.g.traverse().out().toList()
+        self.assertEqual(len(result), 60)
+        (traversal, report), = self.calls
+        self.assertEqual(traversal, "<Traversal: out()>")
+        self.assertEqual(report[-1]['actual'], 60)
+        self.assertIsNotNone(report[-1]['seconds'])
+
+        # a traversal that's dropped before it's finished still reports
+        t = self.g.traverse().out()
+        t.take(5)
+        del t
+        self.assertEqual(self.calls[-1][1][-1]['actual'], 5)
+
+        hooks.remove(self.hook)
+        self.g.traverse().out().toList()
+        self.assertEqual(len(self.calls), 2)
+
+    def testHookSampling(self):
+        hooks.add(self.hook, sample=0.5)
+        for i in range(200):
+            self.g.v(0).traverse().out().toList()
+        self.assertTrue(50 < len(self.calls) < 150)
+        self.assertRaises(ValueError, hooks.add, self.hook, 0)